@@ -7,6 +7,31 @@
         7. 2. 2021  - Dodatno formatiranje obavještenja
                     - CLI
                     - AQI kalkulator
+        18. 10. 2026- Paralelno prikupljanje svih stanica (snapshot)
+                    - Zajednička HTTP sesija s poolom konekcija (transport)
+                    - Uslovni zahtjevi i HTTP keš na disku (http_cache)
+                    - Brže parsiranje stranice stanice (extractor, lxml XPath)
+                    - Memorijski mapirana pohrana satnih vrijednosti (ring_store)
+                    - NowCAST za više prozora odjednom (aqi.koncentracije)
+                    - Klizni NowCAST prozor (aqi.NowCastWindow)
+                    - Tablice graničnih vrijednosti i AQI za niz koncentracija (aqi.concentration_to_aqi)
+                    - Unaprijed izračunate AQI tablice (aqi.AqiTablica)
+                    - Raspored provjera prema vremenu objave podataka (scheduler)
+                    - Kompaktna mjerenja (reading.Reading, reading.Readings)
+                    - Uvoz snimljenih stranica u više procesa (importer)
+                    - Čišćenje obavještenja u jednom prolazu, samo nova obavještenja (samo_nove)
+                    - Offline benchmarkovi s JSON rezultatom i poređenjem (benchmarks/run.py)
+                    - Mjerenje faza prikupljanja i metrike u Prometheus formatu (metrics)
+                    - Lokalni HTTP API s keširanim podacima, AQI i obavještenjima (server)
+                    - Brže pokretanje: odgođeno učitavanje modula, mztk(grad, prikupi = False)
+                    - Memorija podataka stanica u procesu s TTL i osvježavanjem u pozadini (mztk.Memorija)
+                    - Praćenje svih stanica uživo u CLI (Prati sve stanice / python cli.py watch)
+                    - Izvoz mjerenja s NowCAST/AQI u CSV ili JSON Lines, uz gzip (export)
+                    - SQLite pohrana s dnevnim i mjesečnim sažecima i AQI (storage)
+                    - Ponavljanje zahtjeva, rok preuzimanja i prekidač za nedostupnu stranicu (transport)
+                    - Čitanje stranice stanice u dijelovima, uz prekid čim su podaci pronađeni (extractor.izvuci_iz_dijelova)
+                    - Nepročitane vrijednosti kao NaN / bitmaska, NowCAST samo uz podatke za 2 od 3 posljednja sata
+                    - Lokalni simulator MZTK stranice i test opterećenja i grešaka (simulator.py, benchmarks/bench_load.py)
                     
     Bugovi:
         - ?
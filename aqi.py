@@ -1,5 +1,13 @@
+import bisect
+import collections
 import math
 import enum
+import numbers
+import time
+
+from typing import NamedTuple
+
+import metrics
 
 class ErrorAQIValues(Exception):
     def __init__(self):
@@ -13,6 +21,22 @@ class ErrorCalculation(Exception):
     def __init__(self):
         super().__init__("Nije moguće izračunati!")
 
+class ErrorIncompleteData(Exception):
+    def __init__(self):
+        super().__init__("Nedovoljno podataka za NowCAST - potrebne su vrijednosti za bar 2 od 3 posljednja sata!")
+
+''' EPA NowCAST: od POSLJEDNJIH_SATI najnovijih sati bar MIN_VAZECIH mora imati važeću vrijednost '''
+POSLJEDNJIH_SATI = 3
+MIN_VAZECIH = 2
+
+def _vazeca(vrijednost):
+    ''' None i NaN su sati bez podataka '''
+    return vrijednost is not None and vrijednost == vrijednost
+
+def potpun(values):
+    ''' Da li prozor (vrijednosti od najnovije do najstarije) ima dovoljno podataka za NowCAST (bar 2 od 3 posljednja sata) '''
+    return sum(1 for v in values[:POSLJEDNJIH_SATI] if _vazeca(v)) >= MIN_VAZECIH
+
 class CalculationType(enum.Enum):
     PM25 = "pm2.5"
     PM10 = "pm10"
@@ -31,45 +55,408 @@ class Description(enum.Enum):
     hazardous = "Opasno"
     beyond = "Van mjernog opsega"
 
+def _do(granica):
+    ''' Gornja granica pojasa koja je uključena u pojas (c <= granica) '''
+    return math.nextafter(granica, math.inf)
+
+class _Tablica(NamedTuple):
+    skracivanje: str        # 'nema', 'cijeli', 'desetine' ili 'ppm' (cijeli ppb / 1000)
+    pocetak: float          # najmanja koncentracija u opsegu
+    pojasevi: list          # (gornja granica - isključena, AQIhigh, AQIlow, Conchigh, Conclow)
+                            # ili (gornja granica, None) za pojas u kojem nije moguće izračunati AQI
+
+BREAKPOINTS = {
+    CalculationType.PM25: _Tablica('nema', 0, [
+        (12.1, 50, 0, 12, 0),
+        (35.5, 100, 51, 35.4, 12.1),
+        (55.5, 150, 101, 55.4, 35.5),
+        (150.5, 200, 151, 150.4, 55.5),
+        (250.5, 300, 201, 250.4, 150.5),
+        (350.5, 400, 301, 350.4, 250.5),
+        (500.5, 500, 401, 500.4, 350.5)]),
+
+    CalculationType.PM10: _Tablica('cijeli', 0, [
+        (55, 50, 0, 54, 0),
+        (155, 100, 51, 154, 55),
+        (255, 150, 101, 254, 155),
+        (355, 200, 151, 354, 255),
+        (425, 300, 201, 424, 355),
+        (505, 400, 301, 504, 425),
+        (605, 500, 401, 604, 505)]),
+
+    CalculationType.CO: _Tablica('desetine', 0, [
+        (4.5, 50, 0, 4.4, 0),
+        (9.5, 100, 51, 9.4, 4.5),
+        (12.5, 150, 101, 12.4, 9.5),
+        (15.5, 200, 151, 15.4, 12.5),
+        (30.5, 300, 201, 30.4, 15.5),
+        (40.5, 400, 301, 40.4, 30.5),
+        (50.5, 500, 401, 50.4, 40.5)]),
+
+    CalculationType.SO2_1hr: _Tablica('cijeli', 0, [
+        (36, 50, 0, 35, 0),
+        (76, 100, 51, 75, 36),
+        (186, 150, 101, 185, 76),
+        (304, 200, 151, 304, 186),
+        # AQI = "SO2message" ?
+        (604, None)]),
+
+    CalculationType.SO2_24hr: _Tablica('cijeli', 0, [
+        # AQI = "SO2message" ?
+        (304, None),
+        (605, 300, 201, 604, 305),
+        (805, 400, 301, 804, 605),
+        (1004, 500, 401, 1004, 805)]),
+
+    CalculationType.O3_8hr: _Tablica('ppm', 0, [
+        (0.060, 50, 0, 0.059, 0),
+        (0.076, 100, 51, 0.075, 0.060),
+        (0.096, 150, 101, 0.095, 0.076),
+        (0.116, 200, 151, 0.115, 0.096),
+        (0.375, 300, 201, 0.374, 0.116),
+        (0.605, None)]),
+
+    CalculationType.O3_1hr: _Tablica('ppm', 0.125, [
+        (0.165, 150, 101, 0.164, 0.125),
+        (0.205, 200, 151, 0.204, 0.165),
+        (0.405, 300, 201, 0.404, 0.205),
+        (0.505, 400, 301, 0.504, 0.405),
+        (0.605, 500, 401, 0.604, 0.505)]),
+
+    CalculationType.NO2: _Tablica('ppm', 0, [
+        (0.054, 50, 0, 0.053, 0),
+        (_do(0.101), 100, 51, 0.100, 0.054),
+        (_do(0.361), 150, 101, 0.360, 0.101),
+        (_do(0.650), 200, 151, 0.649, 0.361),
+        (_do(1.250), 300, 201, 1.249, 0.650),
+        (_do(1.650), 400, 301, 1.649, 1.250),
+        (_do(2.049), 500, 401, 2.049, 1.650)]),
+}
+
+_GORNJE_GRANICE = {ct: [p[0] for p in t.pojasevi] for ct, t in BREAKPOINTS.items()}
+
+def _linear(AQIhigh, AQIlow, Conchigh, Conclow, Concentration):
+    Conc = float(Concentration)
+    value = round((((Conc - Conclow) / (Conchigh - Conclow)) * (AQIhigh - AQIlow) + AQIlow), 0)
+    return value
+
+def _skrati(conc, skracivanje):
+    if skracivanje == 'cijeli':
+        return math.floor(conc)
+    elif skracivanje == 'desetine':
+        return (math.floor(10 * conc)) / 10
+    elif skracivanje == 'ppm':
+        return (math.floor(conc)) / 1000
+    return conc
+
+def concentration_to_aqi(conc, calculation_type : CalculationType = CalculationType.PM25, strogo = True, tablica = False):
+    '''
+    AQI za koncentraciju (ili niz koncentracija), bez NowCAST računanja
+
+    @param: conc - broj, ili lista / numpy niz koncentracija
+    @param: calculation_type: enum.CalculationType - vrsta polutanta
+    @param: strogo - ako je True, koncentracija van opsega podiže ErrorOutOfRange, a koncentracija
+                     za koju nije moguće izračunati AQI ErrorCalculation (kao aqi.aqi);
+                     ako je False, za takve koncentracije se vraća NaN
+    @param: tablica - ako je True, AQI se čita iz unaprijed izračunate tablice (vidi AqiTablica)
+
+    Za broj vraća broj, a za niz numpy niz (pojasevi se traže binarnom pretragom - numpy.searchsorted).
+    '''
+    if tablica:
+        t = _tablice.get(calculation_type) or aqi_tablica(calculation_type)
+        if type(conc) is float or type(conc) is int:
+            return t.skalarno(conc, strogo)
+        return t.pogledaj(conc, strogo)[0]
+
+    breakpoints = BREAKPOINTS[calculation_type]
+
+    if isinstance(conc, numbers.Real):
+        try:
+            return _aqi_skalarno(conc, breakpoints, _GORNJE_GRANICE[calculation_type])
+        except (ErrorOutOfRange, ErrorCalculation):
+            if strogo:
+                raise
+            return math.nan
+
+    return _aqi_niz(conc, breakpoints, strogo)
+
+def _aqi_skalarno(conc, tablica, gornje):
+    return _aqi_skraceno(_skrati(conc, tablica.skracivanje), tablica, gornje)
+
+def _aqi_skraceno(c, tablica, gornje):
+    if not c >= tablica.pocetak:
+        raise ErrorOutOfRange
+
+    i = bisect.bisect_right(gornje, c)
+    if i == len(tablica.pojasevi):
+        raise ErrorOutOfRange
+
+    pojas = tablica.pojasevi[i]
+    if pojas[1] is None:
+        raise ErrorCalculation
+
+    return _linear(pojas[1], pojas[2], pojas[3], pojas[4], c)
+
+def _aqi_niz(conc, tablica, strogo):
+    import numpy as np
+
+    conc = np.asarray(conc, dtype = np.float64)
+
+    if tablica.skracivanje == 'cijeli':
+        c = np.floor(conc)
+    elif tablica.skracivanje == 'desetine':
+        c = np.floor(10 * conc) / 10
+    elif tablica.skracivanje == 'ppm':
+        c = np.floor(conc) / 1000
+    else:
+        c = conc
+
+    pojasevi = tablica.pojasevi
+    gornje = np.array([p[0] for p in pojasevi])
+    parametri = np.array([p[1:] if p[1] is not None else (np.nan,) * 4 for p in pojasevi] + [(np.nan,) * 4])
+
+    i = np.searchsorted(gornje, c, side = 'right')
+    van_opsega = ~(c >= tablica.pocetak) | (i == len(pojasevi))
+    i[van_opsega] = len(pojasevi)
+
+    AQIhigh, AQIlow, Conchigh, Conclow = parametri[i].T
+
+    if strogo:
+        if van_opsega.any():
+            raise ErrorOutOfRange
+        if np.isnan(AQIhigh).any():
+            raise ErrorCalculation
+
+    with np.errstate(invalid = 'ignore'):
+        return np.round((((c - Conclow) / (Conchigh - Conclow)) * (AQIhigh - AQIlow) + AQIlow), 0)
+
+def _description(value):
+    if value < 50:
+        return Description.good
+    elif value < 100:
+        return Description.moderate
+    elif value < 150:
+        return Description.unhealthy
+    elif value < 200:
+        return Description.very_unhealthy
+    elif value < 300:
+        return Description.hazardous
+    else:
+        return Description.hazardous
+
+''' Kodovi u AqiTablica.kod '''
+KOD_OK = 0
+KOD_CALCULATION = 1
+KOD_OUT_OF_RANGE = 2
+
+class AqiTablica:
+    '''
+    Unaprijed izračunat AQI i opis za svaku tačku mreže na koju se koncentracija skraćuje
+    (0.1 za PM2.5 i CO, cijeli brojevi za PM10 i SO2, cijeli ppb za O3 i NO2)
+
+    AQI i opis se čitaju s jednim indeksom u niz, bez traženja pojasa i računanja.
+    Za PM2.5 se koncentracija također skraćuje na 0.1 - NowCAST koncentracije su već na toj mreži,
+    pa je rezultat isti kao concentration_to_aqi; za koncentracije s više decimala nije.
+
+    Tablice se prave pri prvom korištenju - aqi_tablica(calculation_type), koja novu tablicu
+    provjerava s formulom u svakoj tački mreže (provjeri; preskače se s python -O).
+
+    Varijable:
+        aqi             - [numpy float64] - AQI za svaku tačku mreže (NaN ako nije moguće izračunati)
+        opis            - [numpy int8] - indeks u list(Description), -1 ako AQI nije izračunat
+        kod             - [numpy int8] - KOD_OK, KOD_CALCULATION ili KOD_OUT_OF_RANGE
+    '''
+
+    def __init__(self, calculation_type : CalculationType):
+        import numpy as np
+
+        self.calculation_type = calculation_type
+        self.__tablica = BREAKPOINTS[calculation_type]
+        self.__mnozilac = 10 if self.__tablica.skracivanje in ('nema', 'desetine') else 1
+
+        gornje = _GORNJE_GRANICE[calculation_type]
+        opisi = list(Description)
+
+        aqi_vrijednosti = []
+        opis = []
+        kod = []
+
+        k = 0
+        while self.__vrijednost(k) < gornje[-1]:
+            try:
+                a = _aqi_skraceno(self.__vrijednost(k), self.__tablica, gornje)
+                aqi_vrijednosti.append(a)
+                opis.append(opisi.index(_description(a)))
+                kod.append(KOD_OK)
+            except ErrorCalculation:
+                aqi_vrijednosti.append(math.nan)
+                opis.append(-1)
+                kod.append(KOD_CALCULATION)
+            except ErrorOutOfRange:
+                aqi_vrijednosti.append(math.nan)
+                opis.append(-1)
+                kod.append(KOD_OUT_OF_RANGE)
+            k += 1
+
+        self.aqi = np.array(aqi_vrijednosti, dtype = np.float64)
+        self.opis = np.array(opis, dtype = np.int8)
+        self.kod = np.array(kod, dtype = np.int8)
+
+        self.__aqi = aqi_vrijednosti
+        self.__opisi = [opisi[i] if i >= 0 else None for i in opis]
+        self.__kod = kod
+
+    def __vrijednost(self, k):
+        ''' Skraćena koncentracija za tačku mreže k (ista vrijednost koju daje _skrati) '''
+        if self.__tablica.skracivanje == 'ppm':
+            return k / 1000
+        elif self.__mnozilac == 10:
+            return k / 10
+        return k
+
+    def indeks(self, conc):
+        ''' Tačka mreže za koncentraciju (broj ili numpy niz) '''
+        if isinstance(conc, numbers.Real):
+            return math.floor(self.__mnozilac * conc) if math.isfinite(conc) else -1
+
+        import numpy as np
+
+        c = np.floor(self.__mnozilac * np.asarray(conc, dtype = np.float64))
+        return np.where(np.isfinite(c), c, -1).astype(np.int64)
+
+    def skalarno(self, conc, strogo = True):
+        ''' AQI za broj (float ili int), bez provjere tipa - isto kao pogledaj(conc, strogo)[0] '''
+        if conc >= 0:
+            try:
+                k = int(self.__mnozilac * conc)
+                a = self.__aqi[k]
+                if a == a:
+                    return a
+                kod = self.__kod[k]
+            except (IndexError, OverflowError):
+                kod = KOD_OUT_OF_RANGE
+        else:
+            # Negativna koncentracija ili NaN
+            kod = KOD_OUT_OF_RANGE
+
+        if strogo:
+            raise ErrorCalculation if kod == KOD_CALCULATION else ErrorOutOfRange
+        return math.nan
+
+    def pogledaj(self, conc, strogo = True):
+        '''
+        (AQI, opis) za koncentraciju
+        Za broj vraća (float, Description), a za niz (numpy niz AQI, numpy niz indeksa u list(Description))
+        '''
+        if isinstance(conc, numbers.Real):
+            k = self.indeks(conc)
+            kod = self.__kod[k] if 0 <= k < len(self.__kod) else KOD_OUT_OF_RANGE
+
+            if kod != KOD_OK:
+                if strogo:
+                    raise ErrorCalculation if kod == KOD_CALCULATION else ErrorOutOfRange
+                return math.nan, None
+
+            return self.__aqi[k], self.__opisi[k]
+
+        import numpy as np
+
+        k = self.indeks(conc)
+        van_opsega = (k < 0) | (k >= len(self.kod))
+        k = np.where(van_opsega, 0, k)
+
+        kod = np.where(van_opsega, KOD_OUT_OF_RANGE, self.kod[k])
+        if strogo:
+            if (kod == KOD_OUT_OF_RANGE).any():
+                raise ErrorOutOfRange
+            if (kod == KOD_CALCULATION).any():
+                raise ErrorCalculation
+
+        return np.where(kod == KOD_OK, self.aqi[k], np.nan), np.where(kod == KOD_OK, self.opis[k], -1)
+
+    def razlike(self):
+        ''' Uporedi tablicu s računanjem po formuli u svakoj tački mreže; vraća listu razlika (k, tablica, formula) '''
+        gornje = _GORNJE_GRANICE[self.calculation_type]
+        razlike = []
+
+        for k in range(len(self.__kod)):
+            # Koncentracija u ulaznim jedinicama (ppb za O3 i NO2)
+            conc = k if self.__tablica.skracivanje == 'ppm' else self.__vrijednost(k)
+            try:
+                formula = (_aqi_skalarno(conc, self.__tablica, gornje), KOD_OK)
+            except ErrorCalculation:
+                formula = (None, KOD_CALCULATION)
+            except ErrorOutOfRange:
+                formula = (None, KOD_OUT_OF_RANGE)
+
+            if self.indeks(conc) != k:
+                razlike.append((k, 'indeks', self.indeks(conc)))
+            elif formula[1] != self.__kod[k] or (formula[1] == KOD_OK and formula[0] != self.__aqi[k]):
+                razlike.append((k, (self.__aqi[k], self.__kod[k]), formula))
+
+        return razlike
+
+    def provjeri(self):
+        ''' AssertionError ako se tablica u nekoj tački mreže ne slaže s formulom '''
+        razlike = self.razlike()
+        assert not razlike, 'AqiTablica({0}) se ne slaže s formulom u {1} tačaka mreže, npr. {2}'.format(
+            self.calculation_type.name, len(razlike), razlike[:3])
+
+''' Napravljene tablice po vrsti polutanta (vidi aqi_tablica) '''
+_tablice = {}
+
+def aqi_tablica(calculation_type : CalculationType):
+    ''' AqiTablica za vrstu polutanta (pravi se i provjerava pri prvom pozivu, zatim se koristi ista) '''
+    t = _tablice.get(calculation_type)
+    if t is None:
+        t = AqiTablica(calculation_type)
+        if __debug__:
+            t.provjeri()
+        t = _tablice.setdefault(calculation_type, t)
+    return t
+
 class aqi:
     ''' 
     Izračuvana AQI u odnosu na unešene podatke 
     Bazirano na osnovu: https://www3.epa.gov/airnow/aqicalctest/nowcast.htm
 
-    @param: values - lista [] vrijednosti, od najnovije do najstarije
+    @param: values - lista [] vrijednosti, od najnovije do najstarije; sat bez podataka je None ili NaN
+                     (preskače se, a ostali sati zadržavaju svoju težinu)
     @param: calculation_type: enum.CalculationType - vrsta polutanta (pm2.5, pm10, co, so2, o3, no)
+
+    Ako od 3 posljednja sata manje od 2 imaju vrijednost, podiže se ErrorIncompleteData.
     '''
 
     def __init__(self, values = [], calculation_type : CalculationType = CalculationType.PM25):
         if len(values) > 1:
-            self.koncentracija = self.__concentration(values)
-            self.jedinica = "µg/m³"
-
-            self.__calculation_type = calculation_type.value
-
-            if calculation_type == CalculationType.PM25:
-                self.aqi = self.__aqi_pm25(self.koncentracija)
-            elif calculation_type == CalculationType.PM10:
-                self.aqi = self.__aqi_pm10(self.koncentracija)
-            elif calculation_type == CalculationType.CO:
-                self.aqi = self.__aqi_co(self.koncentracija)
-            elif calculation_type == CalculationType.SO2_1hr:
-                self.aqi = self.__aqi_so2_1hr(self.koncentracija)
-            elif calculation_type == CalculationType.SO2_24hr:
-                self.aqi = self.__aqi_so2_24hr(self.koncentracija)
-            elif calculation_type == CalculationType.O3_1hr:
-                self.aqi = self.__aqi_o3_1hr(self.koncentracija)
-            elif calculation_type == CalculationType.O3_8hr:
-                self.aqi = self.__aqi_o3_8hr(self.koncentracija)
-            elif calculation_type == CalculationType.NO2:
-                self.aqi = self.__aqi_no2(self.koncentracija)
-
-            self.opis = self.__description(self.aqi).value
+            if not potpun(values):
+                raise ErrorIncompleteData
+
+            with metrics.mjeri('aqi', polutant = calculation_type.name):
+                self.__izracunaj(self.__concentration(values), calculation_type)
 
         else:
             raise ErrorAQIValues
             return
 
+    @classmethod
+    def iz_koncentracije(cls, koncentracija, calculation_type : CalculationType = CalculationType.PM25):
+        ''' AQI za već izračunatu (NowCAST) koncentraciju '''
+        rezultat = cls.__new__(cls)
+        with metrics.mjeri('aqi', polutant = calculation_type.name):
+            rezultat.__izracunaj(koncentracija, calculation_type)
+        return rezultat
+
+    def __izracunaj(self, koncentracija, calculation_type):
+        self.koncentracija = koncentracija
+        self.jedinica = "µg/m³"
+
+        self.__calculation_type = calculation_type.value
+
+        self.aqi = concentration_to_aqi(self.koncentracija, calculation_type)
+
+        self.opis = self.__description(self.aqi).value
+
     def __str__(self):
         return "Izračunate vrijednosti: AQI: {0} (za: {1}), koncentracija: {2} {3}, opis: '{4}'.".format(
             self.aqi,
@@ -80,208 +467,153 @@ class aqi:
         )
 
     def __description(self, value):
-        if value < 50:
-            return Description.good
-        elif value < 100:
-            return Description.moderate
-        elif value < 150:
-            return Description.unhealthy
-        elif value < 200:
-            return Description.very_unhealthy
-        elif value < 300:
-            return Description.hazardous
-        else:
-            return Description.hazardous
+        return _description(value)
 
     @staticmethod
-    def __linear(AQIhigh, AQIlow, Conchigh, Conclow, Concentration):
-        linear = 0
-        Conc = float(Concentration)
-        value = round((((Conc - Conclow) / (Conchigh - Conclow)) * (AQIhigh - AQIlow) + AQIlow), 0)
-        return value
-
-    def __aqi_pm25(self, conc):
-        AQI = 0
-        if (0 <= conc < 12.1):
-            AQI = self.__linear(50, 0, 12, 0, conc)
-        elif (12.1 <= conc < 35.5):
-            AQI = self.__linear(100, 51, 35.4, 12.1, conc)
-        elif (35.5 <= conc < 55.5):
-            AQI = self.__linear(150, 101, 55.4, 35.5, conc)
-        elif (55.5 <= conc < 150.5):
-            AQI = self.__linear(200, 151, 150.4, 55.5, conc)
-        elif (150.5 <= conc < 250.5):
-            AQI = self.__linear(300, 201, 250.4, 150.5, conc)
-        elif (250.5 <= conc < 350.5):
-            AQI = self.__linear(400, 301, 350.4, 250.5, conc)
-        elif (350.5 <= conc < 500.5):
-            AQI = self.__linear(500, 401, 500.4, 350.5, conc)
-        else:
-            raise ErrorOutOfRange
+    def __concentration(values):
+        range = 0
+        rate_of_change = 0
+        weight_factor = 0
+        sum_of_data_times_weight_factor = 0
+        sum_of_weight_factor = 0
+        hour = 0
 
-        return AQI
-
-    def __aqi_pm10(self, conc):
-        AQI = 0
-        c = math.floor(conc)
-        if (0 <= c < 55):
-            AQI = self.__linear(50, 0, 54, 0, c)
-        elif (55 <= c < 155):
-            AQI = self.__linear(100, 51, 154, 55, c)
-        elif (155 <= c < 255):
-            AQI = self.__linear(150, 101, 254, 155, c)
-        elif (255 <= c < 355):
-            AQI = self.__linear(200, 151, 354, 255, c)
-        elif (355 <= c < 425):
-            AQI = self.__linear(300, 201, 424, 355, c)
-        elif (425 <= c < 505):
-            AQI = self.__linear(400, 301, 504, 425, c)
-        elif (505 <= c < 605):
-            AQI = self.__linear(500, 401, 604, 505, c)
-        else:
-            raise ErrorOutOfRange
+        vazece = [value for value in values if _vazeca(value)]
+        min_value = min(vazece)
+        max_value = max(vazece)
 
-        return AQI
-
-    def __aqi_co(self, conc):
-        AQI = 0
-        c = (math.floor(10 * conc)) / 10
-
-        if (0 <= c < 4.5):
-            AQI = self.__linear(50, 0, 4.4, 0, c)
-        elif(4.5 <= c < 9.5):
-            AQI = self.__linear(100, 51, 9.4, 4.5, c)
-        elif(9.5 <= c < 12.5):
-            AQI = self.__linear(150, 101, 12.4, 9.5, c)
-        elif(12.5 <= c < 15.5):
-            AQI = self.__linear(200, 151, 15.4, 12.5, c)
-        elif(15.5 <= c < 30.5):
-            AQI = self.__linear(300, 201, 30.4, 15.5, c)
-        elif(30.5 <= c < 40.5):
-            AQI = self.__linear(400, 301, 40.4, 30.5, c)
-        elif(40.5 <= c < 50.5):
-            AQI = self.__linear(500, 401, 50.4, 40.5, c)
+        range = max_value - min_value
+        if range > 0:
+            rate_of_change = range / max_value
         else:
-            raise ErrorOutOfRange
+            return 0
 
-        return AQI
-
-    def __aqi_so2_1hr(self, conc):
-        AQI = 0
-        c = math.floor(conc)
-
-        if (0 <= c < 36):
-            AQI = self.__linear(50, 0, 35, 0, c)
-        elif(36 <= c < 76):
-            AQI = self.__linear(100, 51, 75, 36, c)
-        elif(76 <= c < 186):
-            AQI = self.__linear(150, 101, 185, 76, c)
-        elif(186 <= c < 304):
-            AQI = self.__linear(200, 151, 304, 186, c)
-        elif(304 <= c < 604):
-            # AQI = "SO2message" ?
-            raise ErrorCalculation
-        else:
-            raise ErrorOutOfRange
+        weight_factor = 1 - rate_of_change
 
-        return AQI
+        if weight_factor < 0.5:
+            weight_factor = 0.5
 
-    def __aqi_so2_24hr(self, conc):
-        AQI = 0
-        c = math.floor(conc)
+        for value in values:
+            if _vazeca(value):
+                sum_of_data_times_weight_factor += value*(pow(weight_factor, hour))
+                sum_of_weight_factor +=pow(weight_factor, hour)
+            hour += 1
 
-        if (0 <= c < 304):
-            # AQI = "SO2message" ? 
-            raise ErrorCalculation
-        elif(304 <= c < 605):
-            AQI = self.__linear(300, 201, 604, 305, c)
-        elif(605 <= c < 805):
-            AQI = self.__linear(400, 301, 804, 605, c)
-        elif(805 <= c < 1004):
-            AQI = self.__linear(500, 401, 1004, 805, c)
-        else:
-            raise ErrorOutOfRange
+        nowCast = sum_of_data_times_weight_factor / sum_of_weight_factor
+        nowCast = math.floor(10*nowCast)/10
 
-        return AQI 
-
-    def __aqi_o3_8hr(self, conc):
-        AQI = 0
-        c = (math.floor(conc)) / 1000
-
-        if (0 <= c < 0.060):
-            AQI = self.__linear(50, 0, 0.059, 0, c)
-        elif (0.060 <= c < 0.076):
-            AQI = self.__linear(100, 51, 0.075, 0.060, c)
-        elif (0.076 <= c < 0.096):
-            AQI = self.__linear(150, 101, 0.095, 0.076, c)
-        elif (0.096 <= c < 0.116):
-            AQI = self.__linear(200, 151, 0.115, 0.096, c)
-        elif (0.116 <= c < 0.375):
-            AQI = self.__linear(300, 201, 0.374, 0.116, c)
-        elif (0.375 <= c < 0.605):
-            raise ErrorCalculation
-        else:
-            raise ErrorOutOfRange
+        Conc = math.floor(10 * float(nowCast)) / 10
 
-        return AQI
-
-    def __aqi_o3_1hr(self, conc):
-        AQI = 0
-        c = (math.floor(conc)) / 1000
-
-        if (0.125 <= c < 0.165):
-            AQI = self.__linear(150, 101, 0.164, 0.125, c)
-        elif (0.165 <= c < 0.205):
-            AQI = self.__linear(200, 151, 0.204, 0.165, c)
-        elif (0.205 <= c < 0.405):
-            AQI = self.__linear(300, 201, 0.404, 0.205, c)
-        elif (0.405 <= c < 0.505):
-            AQI = self.__linear(400, 301, 0.504, 0.405, c)
-        elif (0.505 <= c < 0.605):
-            AQI = self.__linear(500, 401, 0.604, 0.505, c)
-        else:
-            raise ErrorOutOfRange
+        return Conc
 
-        return AQI
-
-    def __aqi_no2(self, conc):
-        AQI = 0
-        c = (math.floor(conc)) / 1000
-
-        if (0 <= c < 0.054):
-            AQI = self.__linear(50, 0, 0.053, 0, c)
-        elif (0.054 <= c <= 0.101):
-            AQI = self.__linear(100, 51, 0.100, 0.054, c)
-        elif (0.101 <= c <= 0.361):
-            AQI = self.__linear(150, 101, 0.360, 0.101, c)
-        elif (0.361 <= c <= 0.650):
-            AQI = self.__linear(200, 151, 0.649, 0.361, c)
-        elif (0.650 <= c <= 1.250):
-            AQI = self.__linear(300, 201, 1.249, 0.650, c)
-        elif (1.250 <= c <= 1.650):
-            AQI = self.__linear(400, 301, 1.649, 1.250, c)
-        elif (1.650 <= c <= 2.049):
-            AQI = self.__linear(500, 401, 2.049, 1.650, c)
-        else:
-            raise ErrorOutOfRange
+class ErrorHourOrder(Exception):
+    def __init__(self):
+        super().__init__("Sat mora biti noviji od posljednjeg unešenog!")
+
+class NowCastWindow:
+    '''
+    Klizni NowCAST prozor za jednu stanicu i jedan polutant
+
+    Čuva posljednjih 12 satnih vrijednosti u kružnom baferu, a minimum i maksimum
+    prozora u monotonim redovima (deque), tako da se pri svakom novom satu ponovo
+    računa samo ponderisana suma. Za prozor bez praznina rezultat je isti kao aqi.aqi
+    s istim vrijednostima.
+
+    @param: calculation_type: enum.CalculationType - vrsta polutanta
+    @param: sati - veličina prozora (12 za NowCAST)
+
+    Funkcije:
+        - dodaj(vrijednost, sat = None)     - Dodaj najnoviju satnu vrijednost, vraća aqi objekat
+                                              (ili None ako od 3 posljednja sata manje od 2 imaju vrijednost)
+                                              sat: epoch sekunde ili struct_time; bez sata se uzima
+                                              sljedeći sat. Preskočeni sati i None/NaN se ne računaju.
+                                              S izracunaj = False se samo puni prozor (bez računanja, vraća None).
+    '''
 
-        return AQI
+    def __init__(self, calculation_type : CalculationType = CalculationType.PM25, sati = 12):
+        self.calculation_type = calculation_type
+        self.sati = sati
 
-    @staticmethod
-    def __concentration(values):
-        range = 0
-        rate_of_change = 0
-        weight_factor = 0
-        sum_of_data_times_weight_factor = 0
-        sum_of_weight_factor = 0
-        hour = 0
+        self.__vrijednosti = [None] * sati
+        self.__zadnji_sat = None
+        self.__min = collections.deque()
+        self.__max = collections.deque()
 
-        min_value = min(values)
-        max_value = max(values)
+        self.koncentracija = None
+        self.rezultat = None
 
-        range = max_value - min_value
-        if range > 0:
-            rate_of_change = range / max_value
+    def dodaj(self, vrijednost, sat = None, izracunaj = True):
+        if sat is None:
+            sat = 0 if self.__zadnji_sat is None else self.__zadnji_sat + 1
+        else:
+            if isinstance(sat, time.struct_time):
+                sat = time.mktime(sat)
+            sat = int(sat // 3600)
+
+            if self.__zadnji_sat is not None and sat <= self.__zadnji_sat:
+                raise ErrorHourOrder
+
+        if vrijednost is not None and vrijednost != vrijednost:
+            # NaN
+            vrijednost = None
+
+        if self.__zadnji_sat is not None:
+            for s in range(max(self.__zadnji_sat + 1, sat - self.sati + 1), sat):
+                self.__vrijednosti[s % self.sati] = None
+
+        self.__vrijednosti[sat % self.sati] = vrijednost
+        self.__zadnji_sat = sat
+
+        najstariji = sat - self.sati + 1
+        while self.__min and self.__min[0][0] < najstariji:
+            self.__min.popleft()
+        while self.__max and self.__max[0][0] < najstariji:
+            self.__max.popleft()
+
+        if vrijednost is not None:
+            while self.__min and self.__min[-1][1] >= vrijednost:
+                self.__min.pop()
+            self.__min.append((sat, vrijednost))
+
+            while self.__max and self.__max[-1][1] <= vrijednost:
+                self.__max.pop()
+            self.__max.append((sat, vrijednost))
+
+        if not izracunaj or not self.potpun():
+            self.koncentracija = None
+            self.rezultat = None
+            return None
+
+        koncentracija = self.__concentration()
+        try:
+            rezultat = aqi.iz_koncentracije(koncentracija, self.calculation_type)
+        except (ErrorOutOfRange, ErrorCalculation):
+            # Sat je dodan u prozor, ali za njega nema rezultata - ne ostavljati rezultat prethodnog sata
+            self.koncentracija = None
+            self.rezultat = None
+            raise
+
+        self.koncentracija = koncentracija
+        self.rezultat = rezultat
+        return rezultat
+
+    def potpun(self):
+        ''' Da li prozor ima vrijednosti za bar 2 od 3 posljednja sata (uslov za NowCAST) '''
+        if self.__zadnji_sat is None:
+            return False
+
+        posljednji = min(POSLJEDNJIH_SATI, self.sati)
+        return sum(1 for hour in range(posljednji)
+            if self.__vrijednosti[(self.__zadnji_sat - hour) % self.sati] is not None) >= min(MIN_VAZECIH, posljednji)
+
+    def __concentration(self):
+        ''' Isti postupak kao aqi.__concentration, uz preskakanje sati bez podataka '''
+        min_value = self.__min[0][1]
+        max_value = self.__max[0][1]
+
+        raspon = max_value - min_value
+        if raspon > 0:
+            rate_of_change = raspon / max_value
         else:
             return 0
 
@@ -290,14 +622,75 @@ class aqi:
         if weight_factor < 0.5:
             weight_factor = 0.5
 
-        for value in values:
+        sum_of_data_times_weight_factor = 0
+        sum_of_weight_factor = 0
+
+        for hour in range(self.sati):
+            value = self.__vrijednosti[(self.__zadnji_sat - hour) % self.sati]
+            if value is None:
+                continue
+
             sum_of_data_times_weight_factor += value*(pow(weight_factor, hour))
-            sum_of_weight_factor +=pow(weight_factor, hour)
-            hour += 1
+            sum_of_weight_factor += pow(weight_factor, hour)
 
         nowCast = sum_of_data_times_weight_factor / sum_of_weight_factor
         nowCast = math.floor(10*nowCast)/10
 
         Conc = math.floor(10 * float(nowCast)) / 10
 
-        return Conc
\ No newline at end of file
+        return Conc
+
+def koncentracije(values):
+    '''
+    NowCAST koncentracije za više prozora odjednom (numpy)
+
+    @param: values - 2-D niz oblika (broj prozora, broj sati), u svakom redu vrijednosti
+                     od najnovije do najstarije (isti redoslijed kao za aqi.aqi); NaN je sat bez podataka
+
+    Vraća numpy niz s po jednom koncentracijom za svaki red. Rezultat je identičan
+    računanju preko aqi.aqi za svaki red posebno (isti redoslijed operacija i odsijecanje
+    na jednu decimalu). Za red koji nema vrijednosti za bar 2 od 3 posljednja sata
+    (aqi.aqi podiže ErrorIncompleteData) koncentracija je NaN.
+    '''
+    import numpy as np
+
+    v = np.asarray(values, dtype = np.float64)
+    if v.ndim != 2 or v.shape[1] < 2:
+        raise ErrorAQIValues
+
+    vazece = ~np.isnan(v)
+    potpuni = vazece[:, :POSLJEDNJIH_SATI].sum(axis = 1) >= MIN_VAZECIH
+    sve_vazece = bool(vazece.all())
+
+    if sve_vazece:
+        min_value = v.min(axis = 1)
+        max_value = v.max(axis = 1)
+    else:
+        min_value = np.where(vazece, v, np.inf).min(axis = 1)
+        max_value = np.where(vazece, v, -np.inf).max(axis = 1)
+    raspon = max_value - min_value
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        rate_of_change = raspon / max_value
+
+    weight_factor = 1 - rate_of_change
+    weight_factor = np.where(weight_factor < 0.5, 0.5, weight_factor)
+
+    # Sabiranje sat po sat (kao u aqi.__concentration), da bi rezultat bio identičan
+    sum_of_data_times_weight_factor = np.zeros(v.shape[0])
+    sum_of_weight_factor = np.zeros(v.shape[0])
+    for hour in range(v.shape[1]):
+        weight = np.power(weight_factor, hour)
+        if sve_vazece:
+            sum_of_data_times_weight_factor += v[:, hour] * weight
+            sum_of_weight_factor += weight
+        else:
+            # Sat bez podataka se preskače (dodaje se 0)
+            sum_of_data_times_weight_factor += np.where(vazece[:, hour], v[:, hour] * weight, 0.0)
+            sum_of_weight_factor += np.where(vazece[:, hour], weight, 0.0)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        nowCast = np.floor(10 * (sum_of_data_times_weight_factor / sum_of_weight_factor)) / 10
+        Conc = np.floor(10 * nowCast) / 10
+
+    return np.where(potpuni, np.where(raspon > 0, Conc, 0.0), np.nan)
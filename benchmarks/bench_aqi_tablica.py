@@ -0,0 +1,54 @@
+'''
+Provjera i brzina AQI tablica (aqi.AqiTablica)
+
+Za svaku vrstu polutanta provjerava da tablica u svakoj tački mreže daje isti
+AQI (i istu grešku) kao računanje po formuli, a zatim poredi brzinu
+concentration_to_aqi s i bez tablice.
+
+Pokretanje:
+    python benchmarks/bench_aqi_tablica.py [broj_koncentracija]
+'''
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+import aqi
+
+def main(broj = 1000000):
+    rng = np.random.default_rng(2021)
+    greske = 0
+
+    print('{0:<12} {1:>8} {2:>10} {3:>12} {4:>12}'.format('polutant', 'tačaka', 'razlika', 'formula [s]', 'tablica [s]'))
+
+    for ct in aqi.CalculationType:
+        start = time.perf_counter()
+        tablica = aqi.aqi_tablica(ct)
+        razlike = tablica.razlike()
+        greske += len(razlike)
+
+        # Koncentracije na mreži, u opsegu tablice
+        k = rng.integers(0, len(tablica.kod), size = broj)
+        conc = k / 10 if ct in (aqi.CalculationType.PM25, aqi.CalculationType.CO) else k.astype(np.float64)
+
+        start = time.perf_counter()
+        formula = aqi.concentration_to_aqi(conc, ct, strogo = False)
+        t_formula = time.perf_counter() - start
+
+        start = time.perf_counter()
+        iz_tablice = aqi.concentration_to_aqi(conc, ct, strogo = False, tablica = True)
+        t_tablica = time.perf_counter() - start
+
+        if not np.array_equal(formula, iz_tablice, equal_nan = True):
+            greske += 1
+
+        print('{0:<12} {1:>8} {2:>10} {3:>12.3f} {4:>12.3f}'.format(ct.value, len(tablica.kod), len(razlike), t_formula, t_tablica))
+
+    if greske:
+        raise SystemExit('Tablice se ne slažu s formulom!')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,60 @@
+'''
+Poređenje brzine parsiranja stranice stanice:
+    - BeautifulSoup (raniji način u mztk.prikupi_podatke)
+    - extractor.izvuci (lxml XPath)
+
+Pokretanje (bez mreže, koristi snimljene stranice iz benchmarks/fixtures):
+    python benchmarks/bench_extractor.py [broj_ponavljanja]
+'''
+import glob
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import extractor
+
+from bs4 import BeautifulSoup
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def parsiraj_bs4(content):
+    ''' Isti postupak kao raniji mztk.prikupi_podatke '''
+    soup = BeautifulSoup(content, 'lxml')
+    vrijeme = soup.find_all('strong')[0].get_text()
+
+    values = soup.find_all('div', class_ = 'col-xs-5 data-values_value ie-old-hidden')
+    rezultat = []
+    for i in range(extractor.BROJ_VRIJEDNOSTI):
+        try:
+            rezultat.append(float(values[i].find('span').get_text()))
+        except:
+            rezultat.append(None)
+
+    return vrijeme, tuple(rezultat)
+
+def stranice_stanica():
+    for putanja in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+        with open(putanja, 'rb') as f:
+            content = f.read()
+
+        # news.html nije stranica stanice
+        if b'data-values_value' in content:
+            yield os.path.basename(putanja), content
+
+def main(ponavljanja = 200):
+    print('{0:<28} {1:>14} {2:>14} {3:>9}'.format('stranica', 'bs4 [ms]', 'xpath [ms]', 'ubrzanje'))
+
+    for ime, content in stranice_stanica():
+        stranica = extractor.izvuci(content)
+        if parsiraj_bs4(content) != (stranica.mztk_update, stranica.vrijednosti):
+            raise SystemExit('{0}: rezultati se razlikuju!'.format(ime))
+
+        t_bs4 = min(timeit.repeat(lambda: parsiraj_bs4(content), number = ponavljanja, repeat = 3)) / ponavljanja
+        t_xpath = min(timeit.repeat(lambda: extractor.izvuci(content), number = ponavljanja, repeat = 3)) / ponavljanja
+
+        print('{0:<28} {1:>14.3f} {2:>14.3f} {3:>8.1f}x'.format(ime, t_bs4 * 1000, t_xpath * 1000, t_bs4 / t_xpath))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
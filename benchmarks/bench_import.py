@@ -0,0 +1,87 @@
+'''
+Vrijeme učitavanja (import) modula, svaki put u novom procesu
+
+Za svaki modul mjeri ukupno vrijeme importa (python -X importtime), ispisuje
+najsporije podmodule i provjerava da cli i mztk pri učitavanju ne povlače
+mrežne i parserske biblioteke (requests, lxml, bs4).
+
+Izlazni kod je 1 ako neki modul prelazi cilj (--cilj, u ms) ili učitava teške module.
+
+Pokretanje:
+    python benchmarks/bench_import.py [--cilj 100] [--ponavljanja 5] [modul ...]
+'''
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+KORIJEN = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+''' Moduli koji se ne smiju učitati samim importom (učitavaju se tek pri prvom preuzimanju) '''
+TESKI = ('requests', 'urllib3', 'lxml', 'bs4', 'numpy')
+BEZ_TESKIH = ('cli', 'mztk')
+
+def importtime(modul):
+    ''' (ukupno µs, lista (µs, podmodul) za podmodule, učitani teški moduli) za jedan import u novom procesu '''
+    kod = 'import sys, {0}; print(",".join(m for m in {1!r} if m in sys.modules))'.format(modul, TESKI)
+    proces = subprocess.run([sys.executable, '-X', 'importtime', '-c', kod], cwd = KORIJEN,
+        capture_output = True, text = True, check = True)
+
+    podmoduli = []
+    ukupno = None
+    for red in proces.stderr.splitlines():
+        if not red.startswith('import time:') or 'self [us]' in red:
+            continue
+
+        _, kumulativno, ime = red.split('|')
+        if ime.strip() == 'site':
+            # Sve do sada učitao je interpreter pri pokretanju, ne modul
+            podmoduli = []
+            continue
+
+        if ime.strip() == modul:
+            ukupno = int(kumulativno)
+        podmoduli.append((int(kumulativno), ime.rstrip()))
+
+    teski = [m for m in proces.stdout.strip().split(',') if m]
+    return ukupno, podmoduli, teski
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Vrijeme učitavanja modula')
+    parser.add_argument('moduli', nargs = '*', default = ['mztk', 'aqi', 'cli'])
+    parser.add_argument('--cilj', type = float, default = 100, help = 'najduže dozvoljeno vrijeme importa [ms]')
+    parser.add_argument('--ponavljanja', type = int, default = 5)
+    parser.add_argument('--najsporijih', type = int, default = 5, help = 'broj najsporijih podmodula za ispis')
+    args = parser.parse_args(argv)
+
+    greske = 0
+    for modul in args.moduli:
+        try:
+            mjerenja = [importtime(modul) for _ in range(args.ponavljanja)]
+        except subprocess.CalledProcessError as e:
+            print('{0:<12} nije moguće učitati: {1}'.format(modul, e.stderr.strip().splitlines()[-1]))
+            continue
+
+        ms = statistics.median(m[0] for m in mjerenja) / 1000
+        teski = mjerenja[0][2]
+
+        oznaka = ''
+        if ms > args.cilj:
+            oznaka += '  <- sporije od cilja ({0:.0f} ms)'.format(args.cilj)
+            greske += 1
+        if modul in BEZ_TESKIH and teski:
+            oznaka += '  <- učitava: {0}'.format(', '.join(teski))
+            greske += 1
+
+        print('{0:<12} {1:>8.1f} ms{2}'.format(modul, ms, oznaka))
+
+        najsporiji = sorted((m for m in mjerenja[-1][1] if m[1].strip() != modul), reverse = True)[:args.najsporijih]
+        for us, ime in najsporiji:
+            print('    {0:>8.1f} ms {1}'.format(us / 1000, ime))
+
+    if greske:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+'''
+Opterećenje i greške: mztk preuzimanje stanica prema lokalnom simulatoru (simulator.py)
+
+Simulator se pokreće u posebnom procesu (ili s --u-procesu u istom, gdje dijeli GIL s klijentom),
+sa sintetičkim stanicama (sim-001, ...) koje se dodaju u mztk.gradovi. U više krugova se sve
+stanice preuzimaju paralelno (kao mztk.snapshot), uz mjerenje trajanja svake stanice.
+Preuzete vrijednosti se porede s onima koje je simulator objavio, pa se vidi i da li neka
+greška (npr. prekinut odgovor) daje pogrešne podatke umjesto izuzetka.
+
+Ispisuje protok (stanica/s), p50/p90/p99/max trajanja po stanici i po krugu, greške po vrsti,
+pogrešne vrijednosti i statistiku simulatora. Izlazni kod je 1 ako ima pogrešnih vrijednosti.
+
+Pokretanje:
+    python benchmarks/bench_load.py [--stanica 300] [--krugova 5] [--max-workers 32]
+                                    [--kasnjenje 0.05] [--greske 0.02] [--skraceno 0.01] [--nedostaje 0.01]
+                                    [--dopuna 20000] [--propusnost 0] [--rok 30] [--pokusaja 3] [--hedge 0.5]
+                                    [--cijela-stranica] [--u-procesu] [--json -]
+'''
+import argparse
+import collections
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+KORIJEN = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+sys.path.insert(0, KORIJEN)
+
+import mztk
+import simulator
+import transport
+
+def procenat(vrijednosti, p):
+    ''' p-ti percentil (0-100) sortirane liste, bez interpolacije '''
+    if not vrijednosti:
+        return math.nan
+    return vrijednosti[min(len(vrijednosti) - 1, int(len(vrijednosti) * p / 100))]
+
+def pokreni_simulator(argumenti):
+    ''' simulator.py u posebnom procesu; vraća (proces, bazni URL) kada simulator prihvata konekcije '''
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+
+    proces = subprocess.Popen([sys.executable, os.path.join(KORIJEN, 'simulator.py'), '--port', str(port)] + argumenti,
+        cwd = KORIJEN, stdout = subprocess.DEVNULL)
+
+    for _ in range(200):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout = 0.1).close()
+            return proces, 'http://127.0.0.1:{0}'.format(port)
+        except OSError:
+            time.sleep(0.05)
+
+    proces.kill()
+    raise RuntimeError('Simulator nije pokrenut.')
+
+def _preuzmi(grad):
+    pocetak = time.perf_counter()
+    rezultat = mztk._prikupi_stanicu(grad)
+    return rezultat, time.perf_counter() - pocetak
+
+def provjeri(sim, podaci):
+    ''' Broj vrijednosti koje se razlikuju od onih koje je simulator objavio za taj sat '''
+    objavljeno = sim.vrijednosti(podaci.grad, int(time.mktime(podaci.mztk_update)))
+    ocitanje = podaci.ocitanje()
+    return sum(1 for o, p in zip(objavljeno, ocitanje.vrijednosti) if (o is None) != (p != p) or (o is not None and o != p))
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Opterećenje i greške mztk preuzimanja (simulator.py)')
+    parser.add_argument('--stanica', type = int, default = 300, help = 'broj sintetičkih stanica')
+    parser.add_argument('--krugova', type = int, default = 5)
+    parser.add_argument('--max-workers', type = int, default = 32)
+    parser.add_argument('--kasnjenje', type = float, default = 0.05, help = 'medijan kašnjenja simulatora [s]')
+    parser.add_argument('--rasipanje', type = float, default = 0.5)
+    parser.add_argument('--greske', type = float, default = 0.02, help = 'udio odgovora 503')
+    parser.add_argument('--skraceno', type = float, default = 0.01, help = 'udio prekinutih odgovora')
+    parser.add_argument('--nedostaje', type = float, default = 0.01, help = 'udio vrijednosti koje nedostaju')
+    parser.add_argument('--dopuna', type = int, default = 20000, help = 'dodatni bajti na kraju stranice stanice')
+    parser.add_argument('--propusnost', type = float, default = 0, help = 'bajta/s po konekciji (0 - bez ograničenja)')
+    parser.add_argument('--rok', type = float, default = 30, help = 'transport.Transport rok [s]')
+    parser.add_argument('--pokusaja', type = int, default = 3)
+    parser.add_argument('--hedge', type = float, help = 'transport.Transport hedge [s]')
+    parser.add_argument('--bez-prekidaca', action = 'store_true', help = 'bez prekidača (sve stanice su na istom hostu)')
+    parser.add_argument('--cijela-stranica', action = 'store_true', help = 'bez čitanja u dijelovima (mztk.postavi_citanje_u_dijelovima(False))')
+    parser.add_argument('--u-procesu', action = 'store_true', help = 'simulator u istom procesu')
+    parser.add_argument('--seed', type = int, default = 2021)
+    parser.add_argument('--json', help = 'datoteka za rezultat u JSON formatu (- za stdout)')
+    args = parser.parse_args(argv)
+
+    stanice = simulator.sinteticke_stanice(args.stanica)
+    mobilne = simulator.sinteticke_mobilne(stanice)
+
+    # Vrijednosti zavise samo od stanice, sata i 'nedostaje', pa ovaj simulator služi i za provjeru
+    sim = simulator.Simulator(stanice, mobilne, kasnjenje = args.kasnjenje, rasipanje = args.rasipanje, greske = args.greske,
+        skraceno = args.skraceno, nedostaje = args.nedostaje, dopuna = args.dopuna, propusnost = args.propusnost, seed = args.seed)
+
+    proces = None
+    if args.u_procesu:
+        url = sim.pokreni_u_pozadini()
+    else:
+        proces, url = pokreni_simulator([
+            '--stanica', str(args.stanica), '--kasnjenje', str(args.kasnjenje), '--rasipanje', str(args.rasipanje),
+            '--greske', str(args.greske), '--skraceno', str(args.skraceno), '--nedostaje', str(args.nedostaje),
+            '--dopuna', str(args.dopuna), '--propusnost', str(args.propusnost), '--seed', str(args.seed)])
+
+    # Sintetičke stanice i postavke mztk / transport vrijede samo za mjerenje - poslije se vraćaju prethodne
+    gradovi = list(mztk.gradovi)
+    mobilna_gradovi = list(mztk.mobilna_gradovi)
+    memorija = mztk.memorija
+    cache = mztk.cache
+    citanje_u_dijelovima = mztk.citanje_u_dijelovima
+
+    mztk.gradovi.extend(stanice)
+    mztk.mobilna_gradovi.extend(mobilne)
+    klijent = transport.Transport(velicina_poola = args.max_workers, bazni_url = url, rok = args.rok,
+        pokusaja = args.pokusaja, hedge = args.hedge, prag_prekidaca = None if args.bez_prekidaca else 5)
+    prethodni_transport = transport.postavi_transport(klijent)
+    mztk.postavi_memoriju(None)
+    mztk.postavi_cache(None)
+    mztk.postavi_citanje_u_dijelovima(not args.cijela_stranica)
+
+    trajanja = []
+    krugovi = []
+    greske = collections.Counter()
+    pogresne = 0
+    nepotpune = 0
+    uspjesnih = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers = args.max_workers) as izvrsilac:
+            for _ in range(args.krugova):
+                pocetak = time.perf_counter()
+                rezultati = list(izvrsilac.map(_preuzmi, stanice))
+                krugovi.append(time.perf_counter() - pocetak)
+
+                for rezultat, trajanje in rezultati:
+                    trajanja.append(trajanje)
+                    if rezultat.greska is not None:
+                        greske[type(rezultat.greska).__name__] += 1
+                        continue
+
+                    uspjesnih += 1
+                    pogresne += provjeri(sim, rezultat.podaci) > 0
+                    nepotpune += rezultat.podaci.maska != mztk.reading.SVE_VAZECE
+
+        statistika = transport.get(url + '/_statistika').json()
+    finally:
+        mztk.gradovi[:] = gradovi
+        mztk.mobilna_gradovi[:] = mobilna_gradovi
+        transport.postavi_transport(prethodni_transport)
+        mztk.postavi_memoriju(memorija)
+        mztk.postavi_cache(cache)
+        mztk.postavi_citanje_u_dijelovima(citanje_u_dijelovima)
+        klijent.close()
+
+        if proces is not None:
+            proces.terminate()
+            proces.wait()
+        else:
+            sim.zaustavi()
+
+    trajanja.sort()
+
+    rezultat = {
+        'stanica': args.stanica,
+        'krugova': args.krugova,
+        'max_workers': args.max_workers,
+        'citanje_u_dijelovima': not args.cijela_stranica,
+        'protok_stanica_s': len(trajanja) / sum(krugovi),
+        'krug_s': {'p50': procenat(sorted(krugovi), 50), 'max': max(krugovi)},
+        'stanica_ms': {p: procenat(trajanja, int(p[1:])) * 1000 for p in ('p50', 'p90', 'p99')},
+        'uspjesnih': uspjesnih,
+        'greske': dict(greske),
+        'pogresne_vrijednosti': pogresne,
+        'nepotpune': nepotpune,
+        'simulator': statistika}
+    rezultat['stanica_ms']['max'] = trajanja[-1] * 1000
+
+    print('stanica: {0}, krugova: {1}, niti: {2}, čitanje u dijelovima: {3}'.format(
+        args.stanica, args.krugova, args.max_workers, 'da' if rezultat['citanje_u_dijelovima'] else 'ne'))
+    print('protok:  {0:.1f} stanica/s, krug: p50 {1:.2f} s, max {2:.2f} s'.format(
+        rezultat['protok_stanica_s'], rezultat['krug_s']['p50'], rezultat['krug_s']['max']))
+    print('stanica: p50 {p50:.1f} ms, p90 {p90:.1f} ms, p99 {p99:.1f} ms, max {max:.1f} ms'.format(**rezultat['stanica_ms']))
+    print('uspješnih: {0}, s vrijednostima koje nedostaju: {1}, pogrešnih: {2}'.format(uspjesnih, nepotpune, pogresne))
+    print('greške:  {0}'.format(', '.join('{0} {1}'.format(k, v) for k, v in greske.most_common()) or '-'))
+    print('simulator: {0}'.format(', '.join('{0} {1}'.format(k, v) for k, v in sorted(statistika.items()))))
+
+    if args.json:
+        if args.json == '-':
+            json.dump(rezultat, sys.stdout, indent = 2)
+            print()
+        else:
+            with open(args.json, 'w', encoding = 'utf-8') as f:
+                json.dump(rezultat, f, indent = 2)
+
+    if pogresne:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+'''
+Poređenje brzine NowCAST računanja:
+    - aqi.aqi.__concentration (jedan prozor po pozivu)
+    - aqi.koncentracije (svi prozori odjednom, numpy)
+
+Provjerava i da su rezultati identični.
+
+Pokretanje:
+    python benchmarks/bench_nowcast.py [broj_prozora]
+'''
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+import aqi
+
+def main(broj_prozora = 100000):
+    rng = np.random.default_rng(2021)
+    values = np.round(rng.gamma(2.0, 20.0, size = (broj_prozora, 12)), 1)
+    redovi = values.tolist()
+
+    concentration = aqi.aqi._aqi__concentration
+
+    start = time.perf_counter()
+    skalarno = [concentration(r) for r in redovi]
+    t_skalarno = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = aqi.koncentracije(values)
+    t_batch = time.perf_counter() - start
+
+    razlike = int(np.count_nonzero(batch != np.array(skalarno)))
+
+    print('prozora: {0}'.format(broj_prozora))
+    print('skalarno: {0:.3f} s ({1:.2f} µs/prozor)'.format(t_skalarno, t_skalarno / broj_prozora * 1e6))
+    print('batch:    {0:.3f} s ({1:.2f} µs/prozor)'.format(t_batch, t_batch / broj_prozora * 1e6))
+    print('ubrzanje: {0:.1f}x, razlika u rezultatima: {1}'.format(t_skalarno / t_batch, razlike))
+
+    if razlike:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
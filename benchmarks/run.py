@@ -0,0 +1,206 @@
+'''
+Mikro-benchmarkovi glavnih putanja (bez mreže, nad stranicama iz benchmarks/fixtures)
+
+Slučajevi:
+    - stanica_*             - mztk.mztk(grad): preuzimanje (iz fixture-a) i parsiranje stranice
+    - izvuci_*              - extractor.izvuci nad stranicom
+    - obavjestenja          - mztk.prikupi_obavjestenja nad news.html
+    - news_sanitizacija     - mztk.News (čišćenje HTML-a) za sva obavještenja s news.html
+    - nowcast               - aqi.aqi.__concentration (12-satni prozor)
+    - nowcast_batch         - aqi.koncentracije (1000 prozora odjednom)
+    - aqi_<polutant>        - concentration_to_aqi za svaku vrstu polutanta (formula i tablica)
+
+Rezultat je vrijeme po operaciji u µs (najbolje i medijan ponavljanja).
+
+Pokretanje:
+    python benchmarks/run.py [--json rezultat.json] [--usporedi osnova.json [--prag 0.1]] [--filter naziv]
+
+Sa --usporedi se rezultati porede s ranije snimljenim JSON-om; ako je neki slučaj
+sporiji od praga (relativno, po najboljem vremenu), izlazni kod je 1.
+'''
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+KORIJEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+sys.path.insert(0, KORIJEN)
+
+import numpy as np
+
+import aqi
+import extractor
+import mztk
+import transport
+
+class _Odgovor:
+    def __init__(self, content):
+        self.status_code = 200
+        self.content = content
+        self.headers = {}
+
+class _Fixtures:
+    ''' Transport koji stranice vraća iz benchmarks/fixtures (bez mreže) '''
+
+    def get(self, url, **kwargs):
+        with open(os.path.join(FIXTURES, url.rsplit('/', 1)[-1]), 'rb') as f:
+            return _Odgovor(f.read())
+
+    def close(self):
+        pass
+
+def _fixture(ime):
+    with open(os.path.join(FIXTURES, ime), 'rb') as f:
+        return f.read()
+
+def slucajevi():
+    ''' Lista (naziv, funkcija, broj operacija po pozivu funkcije) '''
+    rezultat = [
+        ('stanica_lukavac', lambda: mztk.mztk('lukavac'), 1),
+        ('stanica_mobilna_gradacac', lambda: mztk.mztk('gradacac'), 1)]
+
+    for ime in ['lukavac.html', 'mobilna-gradacac.html']:
+        sadrzaj = _fixture(ime)
+        rezultat.append(('izvuci_' + ime[:-5].replace('-', '_'), lambda s = sadrzaj: extractor.izvuci(s), 1))
+        rezultat.append(('izvuci_dijelovi_' + ime[:-5].replace('-', '_'),
+            lambda s = sadrzaj: extractor.izvuci_iz_dijelova(s[i:i + 4096] for i in range(0, len(s), 4096)), 1))
+
+    podaci = mztk.mztk('lukavac')
+    rezultat.append(('obavjestenja', podaci.prikupi_obavjestenja, 1))
+
+    obavjestenja = [(n.date, n.content_raw) for n in podaci.prikupi_obavjestenja()]
+    rezultat.append(('news_sanitizacija', lambda: [mztk.mztk.News(d, c) for d, c in obavjestenja], len(obavjestenja)))
+
+    rng = np.random.default_rng(2021)
+    prozori = np.round(rng.gamma(2.0, 20.0, size = (1000, 12)), 1)
+    redovi = prozori.tolist()
+    concentration = aqi.aqi._aqi__concentration
+
+    rezultat.append(('nowcast', lambda: [concentration(r) for r in redovi], len(redovi)))
+    rezultat.append(('nowcast_batch', lambda: aqi.koncentracije(prozori), len(prozori)))
+
+    for ct in aqi.CalculationType:
+        tablica = aqi.BREAKPOINTS[ct]
+        gornja = tablica.pojasevi[-1][0]
+        conc = np.round(rng.uniform(tablica.pocetak, gornja, size = 1000), 1).tolist()
+
+        def formula(conc = conc, ct = ct):
+            return [aqi.concentration_to_aqi(c, ct, strogo = False) for c in conc]
+
+        def lut(conc = conc, ct = ct):
+            return [aqi.concentration_to_aqi(c, ct, strogo = False, tablica = True) for c in conc]
+
+        rezultat.append(('aqi_' + ct.name.lower(), formula, len(conc)))
+        rezultat.append(('aqi_' + ct.name.lower() + '_tablica', lut, len(conc)))
+
+    return rezultat
+
+def izmjeri(funkcija, ponavljanja = 5, minimalno = 0.2):
+    ''' Vremena (s) jednog poziva funkcije za svako ponavljanje i broj poziva po ponavljanju '''
+    funkcija()
+
+    # Broj poziva tako da jedno ponavljanje traje bar 'minimalno' sekundi
+    poziva = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(poziva):
+            funkcija()
+        trajanje = time.perf_counter() - start
+        if trajanje >= minimalno:
+            break
+        poziva *= 2 if trajanje == 0 else max(2, int(minimalno / trajanje) + 1)
+
+    vremena = [trajanje / poziva]
+    for _ in range(ponavljanja - 1):
+        start = time.perf_counter()
+        for _ in range(poziva):
+            funkcija()
+        vremena.append((time.perf_counter() - start) / poziva)
+
+    return vremena, poziva
+
+def pokreni(filter = None, ponavljanja = 5, minimalno = 0.2, ispis = sys.stdout):
+    ''' Izvrši sve slučajeve (offline) i vrati rezultat kao dict pogodan za JSON '''
+    prethodni = transport.postavi_transport(_Fixtures())
+    prethodni_cache = mztk.cache
+    mztk.postavi_cache(None)
+
+    rezultati = {}
+    try:
+        for naziv, funkcija, operacija in slucajevi():
+            if filter and filter not in naziv:
+                continue
+
+            vremena, poziva = izmjeri(funkcija, ponavljanja, minimalno)
+            rezultati[naziv] = {
+                'najbolje_us': min(vremena) / operacija * 1e6,
+                'medijan_us': statistics.median(vremena) / operacija * 1e6,
+                'operacija': operacija,
+                'poziva': poziva,
+                'ponavljanja': ponavljanja}
+
+            if ispis is not None:
+                print('{0:<28} {1:>12.3f} {2:>12.3f}'.format(naziv, rezultati[naziv]['najbolje_us'], rezultati[naziv]['medijan_us']), file = ispis)
+    finally:
+        transport.postavi_transport(prethodni)
+        mztk.postavi_cache(prethodni_cache)
+
+    return {
+        'vrijeme': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platforma': platform.platform(),
+        'numpy': np.__version__,
+        'rezultati': rezultati}
+
+def usporedi(rezultat, osnova, prag = 0.1, ispis = sys.stdout):
+    ''' Slučajevi sporiji od osnove za više od praga, kao lista (naziv, odnos) '''
+    sporiji = []
+    for naziv, r in rezultat['rezultati'].items():
+        if naziv not in osnova['rezultati']:
+            continue
+
+        odnos = r['najbolje_us'] / osnova['rezultati'][naziv]['najbolje_us']
+        if odnos > 1 + prag:
+            sporiji.append((naziv, odnos))
+
+        if ispis is not None:
+            print('{0:<28} {1:>8.2f}x{2}'.format(naziv, odnos, '  <- sporije' if odnos > 1 + prag else ''), file = ispis)
+
+    return sporiji
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Mikro-benchmarkovi mztk (offline)')
+    parser.add_argument('--json', help = 'datoteka za rezultat u JSON formatu (- za stdout)')
+    parser.add_argument('--usporedi', help = 'JSON rezultat s kojim se poredi')
+    parser.add_argument('--prag', type = float, default = 0.1, help = 'dozvoljeno usporenje (0.1 = 10%%)')
+    parser.add_argument('--filter', help = 'samo slučajevi čiji naziv sadrži ovaj tekst')
+    parser.add_argument('--ponavljanja', type = int, default = 5)
+    parser.add_argument('--minimalno', type = float, default = 0.2, help = 'minimalno trajanje jednog ponavljanja [s]')
+    args = parser.parse_args(argv)
+
+    ispis = sys.stderr if args.json == '-' else sys.stdout
+    print('{0:<28} {1:>12} {2:>12}'.format('slučaj', 'najbolje µs', 'medijan µs'), file = ispis)
+    rezultat = pokreni(args.filter, args.ponavljanja, args.minimalno, ispis)
+
+    if args.json == '-':
+        json.dump(rezultat, sys.stdout, indent = 2)
+        print()
+    elif args.json:
+        with open(args.json, 'w', encoding = 'utf-8') as f:
+            json.dump(rezultat, f, indent = 2)
+
+    if args.usporedi:
+        with open(args.usporedi, 'r', encoding = 'utf-8') as f:
+            osnova = json.load(f)
+
+        print(file = ispis)
+        if usporedi(rezultat, osnova, args.prag, ispis):
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,53 @@
-import os
+import sys
+import threading
+import time
+
 import mztk
 
-from PyInquirer import prompt, Separator
-
-from rich.console import Console
-from rich.table import Table
-from rich.prompt import Prompt, Confirm
-from rich import box
-
-console = Console()
-
-main_screen = [
-    {
-        'type': 'list',
-        'message': 'Odaberite?',
-        'name': 'main',
-        'choices': [
-            Separator(),
-            'Unesi grad',
-            'Prikaži sve gradove',
-            Separator(),
-            'Odustani'
-        ]
-    }
-]
+''' PyInquirer, rich (konzola, tabele) i mrežni moduli (requests, lxml) se učitavaju tek kada su potrebni '''
+
+_console = None
+
+def konzola():
+    ''' rich.console.Console, napravljena pri prvom ispisu '''
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+def main_screen():
+    from PyInquirer import Separator
+
+    return [
+        {
+            'type': 'list',
+            'message': 'Odaberite?',
+            'name': 'main',
+            'choices': [
+                Separator(),
+                'Unesi grad',
+                'Prikaži sve gradove',
+                'Prati sve stanice',
+                Separator(),
+                'Odustani'
+            ]
+        }
+    ]
 
 def formatiraj_grad(unos):
     return unos.lower().strip().replace('č','c').replace('ć', 'c').replace('ž', 'z').replace(' ', '-')
 
+def prikaz(vrijednost):
+    ''' Vrijednost za tabelu; nepročitana (NaN) je '-' '''
+    return str(vrijednost) if vrijednost == vrijednost else '-'
+
 def unesi_grad():
+    from rich.prompt import Prompt
+    from rich.table import Table
+    from rich import box
+
+    console = konzola()
     grad = formatiraj_grad(Prompt.ask('Ime grada:', default = 'Lukavac'))
 
     with console.status('Prikupljam podatke...', spinner='dots'):
@@ -38,7 +57,7 @@ def unesi_grad():
             console.print("[red][bold]Greska: [/bold][/red]{0}".format(e))
             return
 
-    os.system('cls||clear')
+    console.clear()
     console.rule("http://monitoringzrakatk.info")
     console.print()
     table = Table(show_header = True, header_style = 'bold magenta', box = box.SIMPLE_HEAVY, title="[bold]{0}[/bold]".format(podaci.grad.capitalize()), expand = True, show_footer = True)
@@ -47,18 +66,20 @@ def unesi_grad():
     table.add_column('Podatak')
     table.add_column('Vrijednost', justify = 'right')
 
-    table.add_row("SO2:", str(podaci.so2) + ' µg/m³', "Relativna vlažnost", str(podaci.h) + '    %' )
-    table.add_row("NO2:", str(podaci.no2) + ' µg/m³', "Zračni pritisak", str(podaci.p) + ' mBar' )
-    table.add_row("CO:", str(podaci.co) + ' mg/m³', "Temperatura", str(podaci.t) + '   °C' )
-    table.add_row("O3:", str(podaci.o3) + ' µg/m³', "Brzina vjetra", str(podaci.ws) + '  m/s' )
-    table.add_row("PM25:", str(podaci.pm25) + ' µg/m³', "Smjer vjetra", str(podaci.wd) + '    °' )
+    o = podaci.ocitanje()
+    table.add_row("SO2:", prikaz(o.so2) + ' µg/m³', "Relativna vlažnost", prikaz(o.h) + '    %' )
+    table.add_row("NO2:", prikaz(o.no2) + ' µg/m³', "Zračni pritisak", prikaz(o.p) + ' mBar' )
+    table.add_row("CO:", prikaz(o.co) + ' mg/m³', "Temperatura", prikaz(o.t) + '   °C' )
+    table.add_row("O3:", prikaz(o.o3) + ' µg/m³', "Brzina vjetra", prikaz(o.ws) + '  m/s' )
+    table.add_row("PM25:", prikaz(o.pm25) + ' µg/m³', "Smjer vjetra", prikaz(o.wd) + '    °' )
 
     console.print(table, justify = 'center')
     console.print("Podaci su od {0} ({1}).".format(podaci.posljednja_provjera_mztk().lower(), podaci.mztk_vrijeme))
     console.rule()
 
 def prikazi_gradove():
-    os.system('cls||clear')
+    console = konzola()
+    console.clear()
     console.rule('Gradovi:')
     i = 0
     for g in mztk.gradovi:
@@ -67,11 +88,169 @@ def prikazi_gradove():
 
     unesi_grad()
 
+class _Pracenje:
+    ''' Stanje prikaza za prati(): ćelije svake stanice (tekst) i NowCAST prozor za PM2.5 '''
+
+    def __init__(self, stanice):
+        import aqi
+
+        self.stanice = stanice
+        self.celije = {g: (g.capitalize(), '-', '-', '-', '-', '-', '-', 'čekam...') for g in stanice}
+        self.prozori = {g: aqi.NowCastWindow(aqi.CalculationType.PM25) for g in stanice}
+        self.mztk_update = {}
+        self.greske = set()
+        ''' Stanice čiji posljednji sat nema NowCAST/AQI (van opsega ili nije moguće izračunati) - tekst ćelije AQI '''
+        self.bez_aqi = {}
+        self.promjena = threading.Event()
+        self.__lock = threading.Lock()
+
+    def obradi(self, rezultat, novo):
+        ''' Poziva se iz scheduler.Raspored za svaku provjerenu stanicu '''
+        import aqi
+
+        grad = rezultat.grad
+        if rezultat.greska is not None:
+            self.greske.add(grad)
+            celije = self.celije[grad][:-1] + ('[red]greška[/red]',)
+        else:
+            self.greske.discard(grad)
+            podaci = rezultat.podaci
+            o = podaci.ocitanje()
+            prozor = self.prozori[grad]
+            if novo:
+                # Rezultat prozora je tada od prethodnog sata (ili nijednog) - ne prikazuje se kao trenutni
+                self.bez_aqi.pop(grad, None)
+                try:
+                    prozor.dodaj(o.pm25, o.vrijeme)
+                except aqi.ErrorOutOfRange:
+                    self.bez_aqi[grad] = 'van opsega'
+                except (aqi.ErrorHourOrder, aqi.ErrorCalculation):
+                    self.bez_aqi[grad] = '-'
+
+            # osvjezi_starost čita mztk_update iz druge niti
+            with self.__lock:
+                self.mztk_update[grad] = time.mktime(podaci.mztk_update)
+
+            celije = (
+                grad.capitalize(),
+                prikaz(o.pm25),
+                prikaz(o.no2),
+                prikaz(o.so2),
+                prikaz(o.o3),
+                self.bez_aqi.get(grad) or self.__aqi(prozor, o.pm25),
+                podaci.mztk_vrijeme,
+                self.__starost(grad))
+
+        with self.__lock:
+            if celije != self.celije[grad]:
+                self.celije[grad] = celije
+                self.promjena.set()
+
+    def osvjezi_starost(self):
+        ''' Starost podataka se mijenja sama od sebe - ažurira se jednom u minuti '''
+        with self.__lock:
+            for grad in self.mztk_update:
+                if grad in self.greske:
+                    continue
+
+                celije = self.celije[grad][:-1] + (self.__starost(grad),)
+                if celije != self.celije[grad]:
+                    self.celije[grad] = celije
+                    self.promjena.set()
+
+    def tabela(self):
+        from rich.table import Table
+        from rich import box
+
+        table = Table(show_header = True, header_style = 'bold magenta', box = box.SIMPLE_HEAVY, title = '[bold]Sve stanice[/bold]', expand = True,
+            caption = 'AQI: NowCAST za PM2.5 (* - samo posljednji sat, dok nema podataka za 2 od 3 posljednja sata; van opsega - NowCAST iznad skale AQI)')
+        table.add_column('Stanica')
+        table.add_column('PM2.5 [µg/m³]', justify = 'right')
+        table.add_column('NO2 [µg/m³]', justify = 'right')
+        table.add_column('SO2 [µg/m³]', justify = 'right')
+        table.add_column('O3 [µg/m³]', justify = 'right')
+        table.add_column('AQI', justify = 'right')
+        table.add_column('Mjerenje', justify = 'right')
+        table.add_column('Prije', justify = 'right')
+
+        with self.__lock:
+            for grad in self.stanice:
+                table.add_row(*self.celije[grad])
+
+        return table
+
+    @staticmethod
+    def __aqi(prozor, pm25):
+        import aqi
+
+        if prozor.rezultat is not None:
+            return '{0} ({1})'.format(prozor.rezultat.aqi, prozor.rezultat.opis)
+        if pm25 != pm25:
+            return '-'
+
+        try:
+            rezultat = aqi.aqi.iz_koncentracije(pm25)
+        except (aqi.ErrorOutOfRange, aqi.ErrorCalculation):
+            return '-'
+        return '{0}* ({1})'.format(rezultat.aqi, rezultat.opis)
+
+    def __starost(self, grad):
+        return '{0} min'.format(int((time.time() - self.mztk_update[grad]) // 60))
+
+def prati(stanice = None):
+    '''
+    Tabela svih stanica koja se osvježava dok se ne prekine (Ctrl+C)
+
+    Stanice se provjeravaju u pozadini prema scheduler.Raspored (često samo oko očekivanog
+    vremena objave novih podataka), a tabela se ponovo iscrtava samo kada se neka ćelija promijeni.
+    '''
+    from rich.live import Live
+
+    import scheduler
+
+    if stanice is None:
+        stanice = mztk.gradovi
+
+    # Raspored treba svježe podatke sa stranice, ne iz memorije procesa
+    mztk.postavi_memoriju(None)
+
+    pracenje = _Pracenje(stanice)
+    zaustavi = threading.Event()
+    raspored = scheduler.Raspored(stanice)
+    pozadina = threading.Thread(target = raspored.pokreni, args = (pracenje.obradi, zaustavi), daemon = True)
+
+    console = konzola()
+    console.clear()
+    console.rule("http://monitoringzrakatk.info")
+
+    with Live(pracenje.tabela(), console = console, auto_refresh = False) as live:
+        pozadina.start()
+        try:
+            while True:
+                # Bez promjena se tabela ne iscrtava; starost podataka se provjerava jednom u minuti
+                if not pracenje.promjena.wait(60):
+                    pracenje.osvjezi_starost()
+                    if not pracenje.promjena.is_set():
+                        continue
+
+                pracenje.promjena.clear()
+                live.update(pracenje.tabela(), refresh = True)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            zaustavi.set()
+
 def main():
-    os.system('cls||clear')
+    # Ponovljeni prikaz iste stanice ne čeka mrežu (vidi mztk.Memorija)
+    mztk.postavi_memoriju(mztk.Memorija())
+
+    console = konzola()
+    console.clear()
     console.rule('[bold]Menu[/bold]')
 
-    anws = prompt(main_screen)
+    from PyInquirer import prompt
+
+    anws = prompt(main_screen())
 
     if anws.get('main') == 'Unesi grad':
         unesi_grad()
@@ -79,8 +258,15 @@ def main():
     elif anws.get('main') == 'Prikaži sve gradove':
         prikazi_gradove()
 
+    elif anws.get('main') == 'Prati sve stanice':
+        prati()
+
     else:
         exit()
 
 if __name__ == '__main__':
-    main()
+    if sys.argv[1:2] == ['watch']:
+        # python cli.py watch [stanica ...]
+        prati([formatiraj_grad(g) for g in sys.argv[2:]] or None)
+    else:
+        main()
@@ -0,0 +1,228 @@
+'''
+Izvoz mjerenja u CSV ili JSON Lines, uz NowCAST i AQI za PM2.5
+
+Mjerenja se čitaju iz pohrane kao generator, red po red, i odmah zapisuju, pa
+zauzeće memorije ne zavisi od broja mjerenja (izvoz više godina podataka radi
+isto kao izvoz jednog dana).
+
+Izvori:
+    - ring_store.RingStore (posljednjih 14 dana)
+    - storage.SqliteStore (SQLite baza)
+    - JSON Lines datoteka s mjerenjima (izlaz importer.py --jsonl), i .gz - redovi u njoj nisu
+      poredani po vremenu, pa se prije izvoza porede (po_vremenu; oko 90 bajta po mjerenju)
+
+Pokretanje:
+    python export.py --ring DIREKTORIJ | --sqlite BAZA | --jsonl DATOTEKA [--stanice lukavac,skver] [--od 2026-01-01] [--do 2026-02-01]
+                     [--format csv|jsonl] [--gzip] [-o DATOTEKA]
+'''
+import argparse
+import csv
+import gzip
+import io
+import json
+import math
+import sys
+import time
+
+import aqi
+import reading
+
+''' Kolone izvoza: mjerenje, pa izvedene vrijednosti '''
+KOLONE = ('grad', 'vrijeme', 'datum') + reading.VALUES + ('nowcast_pm25', 'aqi_pm25', 'opis_pm25')
+
+''' Koliko sati prije početka perioda se čita, da bi NowCAST od prvog sata imao pun prozor '''
+SATI_PRIJE = 11
+
+def iz_ring_store(pohrana, stanice = None, od = None, do = None):
+    ''' Mjerenja (reading.Reading) iz ring_store pohrane, po stanicama, od najstarijeg; sati bez podataka se preskaču '''
+    import numpy as np
+
+    for grad in stanice or pohrana.stanice():
+        if pohrana.zadnji_sat(grad) is None:
+            continue
+
+        kapacitet = pohrana.kapacitet_stanice(grad)
+        podaci = pohrana.posljednji(grad, kapacitet)
+        sati = pohrana.sati(grad, kapacitet)
+
+        for i in range(len(sati)):
+            vrijeme = int(sati[i])
+            if (od is not None and vrijeme < od) or (do is not None and vrijeme >= do):
+                continue
+
+            vrijednosti = podaci[:, i]
+            if np.isnan(vrijednosti).all():
+                continue
+
+            yield reading.Reading(grad, vrijeme, *vrijednosti.tolist())
+
+def iz_jsonl(putanja, stanice = None, od = None, do = None):
+    ''' Mjerenja iz JSON Lines datoteke (jedan reading.Reading._asdict() po redu, null za NaN), redoslijedom iz datoteke '''
+    stanice = set(stanice) if stanice else None
+
+    with _otvori_citanje(putanja) as f:
+        for red in f:
+            if not red.strip():
+                continue
+
+            o = reading.Reading(**{k: math.nan if v is None else v for k, v in json.loads(red).items()})
+            if stanice is not None and o.grad not in stanice:
+                continue
+            if (od is not None and o.vrijeme < od) or (do is not None and o.vrijeme >= do):
+                continue
+
+            yield o
+
+def po_vremenu(ocitanja):
+    ''' Mjerenja poredana po stanici i vremenu; sva se drže u reading.Readings (oko 90 bajta po mjerenju) '''
+    sva = reading.Readings(ocitanja)
+    grad = sva.kolona('grad')
+    vrijeme = sva.kolona('vrijeme')
+
+    # Redoslijed stanica po imenu (kao storage.SqliteStore.ocitanja)
+    rang = {i: r for r, i in enumerate(sorted(range(len(sva.stanice)), key = sva.stanice.__getitem__))}
+
+    for i in sorted(range(len(sva)), key = lambda i: (rang[grad[i]], vrijeme[i])):
+        yield sva[i]
+
+def sa_aqi(ocitanja, od = None):
+    '''
+    Dodaj NowCAST i AQI za PM2.5 svakom mjerenju; vraća generator dict-ova s kolonama KOLONE
+
+    Za svaku stanicu se drži samo aqi.NowCastWindow (12 sati), pa memorija ne raste s brojem mjerenja.
+    Mjerenja prije 'od' se koriste samo za NowCAST i ne vraćaju se.
+    Mjerenja jedne stanice moraju dolaziti od najstarijeg prema najnovijem (vidi po_vremenu);
+    mjerenje koje nije novije od prethodnog iste stanice dobija None umjesto NowCAST i AQI.
+    '''
+    prozori = {}
+
+    for o in ocitanja:
+        prozor = prozori.get(o.grad)
+        if prozor is None:
+            prozor = prozori[o.grad] = aqi.NowCastWindow(aqi.CalculationType.PM25)
+
+        rezultat = None
+        try:
+            rezultat = prozor.dodaj(o.pm25, o.vrijeme)
+        except aqi.ErrorHourOrder:
+            # Isti ili stariji sat (duplikat ili neporedan izvor) - rezultat prozora je za noviji sat
+            pass
+        except (aqi.ErrorOutOfRange, aqi.ErrorCalculation):
+            pass
+
+        if od is not None and o.vrijeme < od:
+            continue
+
+        red = o._asdict()
+        red['datum'] = time.strftime('%Y-%m-%d %H:%M', time.localtime(o.vrijeme))
+        red['nowcast_pm25'] = prozor.koncentracija if rezultat is not None else None
+        red['aqi_pm25'] = rezultat.aqi if rezultat is not None else None
+        red['opis_pm25'] = rezultat.opis if rezultat is not None else None
+
+        yield red
+
+def pisi_csv(redovi, izlaz):
+    ''' Zapiši redove (dict) kao CSV sa zaglavljem KOLONE; vraća broj redova '''
+    pisac = csv.writer(izlaz)
+    pisac.writerow(KOLONE)
+
+    broj = 0
+    for red in redovi:
+        pisac.writerow(['' if _prazno(red[k]) else red[k] for k in KOLONE])
+        broj += 1
+
+    return broj
+
+def pisi_jsonl(redovi, izlaz):
+    ''' Zapiši redove (dict) kao JSON Lines (NaN kao null); vraća broj redova '''
+    broj = 0
+    for red in redovi:
+        izlaz.write(json.dumps({k: None if _prazno(red[k]) else red[k] for k in KOLONE}, ensure_ascii = False))
+        izlaz.write('\n')
+        broj += 1
+
+    return broj
+
+def izvezi(ocitanja, izlaz, format = 'csv', od = None):
+    ''' Cijeli put: mjerenja -> NowCAST/AQI -> CSV ili JSON Lines u izlaz (tekstualni fajl); vraća broj redova '''
+    redovi = sa_aqi(ocitanja, od)
+    if format == 'csv':
+        return pisi_csv(redovi, izlaz)
+    elif format == 'jsonl':
+        return pisi_jsonl(redovi, izlaz)
+
+    raise ValueError("Nepoznat format '{0}' (csv ili jsonl).".format(format))
+
+def otvori_izlaz(putanja = None, komprimuj = False):
+    ''' Tekstualni izlaz za izvezi: datoteka ili stdout (putanja None ili '-'), po potrebi gzip '''
+    if putanja in (None, '-'):
+        if komprimuj:
+            return io.TextIOWrapper(gzip.GzipFile(fileobj = sys.stdout.buffer, mode = 'wb'), encoding = 'utf-8', newline = '')
+        sys.stdout.reconfigure(encoding = 'utf-8', newline = '')
+        return sys.stdout
+
+    if komprimuj or putanja.endswith('.gz'):
+        return gzip.open(putanja, 'wt', encoding = 'utf-8', newline = '')
+
+    return open(putanja, 'w', encoding = 'utf-8', newline = '')
+
+def _otvori_citanje(putanja):
+    if putanja == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding = 'utf-8')
+    if putanja.endswith('.gz'):
+        return gzip.open(putanja, 'rt', encoding = 'utf-8')
+    return open(putanja, 'r', encoding = 'utf-8')
+
+def _prazno(vrijednost):
+    # None ili NaN (NaN jedini nije jednak sam sebi)
+    return vrijednost is None or vrijednost != vrijednost
+
+def vrijeme(tekst):
+    ''' Epoch sekunde iz 'YYYY-MM-DD' ili 'YYYY-MM-DD HH:MM' (lokalno vrijeme) '''
+    for format in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return int(time.mktime(time.strptime(tekst, format)))
+        except ValueError:
+            pass
+
+    raise argparse.ArgumentTypeError("Neispravno vrijeme '{0}' (YYYY-MM-DD ili 'YYYY-MM-DD HH:MM').".format(tekst))
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Izvoz mjerenja MZTK u CSV ili JSON Lines')
+    izvor = parser.add_mutually_exclusive_group(required = True)
+    izvor.add_argument('--ring', help = 'direktorij ring_store pohrane')
+    izvor.add_argument('--sqlite', help = 'SQLite baza (storage.SqliteStore)')
+    izvor.add_argument('--jsonl', help = 'JSON Lines datoteka s mjerenjima (izlaz importer.py)')
+    parser.add_argument('--stanice', help = 'stanice odvojene zarezom (sve ako nije navedeno)')
+    parser.add_argument('--od', type = vrijeme, help = 'početak perioda (uključen)')
+    parser.add_argument('--do', type = vrijeme, help = 'kraj perioda (nije uključen)')
+    parser.add_argument('--format', choices = ['csv', 'jsonl'], default = 'csv')
+    parser.add_argument('--gzip', action = 'store_true', help = 'komprimuj izlaz (uključeno i za -o *.gz)')
+    parser.add_argument('-o', '--izlaz', default = '-', help = 'izlazna datoteka (- za stdout)')
+    args = parser.parse_args(argv)
+
+    stanice = [s.strip().lower() for s in args.stanice.split(',')] if args.stanice else None
+    citaj_od = args.od - SATI_PRIJE * 3600 if args.od is not None else None
+
+    if args.ring:
+        import ring_store
+        ocitanja = iz_ring_store(ring_store.RingStore(args.ring, samo_citanje = True), stanice, citaj_od, args.do)
+    elif args.sqlite:
+        import storage
+        ocitanja = storage.SqliteStore(args.sqlite).ocitanja(stanice, citaj_od, args.do)
+    else:
+        ocitanja = po_vremenu(iz_jsonl(args.jsonl, stanice, citaj_od, args.do))
+
+    izlaz = otvori_izlaz(args.izlaz, args.gzip)
+    try:
+        broj = izvezi(ocitanja, izlaz, args.format, args.od)
+    finally:
+        if izlaz is sys.stdout:
+            izlaz.flush()
+        else:
+            izlaz.close()
+
+    print("Izvezeno redova: {0}".format(broj), file = sys.stderr)
+
+if __name__ == '__main__':
+    main()
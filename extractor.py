@@ -0,0 +1,173 @@
+import math
+import time
+
+from typing import NamedTuple, Optional
+
+from lxml import etree
+
+import reading
+
+''' Klasa div elementa u kojem se nalazi izmjerena vrijednost (unutar prvog <span>) '''
+KLASA_VRIJEDNOSTI = 'col-xs-5 data-values_value ie-old-hidden'
+BROJ_VRIJEDNOSTI = 10
+
+_XPATH_VRIJEME = etree.XPath('string((//strong)[1])')
+_XPATH_VRIJEDNOSTI = etree.XPath('//div[@class = $klasa]')
+_XPATH_SPAN = etree.XPath('string((.//span)[1])')
+
+class PageFormatError(Exception):
+    def __init__(self):
+        super().__init__("Stranica nema očekivani format (nije pronađeno vrijeme mjerenja).")
+
+class StranicaStanice(NamedTuple):
+    '''
+    Podaci izvučeni sa stranice stanice
+    Vrijednost koju nije moguće pročitati je None
+    '''
+    mztk_update: str                # '%d.%m.%Y %H:%M', tekst iz prvog <strong>
+    so2: Optional[float] = None
+    no2: Optional[float] = None
+    co: Optional[float] = None
+    o3: Optional[float] = None
+    pm25: Optional[float] = None
+    h: Optional[float] = None
+    p: Optional[float] = None
+    t: Optional[float] = None
+    ws: Optional[float] = None
+    wd: Optional[float] = None
+
+    @property
+    def vrijednosti(self):
+        ''' Vrijednosti u redoslijedu mztk.values '''
+        return self[1:]
+
+    def ocitanje(self, grad):
+        ''' Podaci kao reading.Reading (vrijednosti koje nije moguće pročitati su NaN) '''
+        vrijeme = int(time.mktime(time.strptime(self.mztk_update, '%d.%m.%Y %H:%M')))
+        return reading.Reading(grad, vrijeme, *(v if v is not None else math.nan for v in self.vrijednosti))
+
+class _Cilj:
+    '''
+    Target za lxml HTMLParser: iste vrijednosti kao izdvoji (tekst prvog <strong> i prvog <span>
+    u svakom div-u s klasom KLASA_VRIJEDNOSTI), ali iz događaja parsera, bez izgradnje stabla
+    '''
+
+    def __init__(self):
+        self.vrijeme = None
+        self.divovi = []            # po div-u s vrijednošću: [tekst, stanje prvog <span>]
+        self.__strong = 0           # dubina unutar prvog <strong>
+        self.__tekst_strong = []
+        self.__otvoreni = []        # otvoreni div-ovi: indeks u divovi, ili None za ostale
+        self.__zatvorenih = 0       # broj div-ova s vrijednošću koji su zatvoreni
+
+    # Stanje prvog <span>: 0 - još nije pronađen, > 0 - dubina unutar njega, -1 - pročitan
+
+    @property
+    def gotovo(self):
+        return self.vrijeme is not None and self.__zatvorenih >= BROJ_VRIJEDNOSTI and \
+            all(i is None or i >= BROJ_VRIJEDNOSTI for i in self.__otvoreni)
+
+    @property
+    def vrijednosti(self):
+        return [_broj(''.join(tekst)) for tekst, _ in self.divovi[:BROJ_VRIJEDNOSTI]]
+
+    def start(self, tag, attrib):
+        if tag == 'strong' and self.vrijeme is None:
+            self.__strong += 1
+        elif tag == 'div':
+            if attrib.get('class') == KLASA_VRIJEDNOSTI:
+                self.__otvoreni.append(len(self.divovi))
+                self.divovi.append([[], 0])
+            else:
+                self.__otvoreni.append(None)
+        elif tag == 'span':
+            for i in self.__otvoreni:
+                if i is not None and self.divovi[i][1] >= 0:
+                    self.divovi[i][1] += 1
+
+    def end(self, tag):
+        if tag == 'strong' and self.__strong:
+            self.__strong -= 1
+            if self.__strong == 0:
+                self.vrijeme = ''.join(self.__tekst_strong).strip()
+        elif tag == 'div' and self.__otvoreni:
+            if self.__otvoreni.pop() is not None:
+                self.__zatvorenih += 1
+        elif tag == 'span':
+            for i in self.__otvoreni:
+                if i is not None and self.divovi[i][1] > 0:
+                    self.divovi[i][1] -= 1
+                    if self.divovi[i][1] == 0:
+                        self.divovi[i][1] = -1
+
+    def data(self, data):
+        if self.__strong:
+            self.__tekst_strong.append(data)
+        for i in self.__otvoreni:
+            if i is not None and self.divovi[i][1] > 0:
+                self.divovi[i][0].append(data)
+
+    def close(self):
+        pass
+
+def izvuci(content):
+    ''' Izvuci vrijeme mjerenja i vrijednosti iz HTML-a stranice stanice (bytes ili str) '''
+    return izdvoji(parsiraj(content))
+
+def izvuci_iz_dijelova(dijelovi):
+    '''
+    Kao izvuci, ali iz niza dijelova HTML-a (npr. requests.Response.iter_content)
+
+    Dijelovi se parsiraju kako stižu, bez izgradnje stabla, a čitanje se prekida čim su
+    pronađeni vrijeme mjerenja i sve vrijednosti - ostatak stranice se ne čita.
+    '''
+    cilj = _Cilj()
+    parser = etree.HTMLParser(target = cilj)
+
+    procitano = False
+    for dio in dijelovi:
+        if not dio:
+            continue
+
+        procitano = True
+        parser.feed(dio)
+        if cilj.gotovo:
+            break
+
+    if procitano:
+        parser.close()
+
+    if not cilj.vrijeme:
+        raise PageFormatError
+
+    vrijednosti = cilj.vrijednosti
+    return StranicaStanice(cilj.vrijeme, *(vrijednosti + [None] * (BROJ_VRIJEDNOSTI - len(vrijednosti))))
+
+def parsiraj(content):
+    ''' HTML stranice (bytes ili str) kao lxml stablo '''
+    if not content:
+        raise PageFormatError
+
+    root = etree.HTML(content)
+    if root is None:
+        raise PageFormatError
+
+    return root
+
+def izdvoji(root):
+    ''' Vrijeme mjerenja i vrijednosti iz stabla koje vraća parsiraj '''
+    vrijeme = _XPATH_VRIJEME(root).strip()
+    if not vrijeme:
+        raise PageFormatError
+
+    vrijednosti = [None] * BROJ_VRIJEDNOSTI
+    for i, div in enumerate(_XPATH_VRIJEDNOSTI(root, klasa = KLASA_VRIJEDNOSTI)[:BROJ_VRIJEDNOSTI]):
+        vrijednosti[i] = _broj(_XPATH_SPAN(div))
+
+    return StranicaStanice(vrijeme, *vrijednosti)
+
+def _broj(tekst):
+    try:
+        return float(tekst)
+    except ValueError:
+        return None
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import threading
+
+class HttpCache:
+    '''
+    Keš HTTP odgovora na disku, za uslovne zahtjeve (If-None-Match / If-Modified-Since)
+
+    Za svaki URL se čuva ETag i Last-Modified posljednjeg odgovora, zajedno s već
+    prikupljenim (parsiranim) podacima. Kada server odgovori s 304 Not Modified,
+    podaci se vraćaju iz keša bez ponovnog preuzimanja i parsiranja stranice.
+
+    @param: direktorij - direktorij u kojem se čuvaju zapisi (jedna JSON datoteka po URL-u)
+    '''
+
+    def __init__(self, direktorij):
+        self.direktorij = os.path.expanduser(direktorij)
+        os.makedirs(self.direktorij, exist_ok = True)
+
+        self.__zapisi = {}
+        self.__lock = threading.Lock()
+
+    def zaglavlja(self, url):
+        ''' Zaglavlja za uslovni zahtjev (prazan dict ako URL nije u kešu) '''
+        zapis = self.procitaj(url)
+        if zapis is None:
+            return {}
+
+        headers = {}
+        if zapis.get('etag'):
+            headers['If-None-Match'] = zapis['etag']
+        if zapis.get('last_modified'):
+            headers['If-Modified-Since'] = zapis['last_modified']
+
+        return headers
+
+    def procitaj(self, url):
+        ''' Zapis za URL (dict s ključevima etag, last_modified, podaci) ili None '''
+        with self.__lock:
+            if url in self.__zapisi:
+                return self.__zapisi[url]
+
+        try:
+            with open(self.__putanja(url), 'r', encoding = 'utf-8') as f:
+                zapis = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        with self.__lock:
+            self.__zapisi[url] = zapis
+
+        return zapis
+
+    def zapisi(self, url, odgovor, podaci):
+        ''' Sačuvaj validatore iz odgovora i prikupljene podatke (ako server ne šalje validatore, ništa se ne čuva) '''
+        etag = odgovor.headers.get('ETag')
+        last_modified = odgovor.headers.get('Last-Modified')
+        if etag is None and last_modified is None:
+            return
+
+        zapis = {'url': url, 'etag': etag, 'last_modified': last_modified, 'podaci': podaci}
+
+        putanja = self.__putanja(url)
+        privremena = '{0}.{1}.tmp'.format(putanja, threading.get_ident())
+        with open(privremena, 'w', encoding = 'utf-8') as f:
+            json.dump(zapis, f)
+        os.replace(privremena, putanja)
+
+        with self.__lock:
+            self.__zapisi[url] = zapis
+
+    def obrisi(self):
+        ''' Obriši sve zapise '''
+        with self.__lock:
+            self.__zapisi = {}
+
+        for ime in os.listdir(self.direktorij):
+            if ime.endswith('.json'):
+                os.remove(os.path.join(self.direktorij, ime))
+
+    def __putanja(self, url):
+        return os.path.join(self.direktorij, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
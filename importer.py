@@ -0,0 +1,225 @@
+'''
+Uvoz snimljenih stranica stanica ('<grad>.html' / 'mobilna-<grad>.html')
+
+Stranice se čitaju iz direktorija (i poddirektorija) ili tar arhive i parsiraju u više
+procesa, u dijelovima. Mjerenja se filtriraju po (stanica, vrijeme mjerenja) i odmah
+šalju u odredište, pa se cijela arhiva nikad ne drži u memoriji.
+Neispravne stranice se preskaču i prijavljuju, bez gubitka ostatka dijela.
+
+Pokretanje:
+    python importer.py ARHIVA --ring DIREKTORIJ
+    python importer.py ARHIVA --jsonl DATOTEKA
+    python importer.py ARHIVA --sqlite BAZA
+'''
+import argparse
+import json
+import os
+import sys
+import tarfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import extractor
+import mztk
+
+class Statistika:
+    def __init__(self):
+        self.stranica = 0
+        self.ocitanja = 0
+        self.duplikata = 0
+        self.preskoceno = 0
+        self.greske = []
+        self.pocetak = time.perf_counter()
+
+    def stranica_u_sekundi(self):
+        trajanje = time.perf_counter() - self.pocetak
+        return self.stranica / trajanje if trajanje > 0 else 0
+
+    def __str__(self):
+        return "Stranica: {0} ({1:.0f}/s), mjerenja: {2}, duplikata: {3}, preskočeno: {4}, neispravnih: {5}".format(
+            self.stranica,
+            self.stranica_u_sekundi(),
+            self.ocitanja,
+            self.duplikata,
+            self.preskoceno,
+            len(self.greske))
+
+def stanica(ime):
+    ''' Stanica iz imena datoteke ('lukavac.html' -> 'lukavac', 'mobilna-celic.html' -> 'celic'), ili None '''
+    ime = os.path.basename(ime)
+    if not ime.endswith('.html'):
+        return None
+
+    grad = ime[:-5].lower()
+    if grad.startswith('mobilna-') and grad[8:] in mztk.mobilna_gradovi:
+        return grad[8:]
+
+    if grad in mztk.gradovi:
+        return grad
+
+    return None
+
+def stavke(izvor):
+    '''
+    Stranice iz izvora kao (ime, putanja) za direktorij, odnosno (ime, bytes) za tar arhivu
+    Datoteke koje nisu stranice stanica se vraćaju s None umjesto sadržaja
+    '''
+    if os.path.isdir(izvor):
+        for korijen, direktoriji, datoteke in os.walk(izvor):
+            direktoriji.sort()
+            for ime in sorted(datoteke):
+                putanja = os.path.join(korijen, ime)
+                yield putanja, putanja if stanica(ime) else None
+        return
+
+    with tarfile.open(izvor, 'r:*') as tar:
+        for clan in tar:
+            if not clan.isfile():
+                continue
+
+            if stanica(clan.name) is None:
+                yield clan.name, None
+                continue
+
+            yield clan.name, tar.extractfile(clan).read()
+
+def parsiraj_dio(dio):
+    ''' Parsiraj dio stranica (izvršava se u radnom procesu); vraća (mjerenja, greške) '''
+    ocitanja = []
+    greske = []
+
+    for ime, sadrzaj in dio:
+        try:
+            if isinstance(sadrzaj, str):
+                with open(sadrzaj, 'rb') as f:
+                    sadrzaj = f.read()
+
+            ocitanja.append(extractor.izvuci(sadrzaj).ocitanje(stanica(ime)))
+        except Exception as e:
+            greske.append((ime, repr(e)))
+
+    return ocitanja, greske
+
+def _dijelovi(izvor, velicina_dijela, statistika):
+    dio = []
+    for ime, sadrzaj in stavke(izvor):
+        if sadrzaj is None:
+            statistika.preskoceno += 1
+            continue
+
+        dio.append((ime, sadrzaj))
+        if len(dio) == velicina_dijela:
+            yield dio
+            dio = []
+
+    if dio:
+        yield dio
+
+def uvezi(izvor, odrediste, procesa = None, velicina_dijela = 200, izvjestaj = None):
+    '''
+    Uvezi sve stranice iz izvora (direktorij ili tar arhiva)
+
+    @param: odrediste - funkcija koja prima listu reading.Reading (poziva se za svaki dio)
+    @param: procesa - broj radnih procesa (os.cpu_count() ako nije navedeno)
+    @param: velicina_dijela - broj stranica koje jedan proces parsira odjednom
+    @param: izvjestaj - funkcija koja se poziva sa Statistika nakon svakog dijela
+
+    Vraća Statistika.
+    '''
+    statistika = Statistika()
+    vidjeno = set()
+    procesa = procesa or os.cpu_count() or 1
+
+    def obradi(buducnost):
+        ocitanja, greske = buducnost.result()
+        statistika.greske.extend(greske)
+        statistika.stranica += len(ocitanja) + len(greske)
+
+        nova = []
+        for o in ocitanja:
+            kljuc = (o.grad, o.vrijeme)
+            if kljuc in vidjeno:
+                statistika.duplikata += 1
+                continue
+
+            vidjeno.add(kljuc)
+            nova.append(o)
+
+        if nova:
+            odrediste(nova)
+            statistika.ocitanja += len(nova)
+
+        if izvjestaj is not None:
+            izvjestaj(statistika)
+
+    with ProcessPoolExecutor(max_workers = procesa) as pool:
+        u_toku = set()
+        for dio in _dijelovi(izvor, velicina_dijela, statistika):
+            # Najviše dva dijela po procesu čekaju na obradu
+            while len(u_toku) >= 2 * procesa:
+                gotovi, u_toku = wait(u_toku, return_when = FIRST_COMPLETED)
+                for b in gotovi:
+                    obradi(b)
+
+            u_toku.add(pool.submit(parsiraj_dio, dio))
+
+        for b in u_toku:
+            obradi(b)
+
+    return statistika
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Uvoz snimljenih stranica stanica MZTK')
+    parser.add_argument('izvor', help = 'direktorij ili tar arhiva sa stranicama')
+    parser.add_argument('--ring', help = 'direktorij ring_store pohrane')
+    parser.add_argument('--jsonl', help = 'datoteka za mjerenja u JSON Lines formatu (- za stdout)')
+    parser.add_argument('--sqlite', help = 'SQLite baza (storage.SqliteStore)')
+    parser.add_argument('--procesa', type = int, default = None)
+    parser.add_argument('--dio', type = int, default = 200, help = 'broj stranica po dijelu')
+    args = parser.parse_args(argv)
+
+    if args.ring:
+        import ring_store
+        pohrana = ring_store.RingStore(args.ring)
+
+        def odrediste(ocitanja):
+            for o in ocitanja:
+                pohrana.zapisi_ocitanje(o)
+
+    elif args.sqlite:
+        import storage
+        pohrana = storage.SqliteStore(args.sqlite)
+
+        def odrediste(ocitanja):
+            pohrana.zapisi_sve(ocitanja)
+
+    elif args.jsonl:
+        izlaz = sys.stdout if args.jsonl == '-' else open(args.jsonl, 'a', encoding = 'utf-8')
+
+        def odrediste(ocitanja):
+            for o in ocitanja:
+                # Nepročitana vrijednost (NaN) kao null, da bi red bio ispravan JSON
+                izlaz.write(json.dumps({k: None if v != v else v for k, v in o._asdict().items()}) + '\n')
+
+    else:
+        parser.error('potrebno je navesti odredište (--ring, --sqlite ili --jsonl)')
+
+    def izvjestaj(statistika):
+        print('\r' + str(statistika), end = '', file = sys.stderr, flush = True)
+
+    statistika = uvezi(args.izvor, odrediste, args.procesa, args.dio, izvjestaj)
+    print('\r' + str(statistika), file = sys.stderr)
+
+    for ime, greska in statistika.greske:
+        print("Neispravna stranica: {0} ({1})".format(ime, greska), file = sys.stderr)
+
+    if args.ring:
+        pohrana.flush()
+    elif args.sqlite:
+        pohrana.close()
+    elif args.jsonl and args.jsonl != '-':
+        izlaz.close()
+
+if __name__ == '__main__':
+    main()
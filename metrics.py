@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+
+''' Granice histograma trajanja faza (sekunde) '''
+GRANICE = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Metrike:
+    '''
+    Brojači i histogrami trajanja faza prikupljanja, s ispisom u Prometheus tekstualnom formatu
+
+    Funkcije:
+        - brojac(ime, vrijednost, **oznake)     - Povećaj brojač (npr. 'mztk_preuzeto_bytes_total')
+        - trajanje(faza, sekundi, **oznake)     - Upiši trajanje faze u histogram 'mztk_faza_seconds'
+        - prometheus()                          - Sve metrike u Prometheus tekstualnom formatu
+        - zapisi(putanja)                       - Zapiši prometheus() u datoteku (za node_exporter textfile)
+        - posluzi(port, adresa)                 - HTTP endpoint /metrics u pozadinskoj niti
+    '''
+
+    def __init__(self, granice = GRANICE):
+        self.granice = tuple(granice)
+        self.__brojaci = {}
+        self.__histogrami = {}
+        self.__lock = threading.Lock()
+
+    def brojac(self, ime, vrijednost = 1, **oznake):
+        kljuc = (ime, tuple(sorted(oznake.items())))
+        with self.__lock:
+            self.__brojaci[kljuc] = self.__brojaci.get(kljuc, 0) + vrijednost
+
+    def trajanje(self, faza, sekundi, **oznake):
+        kljuc = tuple(sorted(dict(oznake, faza = faza).items()))
+        with self.__lock:
+            histogram = self.__histogrami.get(kljuc)
+            if histogram is None:
+                # [broj po granici..., +Inf, suma]
+                histogram = self.__histogrami[kljuc] = [0] * (len(self.granice) + 1) + [0.0]
+
+            for i, granica in enumerate(self.granice):
+                if sekundi <= granica:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[len(self.granice)] += 1
+
+            histogram[-1] += sekundi
+
+    def vrijednost(self, ime, **oznake):
+        ''' Trenutna vrijednost brojača (0 ako nije bilo događaja) '''
+        with self.__lock:
+            return self.__brojaci.get((ime, tuple(sorted(oznake.items()))), 0)
+
+    def prometheus(self):
+        with self.__lock:
+            brojaci = sorted(self.__brojaci.items())
+            histogrami = sorted((k, list(h)) for k, h in self.__histogrami.items())
+
+        redovi = []
+        prethodno = None
+        for (ime, oznake), vrijednost in brojaci:
+            if ime != prethodno:
+                redovi.append('# TYPE {0} counter'.format(ime))
+                prethodno = ime
+            redovi.append('{0}{1} {2}'.format(ime, _oznake(oznake), _broj(vrijednost)))
+
+        if histogrami:
+            redovi.append('# HELP mztk_faza_seconds Trajanje faze prikupljanja (preuzimanje, odziv, parsiranje, izdvajanje, aqi, snapshot)')
+            redovi.append('# TYPE mztk_faza_seconds histogram')
+
+        for oznake, histogram in histogrami:
+            ukupno = 0
+            for granica, broj in zip(self.granice, histogram):
+                ukupno += broj
+                redovi.append('mztk_faza_seconds_bucket{0} {1}'.format(_oznake(oznake + (('le', _broj(granica)),)), ukupno))
+
+            ukupno += histogram[len(self.granice)]
+            redovi.append('mztk_faza_seconds_bucket{0} {1}'.format(_oznake(oznake + (('le', '+Inf'),)), ukupno))
+            redovi.append('mztk_faza_seconds_sum{0} {1}'.format(_oznake(oznake), _broj(histogram[-1])))
+            redovi.append('mztk_faza_seconds_count{0} {1}'.format(_oznake(oznake), ukupno))
+
+        return '\n'.join(redovi) + '\n'
+
+    def zapisi(self, putanja):
+        ''' Zapiši metrike u datoteku (atomski, pa čitač nikad ne vidi pola datoteke) '''
+        putanja = os.path.expanduser(putanja)
+        privremena = putanja + '.tmp'
+        with open(privremena, 'w', encoding = 'utf-8') as f:
+            f.write(self.prometheus())
+        os.replace(privremena, putanja)
+
+    def posluzi(self, port = 9108, adresa = ''):
+        ''' Pokreni HTTP server s metrikama na /metrics; vraća server (server.shutdown() ga zaustavlja) '''
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrike = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                tijelo = metrike.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(tijelo)))
+                self.end_headers()
+                self.wfile.write(tijelo)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((adresa, port), Handler)
+        threading.Thread(target = server.serve_forever, daemon = True).start()
+        return server
+
+def _oznake(oznake):
+    if not oznake:
+        return ''
+
+    return '{' + ','.join('{0}="{1}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in oznake) + '}'
+
+def _broj(vrijednost):
+    return repr(float(vrijednost)) if isinstance(vrijednost, float) else str(vrijednost)
+
+class _Mjerenje:
+    ''' Kontekst koji mjeri trajanje faze i prijavljuje ga metrikama i kukama '''
+    __slots__ = ('faza', 'oznake', 'pocetak')
+
+    def __init__(self, faza, oznake):
+        self.faza = faza
+        self.oznake = oznake
+
+    def __enter__(self):
+        self.pocetak = time.perf_counter()
+        return self
+
+    def __exit__(self, tip, greska, tb):
+        _zabiljezi(self.faza, time.perf_counter() - self.pocetak, self.oznake, greska)
+        return False
+
+class _BezMjerenja:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tip, greska, tb):
+        return False
+
+_BEZ_MJERENJA = _BezMjerenja()
+
+''' Metrike (None dok se ne uključe) i kuke - dok nije ništa od toga postavljeno, mjerenje ne košta gotovo ništa '''
+_metrike = None
+_kuke = []
+
+def ukljuci(metrike = None):
+    ''' Uključi prikupljanje metrika (nova Metrike ako nije zadana); vraća aktivne metrike '''
+    global _metrike
+    _metrike = metrike if metrike is not None else Metrike()
+    return _metrike
+
+def iskljuci():
+    global _metrike
+    _metrike = None
+
+def dohvati_metrike():
+    ''' Aktivne metrike, ili None ako nisu uključene '''
+    return _metrike
+
+def dodaj_kuku(kuka):
+    '''
+    Dodaj funkciju koja se poziva nakon svake izmjerene faze:
+        kuka(faza, trajanje, oznake, greska)
+    faza je 'preuzimanje', 'odziv', 'parsiranje', 'izdvajanje', 'aqi' ili 'snapshot', trajanje u sekundama,
+    oznake dict (npr. {'stanica': 'lukavac'}), a greska izuzetak ako je faza završila greškom (inače None)
+    '''
+    _kuke.append(kuka)
+
+def ukloni_kuku(kuka):
+    _kuke.remove(kuka)
+
+def mjeri(faza, **oznake):
+    ''' Kontekst (with) koji mjeri trajanje faze '''
+    if _metrike is None and not _kuke:
+        return _BEZ_MJERENJA
+
+    return _Mjerenje(faza, oznake)
+
+def brojac(ime, vrijednost = 1, **oznake):
+    ''' Povećaj brojač u aktivnim metrikama (ništa ako nisu uključene) '''
+    metrike = _metrike
+    if metrike is not None:
+        metrike.brojac(ime, vrijednost, **oznake)
+
+def zabiljezi(faza, trajanje, greska = None, **oznake):
+    ''' Prijavi trajanje faze izmjereno na drugi način (npr. response.elapsed) '''
+    if _metrike is not None or _kuke:
+        _zabiljezi(faza, trajanje, oznake, greska)
+
+def _zabiljezi(faza, trajanje, oznake, greska):
+    metrike = _metrike
+    if metrike is not None:
+        metrike.trajanje(faza, trajanje, **oznake)
+        if greska is not None:
+            metrike.brojac('mztk_greske_faze_total', faza = faza, vrsta = type(greska).__name__, **oznake)
+
+    for kuka in list(_kuke):
+        kuka(faza, trajanje, oznake, greska)
@@ -2,6 +2,8 @@
 
 import requests
 import time
+import transport
+import extractor
 import math
 
 from bs4 import BeautifulSoup
@@ -39,9 +41,9 @@ class monitoringzraka(object):
     def prikupi_gradove(self):
         ''' Prikupi sve moguće gradove sa stranice '''
         try:
-            page = requests.get(self.url)
+            page = transport.get(self.url)
 
-        except requests.RequestException as e:
+        except (requests.RequestException, transport.ErrorTransport) as e:
             return e
 
         soup = BeautifulSoup(page.content, 'lxml')
@@ -60,62 +62,14 @@ class monitoringzraka(object):
             return 
 
         try:
-            page = requests.get('{0}{1}.html'.format(self.url, self.grad))
-        except requests.RequestException as e:
+            page = transport.get('{0}{1}.html'.format(self.url, self.grad))
+        except (requests.RequestException, transport.ErrorTransport) as e:
             raise SiteUnavailable(e)
 
-        soup = BeautifulSoup(page.content, 'lxml')
+        stranica = extractor.izvuci(page.content)
         self.__update = time.localtime(time.time())
-        self.vrijeme = time.strftime('%H:%M', time.strptime(soup.find_all('strong')[0].get_text(), '%d.%m.%Y %H:%M'))
-        self.datum = time.strftime('%Y-%m-%d', time.strptime(soup.find_all('strong')[0].get_text(), '%d.%m.%Y %H:%M'))
-
-        values = soup.find_all('div', class_ = 'col-xs-5 data-values_value ie-old-hidden')
-        try:
-            self.so2 = float(values[0].find('span').get_text())
-        except:
-            self.so2 = 0
-
-        try:
-            self.no2 = float(values[1].find('span').get_text())
-        except:
-            self.no2 = 0
-
-        try:
-            self.co = float(values[2].find('span').get_text())
-        except:
-            self.co = 0
-
-        try:
-            self.o3 = float(values[3].find('span').get_text())
-        except:
-            self.o3 = 0
-
-        try:
-            self.pm25 = float(values[4].find('span').get_text())
-        except:
-            self.pm25 = 0
-
-        try:
-            self.h = float(values[5].find('span').get_text())
-        except:
-            self.h = 0
-
-        try:
-            self.p = float(values[6].find('span').get_text())
-        except:
-            self.p = 0
+        self.vrijeme = time.strftime('%H:%M', time.strptime(stranica.mztk_update, '%d.%m.%Y %H:%M'))
+        self.datum = time.strftime('%Y-%m-%d', time.strptime(stranica.mztk_update, '%d.%m.%Y %H:%M'))
 
-        try:
-            self.t = float(values[7].find('span').get_text())
-        except:
-            self.t = 0
-
-        try:
-            self.ws = float(values[8].find('span').get_text())
-        except:
-            self.ws = 0
-
-        try:
-            self.wd = float(values[9].find('span').get_text())
-        except:
-            self.wd = 0        
\ No newline at end of file
+        for v, vrijednost in zip(('so2', 'no2', 'co', 'o3', 'pm25', 'h', 'p', 't', 'ws', 'wd'), stranica.vrijednosti):
+            setattr(self, v, vrijednost if vrijednost is not None else 0)
@@ -1,8 +1,12 @@
-import requests
+import re
+import threading
 import time
+import transport
+import reading
 import math
+import metrics
 
-from bs4 import BeautifulSoup
+from collections import namedtuple, OrderedDict
 
 gradovi = ['lukavac', 'bkc', 'skver', 'bukinje', 'gradacac', 'doboj-istok', 'gracanica', 'srebrenik', 'celic', 'banovici', 'zivinice', 'kalesija', 'sapna', 'teocak', 'kladanj', 'mobilna']
 mobilna_gradovi = ['gradacac', 'doboj-istok', 'gracanica', 'srebrenik', 'celic', 'banovici', 'kalesija', 'sapna', 'teocak', 'kladanj']
@@ -12,6 +16,108 @@ units = ['µg/m³', 'µg/m³', 'mg/m³', 'µg/m³', 'µg/m³', '%', 'mBar', '°C
 url = 'http://monitoringzrakatk.info/'
 url_news = 'http://monitoringzrakatk.info/news.html'
 
+''' HTTP keš za uslovne zahtjeve (http_cache.HttpCache), isključen ako je None '''
+cache = None
+
+def postavi_cache(c):
+    ''' Uključi (http_cache.HttpCache) ili isključi (None) keširanje stranica stanica '''
+    global cache
+    cache = c
+
+class Memorija:
+    '''
+    Memorija posljednjih podataka stanica u procesu (za ponovljena mztk(grad) bez mreže)
+
+    Podaci mlađi od ttl se vraćaju direktno. Stariji (do ttl + zastarjelo) se vraćaju odmah,
+    a stanica se osvježava u pozadinskoj niti (stale-while-revalidate). Još stariji se ne
+    koriste - mztk(grad) ih preuzima ponovo. Kada je popunjena, izbacuje se stanica kojoj
+    se najduže nije pristupalo (LRU).
+
+    @param: ttl - koliko dugo (sekunde) su podaci svježi
+    @param: zastarjelo - koliko dugo nakon ttl se zastarjeli podaci još vraćaju uz osvježavanje
+    @param: velicina - najveći broj stanica u memoriji
+    '''
+
+    def __init__(self, ttl = 300, zastarjelo = 3600, velicina = 32):
+        self.ttl = ttl
+        self.zastarjelo = zastarjelo
+        self.velicina = velicina
+
+        self.__zapisi = OrderedDict()
+        self.__osvjezavanje = set()
+        self.__lock = threading.Lock()
+
+    def dohvati(self, grad):
+        ''' (vrijeme preuzimanja, stanje) ako su podaci upotrebljivi, inače None; zastarjele osvježava u pozadini '''
+        with self.__lock:
+            zapis = self.__zapisi.get(grad)
+            if zapis is None:
+                return None
+
+            starost = time.time() - zapis[0]
+            if starost >= self.ttl + self.zastarjelo:
+                return None
+
+            self.__zapisi.move_to_end(grad)
+
+        if starost >= self.ttl:
+            self.osvjezi(grad)
+
+        return zapis
+
+    def zapisi(self, grad, vrijeme, stanje):
+        with self.__lock:
+            self.__zapisi[grad] = (vrijeme, stanje)
+            self.__zapisi.move_to_end(grad)
+            while len(self.__zapisi) > self.velicina:
+                self.__zapisi.popitem(last = False)
+
+    def osvjezi(self, grad):
+        ''' Preuzmi stanicu u pozadinskoj niti (ako osvježavanje te stanice već nije u toku) '''
+        with self.__lock:
+            if grad in self.__osvjezavanje:
+                return
+            self.__osvjezavanje.add(grad)
+
+        threading.Thread(target = self.__osvjezi, args = (grad,), daemon = True).start()
+
+    def __osvjezi(self, grad):
+        try:
+            mztk(grad, prikupi = False).prikupi_podatke(iz_memorije = False)
+        except Exception:
+            # Zastarjeli podaci ostaju do sljedećeg pokušaja
+            pass
+        finally:
+            with self.__lock:
+                self.__osvjezavanje.discard(grad)
+
+    def obrisi(self):
+        with self.__lock:
+            self.__zapisi.clear()
+
+    def __len__(self):
+        return len(self.__zapisi)
+
+''' Memorija podataka stanica (Memorija), isključena ako je None '''
+memorija = None
+
+def postavi_memoriju(m):
+    ''' Uključi (Memorija) ili isključi (None) memoriju podataka stanica u procesu '''
+    global memorija
+    memorija = m
+
+'''
+Stranica stanice se čita u dijelovima (velicina_dijela bajtova) i parsira dok stiže; čitanje se prekida
+i konekcija zatvara čim su pronađeni vrijeme mjerenja i sve vrijednosti (extractor.izvuci_iz_dijelova)
+'''
+citanje_u_dijelovima = True
+velicina_dijela = 4096
+
+def postavi_citanje_u_dijelovima(ukljuceno):
+    ''' Uključi (True) ili isključi (False - cijela stranica, pa lxml stablo) čitanje stranice stanice u dijelovima '''
+    global citanje_u_dijelovima
+    citanje_u_dijelovima = ukljuceno
+
 class CityNotFound(Exception):
     def __init__(self):
         super().__init__("Nije pronadjen trazeni grad.")
@@ -19,17 +125,23 @@ class CityNotFound(Exception):
 class mztk:
     '''
     Prikupljanje podataka o kvaliteti zraka s stranice www.monitoringzrakatk.info za grad Lukavac 
-    * Ukoliko traženi podatak nije dostupan u tom trenutku, njegova vrijednost će biti 0
+    * Ukoliko traženi podatak nije dostupan u tom trenutku, njegova vrijednost će biti 0,
+      a njegov bit u 'maska' neće biti postavljen (u ocitanje() je takva vrijednost NaN)
 
     Funkcije:
-        - __init__(grad)                        - Pri inicijalizaciji, potrebno je specificirati traženi grad s liste
+        - __init__(grad, prikupi = True)        - Pri inicijalizaciji, potrebno je specificirati traženi grad s liste
+                                                  (prikupi = False - bez preuzimanja podataka)
         - posljednja_provjera()                 - Posljednji puta provjeren sadržaj stranice (uljepšani prikaz vremena "prije...")
         - posljednja_provjera_klasicno()        - Posljednji puta provjeren sadržaj stranice (u klasičnom formatu)
         - posljednja_provjera_mztk()            - Posljednji podaci na MZTK stranici ("prije...")
         - posljednja_provjera_mztk_klasicno()   - Posljednji podaci na MZTK stranici (u klasičnom formatu)
         - prikupi_vrijednosti()                 - Prikupi ponovno podatke s stranice
         - prikupi_vijesti()                     - Prikupi obavještenja s stranice (vraća u obliku liste rezultata klase News)
+        - prikupi_obavjestenja(samo_nove)       - samo_nove = True vraća samo obavještenja koja još nisu vraćena
         - prikazi_gradove()                     - Vraća listu mogućih gradova
+        - ocitanje()                            - Posljednji prikupljeni podaci kao reading.Reading (nepročitane vrijednosti su NaN)
+        - snapshot()                            - (funkcija modula) Paralelno prikupi podatke za sve stanice
+        - postavi_memoriju(Memorija(ttl))       - (funkcija modula) Ponovljena prikupljanja iste stanice iz memorije procesa
 
     Klase:
         - News                      - sadrži podatke o obavještenjima
@@ -53,6 +165,8 @@ class mztk:
         mztk_vrijeme            - [string]
         mztk_datum              - [string]
         mztk_update_pretty      - [string]
+        greska                  - [Exception] - Greška pri posljednjem prikupljanju (None ako je uspješno)
+        maska                   - [int]       - Bitmaska pročitanih vrijednosti (bit i za values[i], vidi reading.maska)
     '''
 
     class News:
@@ -61,46 +175,59 @@ class mztk:
             self.content_raw = content
             self.content_no_html = self.__strip_html(content)
 
+        ''' Zamjene HTML tagova (prvi prolaz kroz tekst) '''
+        _tagovi = {
+            '<ul class="minus">': '',
+            '</ul>': '',
+            '<li>': '\n',
+            '</li>': '',
+            '<p class="paragraph">': '\n',
+            '<p class="paragraph"/>': '',
+            '<div>': '',
+            '</div>': '',
+            '<p>': '',
+            '</p>': '\n'}
+
+        _tagovi_regex = re.compile('|'.join(re.escape(t) for t in _tagovi))
+
+        ''' Formatiranje nakon tagova (drugi prolaz kroz tekst):
+                ',\n'           -> ', '
+                ' a)' ... ' j)' -> '\na)' ... '\nj)'
+                '\t'            -> ' '
+                niz '\n'        -> skraćen isto kao zamjene '\n\n\n' -> '\n', pa '\n\n' -> '\n' '''
+        _razmaci_regex = re.compile(r',\n(\n*)( (?=[a-j]\)))?|(\n+)( (?=[a-j]\)))?|( )(?=[a-j]\))|\t')
+        _nabrajanje_regex = re.compile(r'[a-j]\)')
+
         @staticmethod
         def __strip_html(content):
             ''' Uklanja sve HTML tagove, i vrši prostije formatiranje '''
-            # Može se ispraviti s regexom, ali zbog \n na nekim "logičnim" mjestima,
-            # bi se svelo na isti sistem s više regex izraza... 
-            # Ovako je makar preglednije
-
-            replace_dict = [
-                ['<ul class="minus">', ''],
-                ['</ul>', ''],
-                ['<li>', '\n'],
-                ['</li>', ''],
-                ['<p class="paragraph">', '\n'],
-                ['<p class="paragraph"/>', ''],
-                ['<div>', ''],
-                ['</div>', ''],
-                ['<p>', ''],
-                ['</p>', '\n'],
-                [',\n', ', '],
-                [' a)', '\na)'],
-                [' b)', '\nb)'],
-                [' c)', '\nc)'],
-                [' d)', '\nd)'],
-                [' e)', '\ne)'],
-                [' f)', '\nf)'],
-                [' g)', '\ng)'],
-                [' h)', '\nh)'],
-                [' i)', '\ni)'],
-                [' j)', '\nj)'],
-                ['\t', ' '],
-                ['\n\n\n', '\n'],
-                ['\n\n', '\n']]
-
-            for r in replace_dict:
-                content = content.replace(r[0], r[1])
-
-            return content
-
-    def __init__(self, grad):
-        ''' Osnovni podaci  '''
+            News = mztk.News
+            content = News._tagovi_regex.sub(lambda m: News._tagovi[m.group()], content)
+            return News._razmaci_regex.sub(News._zamijeni_razmak, content)
+
+        @staticmethod
+        def _zamijeni_razmak(m):
+            if m.group() == '\t':
+                return ' '
+
+            if m.group()[0] == ',':
+                novih_redova = len(m.group(1)) + (1 if m.group(2) else 0)
+                if novih_redova == 0 and mztk.News._nabrajanje_regex.match(m.string, m.end()):
+                    # ', ' ispred 'a)' postaje ',\na)'
+                    return ',\n'
+
+                return ', ' + '\n' * mztk.News._skrati_redove(novih_redova)
+
+            novih_redova = len(m.group(3) or '') + (1 if m.group(4) or m.group(5) else 0)
+            return '\n' * mztk.News._skrati_redove(novih_redova)
+
+        @staticmethod
+        def _skrati_redove(n):
+            n = n // 3 + n % 3
+            return n // 2 + n % 2
+
+    def __init__(self, grad, prikupi = True):
+        ''' Osnovni podaci (s prikupi = False objekat se pravi bez preuzimanja; podaci se prikupljaju s prikupi_podatke()) '''
         if not grad.lower() in gradovi:
             # raise Exception('Nije pronađen specificiran grad. :/')
             raise CityNotFound
@@ -121,6 +248,7 @@ class mztk:
         self.t = 0
         self.ws = 0
         self.wd = 0
+        self.maska = 0
         self.grad = grad.lower()
 
         ''' epoch kada su prikupljeni podaci '''
@@ -133,9 +261,15 @@ class mztk:
         self.__mztk_update = None
         self.mztk_vrijeme = None
         self.mztk_datum = None
+        self.__mztk_tekst = None
+        self.greska = None
+
+        ''' Hash-evi već vraćenih obavještenja (prikupi_obavjestenja(samo_nove = True)) '''
+        self.__vidjena_obavjestenja = set()
 
         ''' Pri inicijalizaciji klase prikupi podatke '''
-        self.prikupi_podatke()
+        if prikupi:
+            self.prikupi_podatke()
 
     @staticmethod
     def prikazi_gradove():
@@ -144,6 +278,7 @@ class mztk:
 
     def posljednja_provjera(self):
         ''' Prikaži kada su zadnji puta prikupljeni podaci (uljepšano)'''
+        # Za podatke iz memorije (Memorija) ovo je starost podataka u memoriji
         return  self.__pretty(time.time() - self.__update)
 
     def posljednja_provjera_klasicno(self):
@@ -219,95 +354,259 @@ class mztk:
             else:
                 return "prije {0}g {1}d {2:02d}:{3:02d}".format(year, days, hours, minutes)
 
-    def prikupi_podatke(self):
-        ''' Prikupljanje podataka s http://monitoringzraka.tk '''
+    def prikupi_podatke(self, iz_memorije = True):
+        '''
+        Prikupljanje podataka s http://monitoringzraka.tk
+        Ako je uključena memorija (postavi_memoriju), podaci se prvo traže u njoj;
+        s iz_memorije = False se uvijek preuzimaju sa stranice
+        Ako preuzimanje ne uspije, greška (transport.ErrorTransport) se postavlja u 'greska' i podiže
+        '''
+        self.greska = None
+
+        if iz_memorije and memorija is not None:
+            zapis = memorija.dohvati(self.grad)
+            if zapis is not None:
+                metrics.brojac('mztk_memorija_pogoci_total', stanica = self.grad)
+                self.__update = zapis[0]
+                self.update = time.localtime(self.__update)
+                self.__postavi_stanje(zapis[1])
+                return
+
+        adresa = self.__adresa()
+        zaglavlja = cache.zaglavlja(adresa) if cache is not None else {}
+        u_dijelovima = citanje_u_dijelovima
         try:
-            if not self.__mobilna:
-                page = requests.get("{0}{1}.html".format(url, self.grad))
-            else:
-                page = requests.get("{0}mobilna-{1}.html".format(url, self.grad))
+            page = self.__preuzmi(adresa, zaglavlja, u_dijelovima = u_dijelovima)
+        except Exception as e:
+            # Neuspjelo preuzimanje se prijavljuje, umjesto da ostanu stari podaci ili nule
+            self.greska = e
+            raise
+
+        if page.status_code == 304 and cache is not None:
+            if u_dijelovima and hasattr(page, 'close'):
+                # Odgovor 304 nema tijelo - konekcija se vraća u pool
+                page.close()
+
+            zapis = cache.procitaj(adresa)
+            if zapis is not None:
+                # Stranica nije promijenjena - podaci iz keša, bez parsiranja
+                metrics.brojac('mztk_cache_pogoci_total', stanica = self.grad)
+                self.__update = time.time()
+                self.update = time.localtime(self.__update)
+                self.__postavi_stanje(zapis['podaci'])
+                self.__zapamti()
+                return
+
+            try:
+                page = self.__preuzmi(adresa, u_dijelovima = u_dijelovima)
+            except Exception as e:
+                self.greska = e
+                raise
+
+        if cache is not None:
+            metrics.brojac('mztk_cache_promasaji_total', stanica = self.grad)
 
-        except:
-            return
+        try:
+            stranica = self.__izvuci(page, u_dijelovima)
+        except transport.ErrorTimeout as e:
+            # Rok transporta je istekao pri čitanju tijela - ponovno preuzimanje bi ga prekoračilo
+            self.greska = e
+            raise
+        except transport.ErrorTransport:
+            # Prenos tijela je prekinut pri čitanju u dijelovima - stranica se preuzima ponovo, cijela,
+            # da bi se primijenila pravila ponavljanja transporta
+            metrics.brojac('mztk_prekinuti_prenosi_total', stanica = self.grad)
+            try:
+                page = self.__preuzmi(adresa)
+            except Exception as e:
+                self.greska = e
+                raise
+            stranica = self.__izvuci(page, False)
 
-        soup = BeautifulSoup(page.content, 'lxml')
         self.__update = time.time()
         self.update = time.localtime(time.time())
-        self.mztk_update = time.strptime(soup.find_all('strong')[0].get_text(), '%d.%m.%Y %H:%M')
-        self.mztk_vrijeme = time.strftime('%H:%M', self.mztk_update)
-        self.mztk_datum = time.strftime('%Y-%m-%d', self.mztk_update)
+        self.__postavi_mztk_update(stranica.mztk_update)
+
+        for v, vrijednost in zip(values, stranica.vrijednosti):
+            if vrijednost is None:
+                metrics.brojac('mztk_neprocitana_polja_total', stanica = self.grad, polje = v)
+            setattr(self, v, vrijednost if vrijednost is not None else 0)
+        self.maska = reading.maska(stranica.vrijednosti)
+
+        if cache is not None:
+            cache.zapisi(adresa, page, self.__stanje())
+
+        self.__zapamti()
+
+    def __zapamti(self):
+        if memorija is not None:
+            memorija.zapisi(self.grad, self.__update, self.__stanje())
+
+    def __preuzmi(self, adresa, zaglavlja = {}, stanica = None, u_dijelovima = False):
+        '''
+        GET stranice, uz mjerenje trajanja i preuzetih bajtova (oznaka stanica je grad, ili 'news' za obavještenja)
+        S u_dijelovima = True se čekaju samo zaglavlja odgovora; tijelo čita __izvuci_u_dijelovima
+        '''
+        stanica = stanica or self.grad
+        with metrics.mjeri('preuzimanje', stanica = stanica):
+            if u_dijelovima:
+                page = transport.get(adresa, headers = zaglavlja, stream = True)
+            else:
+                page = transport.get(adresa, headers = zaglavlja)
+                # Pristup sadržaju unutar mjerenja, da bi trajanje uključilo i preuzimanje tijela odgovora
+                metrics.brojac('mztk_preuzeto_bytes_total', len(page.content or b''), stanica = stanica)
 
-        values = soup.find_all('div', class_ = 'col-xs-5 data-values_value ie-old-hidden')
+        elapsed = getattr(page, 'elapsed', None)
+        if elapsed is not None:
+            # Vrijeme do zaglavlja odgovora (DNS, konekcija i čekanje na server)
+            metrics.zabiljezi('odziv', elapsed.total_seconds(), stanica = stanica)
 
-        try:
-            self.so2 = float(values[0].find('span').get_text())
-        except:
-            self.so2 = 0
+        metrics.brojac('mztk_odgovori_total', stanica = stanica, status = page.status_code)
+        return page
 
-        try:
-            self.no2 = float(values[1].find('span').get_text())
-        except:
-            self.no2 = 0
+    def __izvuci(self, page, u_dijelovima):
+        ''' extractor.StranicaStanice iz odgovora '''
+        # lxml se učitava tek pri prvom parsiranju (brže pokretanje za korisnike kojima treba samo lista gradova)
+        import extractor
 
         try:
-            self.co = float(values[2].find('span').get_text())
-        except:
-            self.co = 0
+            if u_dijelovima:
+                # Preuzimanje tijela i parsiranje se preklapaju, pa se mjere zajedno
+                with metrics.mjeri('parsiranje', stanica = self.grad):
+                    return self.__izvuci_u_dijelovima(page, extractor)
+
+            with metrics.mjeri('parsiranje', stanica = self.grad):
+                root = extractor.parsiraj(page.content)
+
+            with metrics.mjeri('izdvajanje', stanica = self.grad):
+                return extractor.izdvoji(root)
+        except transport.ErrorTransport:
+            raise
+        except Exception:
+            metrics.brojac('mztk_greske_parsiranja_total', stanica = self.grad)
+            raise
+
+    def __izvuci_u_dijelovima(self, page, extractor):
+        ''' extractor.izvuci_iz_dijelova nad tijelom odgovora; odgovor bez iter_content (npr. zamjenski transport) se čita odjednom '''
+        if hasattr(page, 'iter_content'):
+            dijelovi = transport.citaj_u_dijelovima(page, velicina_dijela)
+        else:
+            dijelovi = (page.content or b'',)
 
-        try:
-            self.o3 = float(values[3].find('span').get_text())
-        except:
-            self.o3 = 0
+        procitano = 0
+        def brojac():
+            nonlocal procitano
+            for dio in dijelovi:
+                procitano += len(dio)
+                yield dio
 
         try:
-            self.pm25 = float(values[4].find('span').get_text())
-        except:
-            self.pm25 = 0
+            return extractor.izvuci_iz_dijelova(brojac())
+        finally:
+            # Ostatak stranice se ne čita - konekcija se zatvara umjesto da se vrati u pool
+            if hasattr(page, 'close'):
+                page.close()
+            metrics.brojac('mztk_preuzeto_bytes_total', procitano, stanica = self.grad)
+
+    def __adresa(self):
+        if not self.__mobilna:
+            return "{0}{1}.html".format(url, self.grad)
+        else:
+            return "{0}mobilna-{1}.html".format(url, self.grad)
 
-        try:
-            self.h = float(values[5].find('span').get_text())
-        except:
-            self.h = 0
+    def __postavi_mztk_update(self, tekst):
+        self.__mztk_tekst = tekst
+        self.mztk_update = time.strptime(tekst, '%d.%m.%Y %H:%M')
+        self.mztk_vrijeme = time.strftime('%H:%M', self.mztk_update)
+        self.mztk_datum = time.strftime('%Y-%m-%d', self.mztk_update)
 
+    def __stanje(self):
+        ''' Prikupljeni podaci u obliku pogodnom za keširanje '''
+        return {'mztk_update': self.__mztk_tekst, 'vrijednosti': self.__vrijednosti(None)}
+
+    def __postavi_stanje(self, stanje):
+        # Nepročitana vrijednost je None (zapisi iz starijih verzija imaju 0 i smatraju se pročitanim)
+        self.__postavi_mztk_update(stanje['mztk_update'])
+        for v, vrijednost in zip(values, stanje['vrijednosti']):
+            setattr(self, v, vrijednost if vrijednost is not None else 0)
+        self.maska = reading.maska(stanje['vrijednosti'])
+
+    def __vrijednosti(self, nevazeca):
+        ''' Vrijednosti u redoslijedu values, s 'nevazeca' umjesto nepročitanih '''
+        return [getattr(self, v) if self.maska >> i & 1 else nevazeca for i, v in enumerate(values)]
+
+    def ocitanje(self):
+        ''' Posljednji prikupljeni podaci kao reading.Reading (samo stanica, vrijeme mjerenja i vrijednosti; nepročitane su NaN) '''
+        return reading.Reading(self.grad, int(time.mktime(self.mztk_update)), *self.__vrijednosti(math.nan))
+
+    def prikupi_obavjestenja(self, samo_nove = False):
+        '''
+        Prikupi zadnje vijesti s stranice
+        Sa samo_nove = True vraća samo obavještenja koja ovaj objekat još nije vratio
+        '''
+        zaglavlja = cache.zaglavlja(url_news) if cache is not None else {}
         try:
-            self.p = float(values[6].find('span').get_text())
+            page = self.__preuzmi(url_news, zaglavlja, stanica = 'news')
         except:
-            self.p = 0
+            return
 
-        try:
-            self.t = float(values[7].find('span').get_text())
-        except:
-            self.t = 0
+        obavjestenja = None
+        if page.status_code == 304 and cache is not None:
+            zapis = cache.procitaj(url_news)
+            if zapis is not None:
+                # Stranica nije promijenjena - obavještenja iz keša, bez parsiranja
+                metrics.brojac('mztk_cache_pogoci_total', stanica = 'news')
+                obavjestenja = zapis['podaci']
+            else:
+                try:
+                    page = self.__preuzmi(url_news, stanica = 'news')
+                except:
+                    return
 
-        try:
-            self.ws = float(values[8].find('span').get_text())
-        except:
-            self.ws = 0
+        if obavjestenja is None:
+            with metrics.mjeri('parsiranje', stanica = 'news'):
+                obavjestenja = self.__parsiraj_obavjestenja(page.content)
+            if cache is not None:
+                cache.zapisi(url_news, page, obavjestenja)
 
-        try:
-            self.wd = float(values[9].find('span').get_text())
-        except:
-            self.wd = 0
+        # hashlib (oko 8 ms) se učitava tek kada su potrebna obavještenja, kao i ostali spori moduli
+        import hashlib
 
-    def prikupi_obavjestenja(self):
-        ''' Prikupi zadnje vijesti s stranice '''
-        try:
-            page = requests.get(url_news)
-        except:
-            return
+        results = []
+
+        for date, content in obavjestenja:
+            if samo_nove:
+                kljuc = hashlib.sha1((date + '\0' + content).encode('utf-8')).hexdigest()
+                if kljuc in self.__vidjena_obavjestenja:
+                    continue
+                self.__vidjena_obavjestenja.add(kljuc)
 
-        soup = BeautifulSoup(page.content, 'lxml')
+            results.append(self.News(date, content))
+
+        return results
+
+    @staticmethod
+    def __parsiraj_obavjestenja(content):
+        ''' Lista [datum, sadržaj] za svako obavještenje na stranici '''
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(content, 'lxml')
         news = soup.find_all('div', class_ = 'col-md-12 alert alert-warning')
 
-        results = []
+        obavjestenja = []
 
         for new in news:
-            date = str(new.find('h3'))[4:-5]
-            content = str(new)[62:]
+            h3 = new.find('h3')
+            if h3 is None:
+                continue
 
-            results.append(self.News(date, content))
+            # Sadržaj je sve nakon naslova (<h3>datum</h3>), uključujući zatvarajući </div>
+            tekst = str(new)
+            pocetak = tekst.find('</h3>') + len('</h3>')
 
-        return results
+            obavjestenja.append([h3.decode_contents(), tekst[pocetak:]])
+
+        return obavjestenja
 
     def __str__(self):
         return "Trenutno stanje zraka: SO2: {0} [µg/m³], NO2: {1} [µg/m³], CO: {2} [mg/m³], O3: {3} [µg/m³], PM2.5: {4} [µg/m³], rel. vlažnost: {5} [%], pritisak: {6} [mBar], temperatura: {7} [°C], brzina vjetra: {8} [m/s], smjer vjetra: {9} [°]. Podaci prikupljeni {10} ({11} {12}).".format(
@@ -324,3 +623,35 @@ class mztk:
             self.__pretty(time.time() - time.mktime(self.mztk_update)).lower(),
             self.mztk_datum,
             self.mztk_vrijeme)
+
+''' Rezultat prikupljanja za jednu stanicu - postavljeno je ili 'podaci' (mztk) ili 'greska' (izuzetak) '''
+Rezultat = namedtuple('Rezultat', ['grad', 'podaci', 'greska'])
+
+def snapshot(stanice = None, max_workers = 16):
+    ''' Paralelno prikupi podatke za sve stanice (ili za zadanu listu stanica)
+
+        Vraća listu Rezultat u redoslijedu stanica; greška pri prikupljanju
+        jedne stanice ne prekida prikupljanje ostalih.
+    '''
+    if stanice is None:
+        stanice = gradovi
+
+    stanice = [s.lower() for s in stanice]
+    if len(stanice) == 0:
+        return []
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with metrics.mjeri('snapshot'), ThreadPoolExecutor(max_workers = min(max_workers, len(stanice))) as pool:
+        return list(pool.map(_prikupi_stanicu, stanice))
+
+def _prikupi_stanicu(grad):
+    try:
+        podaci = mztk(grad)
+    except Exception as e:
+        return Rezultat(grad, None, e)
+
+    if podaci.greska is not None:
+        return Rezultat(grad, None, podaci.greska)
+
+    return Rezultat(grad, podaci, None)
@@ -0,0 +1,114 @@
+import math
+
+from array import array
+from typing import NamedTuple
+
+VALUES = ('so2', 'no2', 'co', 'o3', 'pm25', 'h', 'p', 't', 'ws', 'wd')
+
+''' Maska u kojoj su sve vrijednosti važeće '''
+SVE_VAZECE = (1 << len(VALUES)) - 1
+
+def maska(vrijednosti):
+    ''' Bitmaska važećih vrijednosti: bit i je postavljen ako VALUES[i] nije None ni NaN '''
+    m = 0
+    for i, v in enumerate(vrijednosti):
+        if v is not None and v == v:
+            m |= 1 << i
+    return m
+
+class Reading(NamedTuple):
+    '''
+    Jedno satno mjerenje stanice (nepromjenjivo, bez __dict__)
+
+    grad                    - [string]
+    vrijeme                 - [seconds since epoch] - vrijeme mjerenja sa stranice (mztk_update)
+    so2 ... wd              - vrijednosti, isti redoslijed i jedinice kao mztk.values / mztk.units;
+                              vrijednost koja nije izmjerena (ili nije pročitana) je NaN
+    '''
+    grad: str
+    vrijeme: int
+    so2: float = math.nan
+    no2: float = math.nan
+    co: float = math.nan
+    o3: float = math.nan
+    pm25: float = math.nan
+    h: float = math.nan
+    p: float = math.nan
+    t: float = math.nan
+    ws: float = math.nan
+    wd: float = math.nan
+
+    @property
+    def vrijednosti(self):
+        ''' Vrijednosti u redoslijedu mztk.values '''
+        return self[2:]
+
+    @property
+    def maska(self):
+        ''' Bitmaska važećih vrijednosti (vidi maska) '''
+        return maska(self[2:])
+
+class Readings:
+    '''
+    Mnogo mjerenja spakovanih u neprekinute nizove (po jedan array za svaku kolonu)
+
+    Stanice se čuvaju kao indeks u listu 'stanice', vrijeme kao int64, a svaka
+    vrijednost kao float64 - oko 90 bajta po mjerenju. Vrijednost koja nije izmjerena je NaN.
+
+    Funkcije:
+        - dodaj(reading)            - Dodaj jedno mjerenje
+        - prosiri(readings)         - Dodaj više mjerenja
+        - kolona(ime)               - array za 'vrijeme', 'grad' (indeksi stanica) ili vrijednost (npr. 'pm25');
+                                      bez kopiranja se može koristiti kao numpy niz: numpy.frombuffer(kolona)
+        - [i], iteracija            - Reading
+    '''
+
+    def __init__(self, readings = ()):
+        self.stanice = []
+        self.__indeksi_stanica = {}
+
+        self.__grad = array('H')
+        self.__vrijeme = array('q')
+        self.__vrijednosti = {v: array('d') for v in VALUES}
+
+        self.prosiri(readings)
+
+    def dodaj(self, reading):
+        i = self.__indeksi_stanica.get(reading.grad)
+        if i is None:
+            i = len(self.stanice)
+            self.stanice.append(reading.grad)
+            self.__indeksi_stanica[reading.grad] = i
+
+        self.__grad.append(i)
+        self.__vrijeme.append(reading.vrijeme)
+        for v, vrijednost in zip(VALUES, reading.vrijednosti):
+            self.__vrijednosti[v].append(vrijednost)
+
+    def prosiri(self, readings):
+        for r in readings:
+            self.dodaj(r)
+
+    def kolona(self, ime):
+        if ime == 'grad':
+            return self.__grad
+        elif ime == 'vrijeme':
+            return self.__vrijeme
+        return self.__vrijednosti[ime]
+
+    def __len__(self):
+        return len(self.__vrijeme)
+
+    def __getitem__(self, i):
+        return Reading(
+            self.stanice[self.__grad[i]],
+            self.__vrijeme[i],
+            *(self.__vrijednosti[v][i] for v in VALUES))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def velicina(self):
+        ''' Zauzeta memorija nizova u bajtima '''
+        return sum(a.itemsize * len(a) for a in [self.__grad, self.__vrijeme, *self.__vrijednosti.values()])
@@ -0,0 +1,202 @@
+import os
+import time
+
+import numpy as np
+
+import reading
+
+MAGIC = b'MZTKRING'
+VERZIJA = 1
+
+_HEADER = np.dtype([
+    ('magic', 'S8'),
+    ('verzija', '<u4'),
+    ('kapacitet', '<u4'),
+    ('broj_polja', '<u4'),
+    ('rezervisano', '<u4'),
+    ('zadnji_sat', '<i8'),
+    ('_', 'V32')])
+
+class ErrorRingStore(Exception):
+    def __init__(self, poruka):
+        super().__init__(poruka)
+
+class RingStore:
+    '''
+    Kolonska pohrana posljednjih satnih vrijednosti, memorijski mapirana s diska
+
+    Za svaku stanicu postoji jedna datoteka ('<grad>.ring') s po jednom float64 kolonom
+    za svako polje iz reading.VALUES. Mjesto u koloni određuje sat mjerenja
+    (sat % kapacitet), tako da se čuva posljednjih 'kapacitet' sati.
+    Sati bez podataka su NaN.
+
+    Datoteka stanice se kreira samo pri upisu; čitanje stanice za koju ne postoji datoteka
+    podiže ErrorRingStore (zadnji_sat vraća None).
+
+    Svaki zapis se upisuje dvaput (na mjesto i i i + kapacitet), pa je posljednjih
+    N sati uvijek jedan neprekinut dio kolone - čitanje vraća numpy view, bez kopiranja.
+
+    @param: direktorij - direktorij s datotekama stanica
+    @param: kapacitet - broj sati koji se čuva za novu stanicu (postojeće datoteke zadržavaju svoj)
+    @param: samo_citanje - otvori datoteke samo za čitanje (za procese koji samo čitaju)
+
+    Funkcije:
+        - zapisi(grad, sat, vrijednosti)        - Upiši vrijednosti za sat (epoch sekunde ili struct_time)
+        - zapisi_mztk(podaci)                   - Upiši posljednje podatke mztk objekta
+        - zapisi_ocitanje(ocitanje)             - Upiši reading.Reading
+        - posljednji(grad, n, polje = None)     - Posljednjih n sati (od najstarijeg prema najnovijem)
+        - sati(grad, n)                         - Vremena (epoch sekunde) za posljednjih n sati
+        - zadnji_sat(grad)                      - Vrijeme (epoch sekunde) posljednjeg upisanog sata, ili None
+        - kapacitet_stanice(grad)               - Broj sati koji se čuva za stanicu
+    '''
+
+    def __init__(self, direktorij, kapacitet = 24 * 14, samo_citanje = False):
+        self.direktorij = os.path.expanduser(direktorij)
+        self.kapacitet = kapacitet
+        self.samo_citanje = samo_citanje
+        self.polja = list(reading.VALUES)
+
+        if not samo_citanje:
+            os.makedirs(self.direktorij, exist_ok = True)
+
+        self.__otvorene = {}
+
+    def zapisi(self, grad, sat, vrijednosti):
+        ''' Upiši vrijednosti (redoslijed reading.VALUES) za sat mjerenja; datoteka nove stanice se tada kreira '''
+        if self.samo_citanje:
+            raise ErrorRingStore("Pohrana je otvorena samo za čitanje.")
+
+        header, data = self.__otvori(grad, kreiraj = True)
+        kapacitet = int(header['kapacitet'])
+        novi = self.__sat(sat)
+        zadnji = int(header['zadnji_sat'])
+
+        if zadnji >= 0 and novi <= zadnji - kapacitet:
+            # Starije od svega što se čuva
+            return False
+
+        if zadnji >= 0 and novi > zadnji + 1:
+            # Sati bez podataka između posljednjeg i novog zapisa
+            for s in range(max(zadnji + 1, novi - kapacitet), novi):
+                i = s % kapacitet
+                data[:, i] = np.nan
+                data[:, i + kapacitet] = np.nan
+
+        i = novi % kapacitet
+        data[:, i] = vrijednosti
+        data[:, i + kapacitet] = vrijednosti
+
+        if novi > zadnji:
+            header['zadnji_sat'] = novi
+
+        return True
+
+    def zapisi_mztk(self, podaci):
+        ''' Upiši posljednje prikupljene podatke mztk objekta (nepročitane vrijednosti kao NaN) '''
+        return self.zapisi_ocitanje(podaci.ocitanje())
+
+    def zapisi_ocitanje(self, ocitanje):
+        ''' Upiši mjerenje (reading.Reading) '''
+        return self.zapisi(ocitanje.grad, ocitanje.vrijeme, ocitanje.vrijednosti)
+
+    def posljednji(self, grad, n, polje = None):
+        '''
+        Posljednjih n sati, od najstarijeg prema najnovijem, kao view (bez kopiranja)
+        Bez polja vraća niz oblika (broj_polja, n), a s poljem (npr. 'pm25') niz oblika (n,)
+        Za redoslijed od najnovijeg (kako ga očekuje aqi.aqi) koristiti [..., ::-1]
+
+        View prati datoteku - ako je potreban stalan snimak dok pisac radi, napraviti .copy()
+        '''
+        header, data = self.__otvori(grad)
+        kapacitet = int(header['kapacitet'])
+        zadnji = int(header['zadnji_sat'])
+
+        if not 0 < n <= kapacitet:
+            raise ErrorRingStore("Broj sati mora biti između 1 i {0}.".format(kapacitet))
+
+        if zadnji < 0:
+            podaci = np.full((data.shape[0], n), np.nan)
+        else:
+            kraj = zadnji % kapacitet + kapacitet + 1
+            podaci = data[:, kraj - n:kraj]
+
+        if polje is None:
+            return podaci
+
+        return podaci[self.polja.index(polje)]
+
+    def sati(self, grad, n):
+        ''' Vremena (epoch sekunde) sati koje vraća posljednji(grad, n) '''
+        zadnji = self.__otvori(grad)[0]['zadnji_sat']
+        return (np.arange(n, dtype = np.int64) + (int(zadnji) - n + 1)) * 3600
+
+    def kapacitet_stanice(self, grad):
+        ''' Broj sati koji se čuva za stanicu (iz njene datoteke) '''
+        return int(self.__otvori(grad)[0]['kapacitet'])
+
+    def zadnji_sat(self, grad):
+        if grad.lower() not in self.__otvorene and not os.path.exists(self.__putanja(grad)):
+            return None
+
+        zadnji = int(self.__otvori(grad)[0]['zadnji_sat'])
+        return zadnji * 3600 if zadnji >= 0 else None
+
+    def stanice(self):
+        ''' Stanice za koje postoji datoteka '''
+        if not os.path.isdir(self.direktorij):
+            return []
+
+        return sorted(ime[:-5] for ime in os.listdir(self.direktorij) if ime.endswith('.ring'))
+
+    def flush(self):
+        for _, data in self.__otvorene.values():
+            if not self.samo_citanje:
+                data.flush()
+
+    @staticmethod
+    def __sat(sat):
+        if isinstance(sat, time.struct_time):
+            sat = time.mktime(sat)
+
+        return int(sat // 3600)
+
+    def __putanja(self, grad):
+        return os.path.join(self.direktorij, grad.lower() + '.ring')
+
+    def __otvori(self, grad, kreiraj = False):
+        grad = grad.lower()
+        if grad in self.__otvorene:
+            return self.__otvorene[grad]
+
+        putanja = self.__putanja(grad)
+
+        if not os.path.exists(putanja):
+            if not kreiraj:
+                raise ErrorRingStore("Ne postoje podaci za stanicu '{0}'.".format(grad))
+            self.__kreiraj(putanja)
+
+        mode = 'r' if self.samo_citanje else 'r+'
+        header = np.memmap(putanja, dtype = _HEADER, mode = mode, shape = (1,))[0]
+
+        if header['magic'] != MAGIC or header['verzija'] != VERZIJA or header['broj_polja'] != len(self.polja):
+            raise ErrorRingStore("Datoteka '{0}' nije ispravna pohrana.".format(putanja))
+
+        data = np.memmap(putanja, dtype = '<f8', mode = mode, offset = _HEADER.itemsize,
+            shape = (len(self.polja), 2 * int(header['kapacitet'])))
+
+        self.__otvorene[grad] = (header, data)
+        return header, data
+
+    def __kreiraj(self, putanja):
+        header = np.zeros(1, dtype = _HEADER)
+        header['magic'] = MAGIC
+        header['verzija'] = VERZIJA
+        header['kapacitet'] = self.kapacitet
+        header['broj_polja'] = len(self.polja)
+        header['zadnji_sat'] = -1
+
+        privremena = putanja + '.tmp'
+        with open(privremena, 'wb') as f:
+            f.write(header.tobytes())
+            f.write(np.full((len(self.polja), 2 * self.kapacitet), np.nan, dtype = '<f8').tobytes())
+        os.replace(privremena, putanja)
@@ -0,0 +1,198 @@
+import random
+import statistics
+import threading
+import time
+
+from collections import deque
+
+class _Stanica:
+    def __init__(self):
+        self.mztk_update = None         # epoch sekunde posljednjeg mjerenja sa stranice
+        self.zadnja_provjera = None     # kada je stanica posljednji put provjerena
+        self.kasnjenja = deque(maxlen = 24)
+        self.neuspjesne = 0             # uzastopne provjere nakon očekivanog vremena bez novih podataka
+        self.ocekivano = None           # očekivana objava na koju se odnosi 'neuspjesne'
+        self.sljedeca = 0
+
+class Raspored:
+    '''
+    Raspored provjera stanica prilagođen vremenu objave podataka na MZTK stranici
+
+    Podaci za sat H se na stranici pojavljuju nešto kasnije (H + kašnjenje). Raspored iz
+    posmatranih promjena mztk_update uči kašnjenje za svaku stanicu, pa stanicu provjerava
+    često samo oko očekivanog vremena objave, a između toga čeka (s nasumičnim odstupanjem,
+    da se zahtjevi za sve stanice ne poklope).
+
+    @param: stanice - lista stanica (mztk.gradovi ako nije navedeno)
+    @param: period - razmak između mjerenja na stranici, u sekundama
+    @param: interval_blizu - razmak provjera oko očekivanog vremena objave
+    @param: prije - koliko ranije od očekivanog vremena početi s čestim provjerama
+    @param: poslije - koliko dugo nakon očekivanog vremena nastaviti s čestim provjerama
+    @param: interval_nepoznato - razmak provjera dok kašnjenje stanice još nije poznato
+    @param: max_odgoda - najduži razmak provjera kada podaci kasne (npr. stranica ne radi)
+    @param: jitter - udio nasumičnog odstupanja razmaka (0.1 = ±10%)
+
+    Funkcije:
+        - zabiljezi(grad, mztk_update, vrijeme = None)  - Zabilježi rezultat provjere, vraća True ako su podaci novi
+        - sljedece_azuriranje(grad)                     - Očekivano vrijeme objave novih podataka (epoch), ili None
+        - sljedeca_provjera(grad)                       - Kada stanicu treba ponovo provjeriti (epoch)
+        - za_provjeru(sada = None)                      - Stanice koje treba provjeriti sada
+        - pokreni(obrada = None, zaustavi = None)       - Petlja koja provjerava stanice prema rasporedu
+    '''
+
+    def __init__(self, stanice = None, period = 3600, interval_blizu = 15, prije = 60, poslije = 600,
+        interval_nepoznato = 120, max_odgoda = 900, jitter = 0.1, sat = time.time, seed = None):
+
+        if stanice is None:
+            import mztk
+            stanice = mztk.gradovi
+
+        self.period = period
+        self.interval_blizu = interval_blizu
+        self.prije = prije
+        self.poslije = poslije
+        self.interval_nepoznato = interval_nepoznato
+        self.max_odgoda = max_odgoda
+        self.jitter = jitter
+
+        self.__sat = sat
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.__stanice = {s.lower(): _Stanica() for s in stanice}
+
+    def zabiljezi(self, grad, mztk_update, vrijeme = None):
+        ''' Zabilježi rezultat provjere (mztk_update kao struct_time ili epoch sekunde) '''
+        if isinstance(mztk_update, time.struct_time):
+            mztk_update = time.mktime(mztk_update)
+
+        if vrijeme is None:
+            vrijeme = self.__sat()
+
+        with self.__lock:
+            s = self.__stanice[grad.lower()]
+            novo = s.mztk_update is None or mztk_update > s.mztk_update
+
+            if novo and s.mztk_update is not None and s.zadnja_provjera is not None:
+                # Podaci su objavljeni između prethodne i ove provjere
+                if mztk_update - s.mztk_update <= self.period:
+                    s.kasnjenja.append(((s.zadnja_provjera + vrijeme) / 2) - mztk_update)
+
+            if novo:
+                s.mztk_update = mztk_update
+                s.neuspjesne = 0
+
+            ocekivano = self.__ocekivano(s, vrijeme)
+            if ocekivano != s.ocekivano:
+                # Nova očekivana objava (i kada je prethodna propuštena) - odgađanje kreće ispočetka
+                s.ocekivano = ocekivano
+                s.neuspjesne = 0
+
+            if not novo and ocekivano is not None and vrijeme > ocekivano + self.poslije:
+                s.neuspjesne += 1
+
+            s.zadnja_provjera = vrijeme
+            s.sljedeca = self.__izracunaj_sljedecu(s, vrijeme)
+
+        return novo
+
+    def zabiljezi_gresku(self, grad, vrijeme = None):
+        ''' Provjera nije uspjela - sljedeća provjera se odgađa kao da podaci kasne '''
+        if vrijeme is None:
+            vrijeme = self.__sat()
+
+        with self.__lock:
+            s = self.__stanice[grad.lower()]
+            s.neuspjesne += 1
+            s.sljedeca = vrijeme + self.__odgoda(s)
+
+    def kasnjenje(self, grad):
+        ''' Naučeno kašnjenje objave u odnosu na vrijeme mjerenja (sekunde), ili None '''
+        with self.__lock:
+            return self.__kasnjenje(self.__stanice[grad.lower()])
+
+    def sljedece_azuriranje(self, grad):
+        ''' Očekivano vrijeme (epoch) objave sljedećih podataka za stanicu, ili None ako još nije poznato '''
+        with self.__lock:
+            return self.__ocekivano(self.__stanice[grad.lower()], self.__sat())
+
+    def sljedeca_provjera(self, grad):
+        with self.__lock:
+            return self.__stanice[grad.lower()].sljedeca
+
+    def za_provjeru(self, sada = None):
+        if sada is None:
+            sada = self.__sat()
+
+        with self.__lock:
+            return [g for g, s in self.__stanice.items() if s.sljedeca <= sada]
+
+    def pokreni(self, obrada = None, zaustavi = None, max_workers = 16):
+        '''
+        Provjeravaj stanice prema rasporedu dok se ne postavi 'zaustavi' (threading.Event)
+        Za svaku provjerenu stanicu se poziva obrada(mztk.Rezultat, novo)
+        '''
+        import mztk
+
+        if zaustavi is None:
+            zaustavi = threading.Event()
+
+        while not zaustavi.is_set():
+            stanice = self.za_provjeru()
+
+            for rezultat in mztk.snapshot(stanice, max_workers = max_workers) if stanice else []:
+                if rezultat.greska is not None:
+                    self.zabiljezi_gresku(rezultat.grad)
+                    novo = False
+                else:
+                    novo = self.zabiljezi(rezultat.grad, rezultat.podaci.mztk_update)
+
+                if obrada is not None:
+                    obrada(rezultat, novo)
+
+            with self.__lock:
+                sljedeca = min(s.sljedeca for s in self.__stanice.values())
+
+            zaustavi.wait(max(0, sljedeca - self.__sat()))
+
+    def __kasnjenje(self, s):
+        if len(s.kasnjenja) == 0:
+            return None
+
+        return statistics.median(s.kasnjenja)
+
+    def __ocekivano(self, s, sada):
+        kasnjenje = self.__kasnjenje(s)
+        if s.mztk_update is None or kasnjenje is None:
+            return None
+
+        ocekivano = s.mztk_update + self.period + kasnjenje
+        if sada >= ocekivano + self.period - self.prije:
+            # Objava je propuštena (npr. stanica nije objavila jedan sat) - očekuje se sljedeća,
+            # čim počne njen prozor čestih provjera
+            ocekivano += self.period * ((sada - ocekivano + self.prije) // self.period)
+
+        return ocekivano
+
+    def __izracunaj_sljedecu(self, s, sada):
+        ocekivano = self.__ocekivano(s, sada)
+
+        if ocekivano is None:
+            return sada + self.__uz_jitter(self.interval_nepoznato)
+
+        pocetak = ocekivano - self.prije - self.__random.uniform(0, self.jitter * self.prije)
+        if sada < pocetak:
+            # Daleko od objave - čekaj do početka prozora (ranije za nasumični dio, nikad kasnije)
+            return pocetak
+
+        if sada <= ocekivano + self.poslije:
+            return sada + self.__uz_jitter(self.interval_blizu)
+
+        # Podaci kasne - odgađanje, ali najkasnije do prozora sljedeće objave
+        return min(sada + self.__odgoda(s), ocekivano + self.period - self.prije)
+
+    def __odgoda(self, s):
+        ''' Eksponencijalno odgađanje kada podaci kasne ili provjera ne uspijeva '''
+        return self.__uz_jitter(min(self.max_odgoda, self.interval_blizu * (2 ** min(s.neuspjesne, 16))))
+
+    def __uz_jitter(self, interval):
+        return interval * (1 + self.__random.uniform(-self.jitter, self.jitter))
@@ -0,0 +1,272 @@
+'''
+Lokalni HTTP API s posljednjim podacima stanica, AQI i obavještenjima
+
+Podaci se drže u memoriji; stanica se ponovo preuzima s MZTK stranice tek kada je
+zapis stariji od 'ttl' sekundi. Istovremeni zahtjevi za istu zastarjelu stanicu čekaju
+jedno zajedničko preuzimanje. Ako preuzimanje ne uspije, vraća se posljednji poznati zapis.
+
+Putanje (GET):
+    /stanice                - lista stanica
+    /stanice/<grad>         - posljednje vrijednosti stanice
+    /stanice/<grad>/aqi     - NowCAST AQI (PM2.5) za stanicu
+    /obavjestenja           - obavještenja s news.html
+
+Pokretanje:
+    python server.py [--adresa 127.0.0.1] [--port 8080] [--ttl 300] [--ring DIREKTORIJ]
+'''
+import argparse
+import asyncio
+import json
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import aqi
+import mztk
+
+class _Zapis:
+    __slots__ = ('vrijeme', 'tijelo', 'podaci', 'tijelo_aqi')
+
+    def __init__(self, vrijeme, tijelo, podaci = None, tijelo_aqi = None):
+        self.vrijeme = vrijeme          # time.monotonic() kada je zapis napravljen
+        self.tijelo = tijelo            # JSON odgovor (bytes), pripremljen unaprijed
+        self.podaci = podaci
+        self.tijelo_aqi = tijelo_aqi    # JSON odgovor za /aqi
+
+class Server:
+    '''
+    @param: ttl - koliko dugo (sekunde) se zapis stanice smatra svježim
+    @param: ttl_obavjestenja - isto, za obavještenja
+    @param: pohrana - ring_store.RingStore iz kojeg se pune NowCAST prozori pri prvom preuzimanju stanice
+    @param: max_workers - broj niti za preuzimanje s MZTK stranice
+    '''
+
+    def __init__(self, ttl = 300, ttl_obavjestenja = 900, pohrana = None, max_workers = 16):
+        self.ttl = ttl
+        self.ttl_obavjestenja = ttl_obavjestenja
+        self.pohrana = pohrana
+
+        self.__zapisi = {}
+        self.__u_toku = {}
+        self.__prozori = {}
+        self.__obavjestenja = None
+        self.__executor = ThreadPoolExecutor(max_workers = max_workers)
+
+        self.__stanice = json.dumps(mztk.gradovi).encode('utf-8')
+
+    async def stanica(self, grad):
+        ''' Zapis stanice iz memorije, ili nakon (zajedničkog) preuzimanja ako je zastario '''
+        zapis = self.__zapisi.get(grad)
+        if zapis is not None and time.monotonic() - zapis.vrijeme < self.ttl:
+            return zapis
+
+        return await self.__jednom(grad, lambda: self.__preuzmi_stanicu(grad))
+
+    async def obavjestenja(self):
+        zapis = self.__obavjestenja
+        if zapis is not None and time.monotonic() - zapis.vrijeme < self.ttl_obavjestenja:
+            return zapis
+
+        return await self.__jednom('/obavjestenja', self.__preuzmi_obavjestenja)
+
+    async def __jednom(self, kljuc, preuzmi):
+        ''' Single-flight: dok je preuzimanje za ključ u toku, ostali zahtjevi čekaju isti rezultat '''
+        buducnost = self.__u_toku.get(kljuc)
+        if buducnost is None:
+            buducnost = asyncio.ensure_future(preuzmi())
+            self.__u_toku[kljuc] = buducnost
+            buducnost.add_done_callback(lambda _: self.__u_toku.pop(kljuc, None))
+
+        # shield - prekinut zahtjev (npr. zatvorena konekcija) ne prekida preuzimanje za ostale
+        return await asyncio.shield(buducnost)
+
+    async def __preuzmi_stanicu(self, grad):
+        stari = self.__zapisi.get(grad)
+        loop = asyncio.get_running_loop()
+        try:
+            podaci = await loop.run_in_executor(self.__executor, mztk.mztk, grad)
+            if podaci.greska is not None:
+                raise podaci.greska
+        except Exception as e:
+            if stari is None:
+                raise
+
+            # Posljednji poznati podaci, s greškom pri osvježavanju
+            stari.vrijeme = time.monotonic()
+            stari.tijelo = self.__json(dict(stari.podaci, greska = str(e)))
+            return stari
+
+        ocitanje = podaci.ocitanje()
+        odgovor = {
+            'grad': podaci.grad,
+            'mztk_update': time.strftime('%Y-%m-%dT%H:%M:%S', podaci.mztk_update),
+            'preuzeto': time.strftime('%Y-%m-%dT%H:%M:%S', podaci.update),
+            # Nepročitana vrijednost je null (ne 0)
+            'vrijednosti': {v: x if x == x else None for v, x in zip(mztk.values, ocitanje.vrijednosti)},
+            'jedinice': dict(zip(mztk.values, mztk.units)),
+            'aqi': self.__aqi(ocitanje)}
+
+        tijelo_aqi = self.__json({'grad': odgovor['grad'], 'mztk_update': odgovor['mztk_update'], 'aqi': odgovor['aqi']})
+        zapis = _Zapis(time.monotonic(), self.__json(odgovor), odgovor, tijelo_aqi)
+        self.__zapisi[grad] = zapis
+        return zapis
+
+    def __aqi(self, ocitanje):
+        '''
+        NowCAST AQI za PM2.5 - novi sat se dodaje u prozor stanice samo kada se mztk_update promijeni
+        Nepročitan PM2.5 (NaN) je sat bez podataka; bez podataka za 2 od 3 posljednja sata AQI je None
+        '''
+        prozor = self.__prozori.get(ocitanje.grad)
+        if prozor is None:
+            prozor = self.__prozori[ocitanje.grad] = self.__novi_prozor(ocitanje.grad)
+
+        try:
+            prozor.dodaj(ocitanje.pm25, ocitanje.vrijeme)
+        except aqi.ErrorHourOrder:
+            # Isti (ili stariji) sat kao prethodno preuzimanje
+            pass
+        except (aqi.ErrorOutOfRange, aqi.ErrorCalculation) as e:
+            return {'greska': str(e)}
+
+        if prozor.rezultat is None:
+            return None
+
+        return {
+            'aqi': prozor.rezultat.aqi,
+            'opis': prozor.rezultat.opis,
+            'koncentracija': prozor.koncentracija,
+            'polutant': aqi.CalculationType.PM25.value}
+
+    def __novi_prozor(self, grad):
+        prozor = aqi.NowCastWindow(aqi.CalculationType.PM25)
+        if self.pohrana is None or grad not in self.pohrana.stanice():
+            return prozor
+
+        vrijednosti = self.pohrana.posljednji(grad, prozor.sati, 'pm25')
+        for sat, vrijednost in zip(self.pohrana.sati(grad, prozor.sati), vrijednosti):
+            try:
+                prozor.dodaj(float(vrijednost), int(sat))
+            except (aqi.ErrorOutOfRange, aqi.ErrorCalculation):
+                pass
+
+        return prozor
+
+    async def __preuzmi_obavjestenja(self):
+        loop = asyncio.get_running_loop()
+        obavjestenja = await loop.run_in_executor(self.__executor, self.__obavjestenja_sinhrono)
+        if obavjestenja is None:
+            if self.__obavjestenja is None:
+                raise ConnectionError("Nije moguće preuzeti obavještenja.")
+            return self.__obavjestenja
+
+        tijelo = self.__json([{'datum': n.date, 'sadrzaj': n.content_no_html} for n in obavjestenja])
+        self.__obavjestenja = _Zapis(time.monotonic(), tijelo)
+        return self.__obavjestenja
+
+    @staticmethod
+    def __obavjestenja_sinhrono():
+        # prikupi_obavjestenja ne treba podatke stanice
+        return mztk.mztk(mztk.gradovi[0], prikupi = False).prikupi_obavjestenja()
+
+    @staticmethod
+    def __json(podaci):
+        return json.dumps(podaci, ensure_ascii = False).encode('utf-8')
+
+    async def odgovor(self, putanja):
+        ''' (status, tijelo) za putanju '''
+        dijelovi = [d for d in putanja.split('?')[0].split('/') if d]
+
+        if dijelovi == ['stanice']:
+            return 200, self.__stanice
+
+        if dijelovi == ['obavjestenja']:
+            return 200, (await self.obavjestenja()).tijelo
+
+        # Putanja se provjerava prije preuzimanja, da nepostojeće adrese ne izazivaju zahtjeve prema stranici
+        if len(dijelovi) in (2, 3) and dijelovi[0] == 'stanice' and dijelovi[1].lower() in mztk.gradovi and dijelovi[2:] in ([], ['aqi']):
+            zapis = await self.stanica(dijelovi[1].lower())
+            if len(dijelovi) == 2:
+                return 200, zapis.tijelo
+            return 200, zapis.tijelo_aqi
+
+        return 404, self.__json({'greska': 'Nije pronađeno.'})
+
+    async def obradi(self, reader, writer):
+        ''' Jedna HTTP/1.1 konekcija (keep-alive) '''
+        try:
+            while True:
+                zahtjev = await reader.readline()
+                if not zahtjev:
+                    break
+
+                zaglavlja = {}
+                while True:
+                    red = await reader.readline()
+                    if red in (b'\r\n', b'\n', b''):
+                        break
+                    ime, _, vrijednost = red.decode('latin-1').partition(':')
+                    zaglavlja[ime.strip().lower()] = vrijednost.strip().lower()
+
+                try:
+                    metoda, putanja, verzija = zahtjev.decode('latin-1').split()
+                except ValueError:
+                    await self.__posalji(writer, 400, b'', False)
+                    break
+
+                zadrzi = zaglavlja.get('connection') != 'close' and (verzija != 'HTTP/1.0' or zaglavlja.get('connection') == 'keep-alive')
+
+                if metoda not in ('GET', 'HEAD'):
+                    status, tijelo = 405, self.__json({'greska': 'Dozvoljeni su samo GET i HEAD.'})
+                else:
+                    try:
+                        status, tijelo = await self.odgovor(putanja)
+                    except Exception as e:
+                        status, tijelo = 502, self.__json({'greska': str(e)})
+
+                await self.__posalji(writer, status, tijelo if metoda == 'GET' else b'', zadrzi, len(tijelo))
+                if not zadrzi:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def __posalji(writer, status, tijelo, zadrzi, duzina = None):
+        razlozi = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 502: 'Bad Gateway'}
+        writer.write(
+            'HTTP/1.1 {0} {1}\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: {2}\r\nConnection: {3}\r\n\r\n'.format(
+                status, razlozi[status], len(tijelo) if duzina is None else duzina, 'keep-alive' if zadrzi else 'close').encode('latin-1') + tijelo)
+        await writer.drain()
+
+    async def pokreni(self, adresa = '127.0.0.1', port = 8080):
+        server = await asyncio.start_server(self.obradi, adresa, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.__executor.shutdown(wait = False)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Lokalni HTTP API za podatke MZTK')
+    parser.add_argument('--adresa', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8080)
+    parser.add_argument('--ttl', type = float, default = 300, help = 'svježina podataka stanice u sekundama')
+    parser.add_argument('--ring', help = 'direktorij ring_store pohrane (za NowCAST od prvog zahtjeva)')
+    args = parser.parse_args(argv)
+
+    pohrana = None
+    if args.ring:
+        import ring_store
+        pohrana = ring_store.RingStore(args.ring, samo_citanje = True)
+
+    server = Server(args.ttl, pohrana = pohrana)
+    try:
+        asyncio.run(server.pokreni(args.adresa, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+'''
+Lokalna zamjena za www.monitoringzrakatk.info, za testiranje opterećenja i grešaka
+
+Stranice stanica imaju isti HTML kao prava stranica (vrijeme u prvom <strong>, vrijednosti
+u div-ovima 'data-values_value'), uz stranice mobilnih stanica, početnu stranicu s listom
+stanica i news.html. Vrijednosti su izmišljene, ali ponovljive: za istu stanicu i isti sat
+su uvijek iste (vidi vrijednosti()), pa se preuzeti podaci mogu provjeriti.
+
+Novi sat se objavljuje svakih 'sat' sekundi (3600 kao prava stranica, ili manje za brže testove).
+Stranice imaju ETag, pa uslovni zahtjevi (http_cache) dobijaju 304 dok se ne objavi novi sat.
+
+Greške (po zahtjevu, slučajno):
+    - kasnjenje - medijan kašnjenja odgovora u sekundama (log-normalna raspodjela, 'rasipanje' je sigma)
+    - greske    - udio odgovora sa statusom 503
+    - skraceno  - udio odgovora kod kojih se konekcija prekida usred tijela (Content-Length ostaje pun)
+    - nedostaje - udio vrijednosti koje stanica nije izmjerila (na stranici '-')
+
+Sa 'propusnost' (bajta/s po konekciji) se tijelo šalje postepeno, kao preko sporog linka;
+klijent koji zatvori konekciju ranije (čitanje u dijelovima) ne dobija ostatak stranice.
+
+Statistika simulatora (zahtjevi, statusi, poslani bajti) je na /_statistika (JSON).
+
+Pokretanje:
+    python simulator.py [--adresa 127.0.0.1] [--port 8000] [--stanica 300] [--kasnjenje 0.2] [--greske 0.05]
+                        [--skraceno 0.01] [--nedostaje 0.01] [--sat 3600] [--dopuna 0] [--propusnost 0]
+
+Klijenti se usmjeravaju na simulator s transport.postavi_transport(transport.Transport(bazni_url = 'http://127.0.0.1:8000')).
+'''
+import argparse
+import asyncio
+import collections
+import json
+import math
+import random
+import threading
+import time
+
+import mztk
+
+NAZIVI = [
+    'Sumpor dioksid (SO<sub>2</sub>)',
+    'Azot dioksid (NO<sub>2</sub>)',
+    'Ugljen monoksid (CO)',
+    'Ozon (O<sub>3</sub>)',
+    'Suspendovane čestice (PM<sub>2.5</sub>)',
+    'Relativna vlažnost',
+    'Zračni pritisak',
+    'Temperatura zraka',
+    'Brzina vjetra',
+    'Smjer vjetra']
+
+_POCETAK = '''<!DOCTYPE html>
+<html lang="bs">
+<head>
+    <meta charset="utf-8">
+    <title>Monitoring kvaliteta zraka Tuzlanskog kantona - {naslov}</title>
+    <link href="css/bootstrap.min.css" rel="stylesheet">
+</head>
+<body>
+<div class="container">
+    <ul class="nav nav-pills nav-justified">
+{meni}
+    </ul>
+'''
+
+_KRAJ = '''</div>
+<footer class="footer">
+    <div class="container">
+        <p class="text-muted">&copy; Simulator MZTK stranice. Podaci nisu stvarni.</p>
+    </div>
+</footer>
+{dopuna}</body>
+</html>
+'''
+
+_VRIJEDNOST = '''                    <div class="row data-values">
+                        <div class="col-xs-7 data-values_name">{naziv}</div>
+                        <div class="col-xs-5 data-values_value ie-old-hidden"><span>{vrijednost}</span> <small>{jedinica}</small></div>
+                        <div class="col-xs-5 data-values_value ie-old-visible">{vrijednost} {jedinica}</div>
+                    </div>
+'''
+
+def sinteticke_stanice(broj):
+    ''' Nazivi sintetičkih stanica ('sim-001', ...) '''
+    return ['sim-{0:03d}'.format(i + 1) for i in range(broj)]
+
+def sinteticke_mobilne(stanice):
+    ''' Sintetičke stanice koje su mobilne (svaka peta) '''
+    return stanice[::5]
+
+class Simulator:
+    '''
+    @param: stanice - stanice koje simulator poslužuje (mztk.gradovi ako nije navedeno)
+    @param: mobilne - stanice koje se poslužuju kao mobilna-<stanica>.html (mztk.mobilna_gradovi ako nije navedeno)
+    @param: kasnjenje, rasipanje, greske, skraceno, nedostaje - vidi opis modula
+    @param: sat - trajanje jednog sata simulatora u sekundama
+    @param: dopuna - broj bajta dodatnog sadržaja na kraju stranice stanice (npr. podaci za grafikone)
+    @param: propusnost - bajta/s po konekciji za slanje tijela (0 - bez ograničenja)
+    @param: seed - za ponovljive greške i kašnjenja (vrijednosti su ponovljive uvijek)
+
+    Funkcije:
+        - sat_objave()                      - Posljednji objavljeni sat (epoch sekunde)
+        - vrijednosti(grad, sat = None)     - Vrijednosti na stranici stanice za sat (None za vrijednost koja nedostaje)
+        - stranica(putanja)                 - (status, HTML) za putanju, bez simuliranih grešaka
+        - pokreni(adresa, port)             - Poslužuj zahtjeve (asyncio)
+        - pokreni_u_pozadini(adresa, port)  - Poslužuj zahtjeve u pozadinskoj niti, vraća bazni URL
+        - zaustavi()                        - Zaustavi pokreni_u_pozadini
+        - statistika                        - collections.Counter: zahtjevi, statusi, skraćeni odgovori, poslani bajti
+                                              (i na /_statistika)
+    '''
+
+    def __init__(self, stanice = None, mobilne = None, kasnjenje = 0, rasipanje = 0.5, greske = 0, skraceno = 0,
+                 nedostaje = 0, sat = 3600, dopuna = 0, propusnost = 0, seed = None):
+        self.stanice = list(stanice if stanice is not None else mztk.gradovi)
+        self.mobilne = set(mobilne if mobilne is not None else mztk.mobilna_gradovi)
+        self.kasnjenje = kasnjenje
+        self.rasipanje = rasipanje
+        self.greske = greske
+        self.skraceno = skraceno
+        self.nedostaje = nedostaje
+        self.sat = sat
+        self.dopuna = dopuna
+        self.propusnost = propusnost
+
+        self.statistika = collections.Counter()
+
+        self.__rng = random.Random(seed)
+        self.__stranice = {}
+        self.__putanje = {}
+        for grad in self.stanice:
+            self.__putanje['/{0}{1}.html'.format('mobilna-' if grad in self.mobilne else '', grad)] = grad
+
+        # Prvi objavljeni sat je prethodni puni sat, kao na pravoj stranici
+        self.__prvi_sat = int(time.time() // 3600 * 3600) - 3600
+        self.__pocetak = time.monotonic()
+
+        self.__loop = None
+        self.__nit = None
+        self.__server = None
+
+    def sat_objave(self):
+        return self.__prvi_sat + int((time.monotonic() - self.__pocetak) / self.sat) * 3600
+
+    def vrijednosti(self, grad, sat = None):
+        if sat is None:
+            sat = self.sat_objave()
+
+        osnova = random.Random(grad)
+        rng = random.Random('{0}:{1}'.format(grad, sat))
+
+        # Dnevni ciklus: zagađenje najveće navečer, temperatura poslije podne
+        lokalno = time.localtime(sat)
+        ciklus = math.cos(2 * math.pi * (lokalno.tm_hour - 20) / 24)
+        toplo = math.cos(2 * math.pi * (lokalno.tm_hour - 15) / 24)
+
+        vrijednosti = [
+            round(osnova.uniform(5, 60) * (1 + 0.4 * ciklus) * rng.uniform(0.8, 1.2), 1),
+            round(osnova.uniform(10, 40) * (1 + 0.3 * ciklus) * rng.uniform(0.8, 1.2), 1),
+            round(osnova.uniform(0.2, 1.5) * (1 + 0.3 * ciklus) * rng.uniform(0.8, 1.2), 1),
+            round(osnova.uniform(20, 80) * (1 - 0.3 * ciklus) * rng.uniform(0.8, 1.2), 1),
+            round(osnova.uniform(10, 90) * (1 + 0.5 * ciklus) * rng.uniform(0.7, 1.3), 1),
+            float(round(min(100, osnova.uniform(50, 80) - 15 * toplo + rng.uniform(-5, 5)))),
+            round(osnova.uniform(995, 1025) + rng.uniform(-2, 2), 1),
+            round(osnova.uniform(0, 15) + 6 * toplo + rng.uniform(-1, 1), 1),
+            round(rng.uniform(0, 5), 1),
+            float(rng.randrange(0, 360))]
+
+        return [None if rng.random() < self.nedostaje else v for v in vrijednosti]
+
+    def stranica(self, putanja):
+        ''' (status, HTML kao bytes) za putanju, bez simuliranih grešaka '''
+        putanja = putanja.split('?')[0]
+
+        if putanja in ('/', '/index.html'):
+            return 200, self.__pocetna()
+        if putanja == '/news.html':
+            return 200, self.__obavjestenja()
+
+        grad = self.__putanje.get(putanja)
+        if grad is None:
+            return 404, self.__html('Nije pronađeno', '    <h1>Stranica nije pronađena</h1>\n')
+
+        # Stranica stanice se mijenja samo s novim satom - pravi se jednom po satu
+        sat = self.sat_objave()
+        zapis = self.__stranice.get(grad)
+        if zapis is None or zapis[0] != sat:
+            zapis = self.__stranice[grad] = (sat, self.__stanica(grad, sat))
+        return 200, zapis[1]
+
+    def __meni(self, sve):
+        # Na početnoj stranici su sve stanice, a na ostalim samo prvih 6 (kao na pravoj stranici)
+        stanice = self.stanice if sve else self.stanice[:6]
+        return '\n'.join('        <li><a href="{0}.html">{1}</a></li>'.format(g, g.capitalize()) for g in stanice)
+
+    def __html(self, naslov, sadrzaj, dopuna = '', sve = False):
+        return (_POCETAK.format(naslov = naslov, meni = self.__meni(sve)) + sadrzaj + _KRAJ.format(dopuna = dopuna)).encode('utf-8')
+
+    def __pocetna(self):
+        return self.__html('Početna', '    <h1>Monitoring kvaliteta zraka</h1>\n', sve = True)
+
+    def __stanica(self, grad, sat):
+        vrijednosti = []
+        for naziv, vrijednost, jedinica in zip(NAZIVI, self.vrijednosti(grad, sat), mztk.units):
+            tekst = '-' if vrijednost is None else ('{0:.0f}' if vrijednost == int(vrijednost) else '{0}').format(vrijednost)
+            vrijednosti.append(_VRIJEDNOST.format(naziv = naziv, vrijednost = tekst, jedinica = jedinica))
+
+        naslov = ('Mobilna stanica - ' if grad in self.mobilne else '') + grad.capitalize()
+        sadrzaj = '''    <div class="row page-header">
+        <div class="col-md-8"><h1>{0}</h1></div>
+        <div class="col-md-4 text-right"><p>Posljednje mjerenje:<br><strong>{1}</strong></p></div>
+    </div>
+    <div class="row">
+        <div class="col-md-6">
+            <div class="panel panel-default">
+                <div class="panel-body">
+{2}                </div>
+            </div>
+        </div>
+    </div>
+'''.format(naslov, time.strftime('%d.%m.%Y %H:%M', time.localtime(sat)), ''.join(vrijednosti))
+
+        dopuna = ''
+        if self.dopuna:
+            dopuna = '<script>\n    var podaci = [{0}];\n</script>\n'.format(('0.0,' * (self.dopuna // 4 + 1))[:self.dopuna])
+
+        return self.__html(naslov, sadrzaj, dopuna)
+
+    def __obavjestenja(self):
+        # Novo obavještenje svaka 24 sata simulatora
+        dan = self.sat_objave() // 86400 * 86400
+        obavjestenja = []
+        for i in range(4):
+            datum = time.strftime('%d.%m.%Y', time.localtime(dan - i * 3 * 86400))
+            obavjestenja.append(
+                '<div class="col-md-12 alert alert-warning"><h3>{0}</h3><div><p class="paragraph">'
+                'Obavještenje simulatora broj {1}.</p><ul class="minus"><li>Prva mjera,</li><li>Druga mjera.</li></ul></div></div>\n'.format(
+                    datum, dan // 86400 - i * 3))
+
+        return self.__html('Obavještenja', '    <div class="row">\n{0}    </div>\n'.format(''.join(obavjestenja)))
+
+    def __etag(self, putanja):
+        grad = self.__putanje.get(putanja.split('?')[0])
+        if grad is None:
+            return None
+        return '"{0}-{1}"'.format(grad, self.sat_objave())
+
+    async def obradi(self, reader, writer):
+        ''' Jedna HTTP/1.1 konekcija (keep-alive) '''
+        try:
+            while True:
+                zahtjev = await reader.readline()
+                if not zahtjev:
+                    break
+
+                zaglavlja = {}
+                while True:
+                    red = await reader.readline()
+                    if red in (b'\r\n', b'\n', b''):
+                        break
+                    ime, _, vrijednost = red.decode('latin-1').partition(':')
+                    zaglavlja[ime.strip().lower()] = vrijednost.strip()
+
+                try:
+                    metoda, putanja, _ = zahtjev.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                if putanja == '/_statistika':
+                    await self.__posalji(writer, 200, json.dumps(self.statistika).encode('utf-8'), broji = False)
+                    continue
+
+                self.statistika['zahtjevi'] += 1
+
+                if self.kasnjenje:
+                    await asyncio.sleep(self.__rng.lognormvariate(math.log(self.kasnjenje), self.rasipanje))
+
+                if self.__rng.random() < self.greske:
+                    await self.__posalji(writer, 503, b'<html><body>Service Unavailable</body></html>')
+                    continue
+
+                etag = self.__etag(putanja)
+                if etag is not None and zaglavlja.get('if-none-match') == etag:
+                    await self.__posalji(writer, 304, b'', etag)
+                    continue
+
+                status, tijelo = self.stranica(putanja)
+
+                if status == 200 and self.__rng.random() < self.skraceno:
+                    # Pun Content-Length, a samo dio tijela - klijent vidi prekinutu konekciju
+                    self.statistika['skraceni'] += 1
+                    await self.__posalji(writer, status, tijelo, etag, skrati = self.__rng.randrange(len(tijelo)))
+                    break
+
+                await self.__posalji(writer, status, tijelo if metoda != 'HEAD' else b'', etag, duzina = len(tijelo))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # zaustavi() prekida otvorene konekcije - zadatak se završava normalno
+            pass
+        finally:
+            writer.close()
+
+    async def __posalji(self, writer, status, tijelo, etag = None, duzina = None, skrati = None, broji = True):
+        razlozi = {200: 'OK', 304: 'Not Modified', 404: 'Not Found', 503: 'Service Unavailable'}
+        zaglavlja = 'HTTP/1.1 {0} {1}\r\nContent-Type: text/html; charset=utf-8\r\nContent-Length: {2}\r\n'.format(
+            status, razlozi[status], len(tijelo) if duzina is None else duzina)
+        if etag is not None:
+            zaglavlja += 'ETag: {0}\r\n'.format(etag)
+
+        if skrati is not None:
+            tijelo = tijelo[:skrati]
+
+        if broji:
+            self.statistika['status_{0}'.format(status)] += 1
+
+        if not self.propusnost or not broji:
+            writer.write(zaglavlja.encode('latin-1') + b'\r\n' + tijelo)
+            await writer.drain()
+            if broji:
+                self.statistika['poslano_bytes'] += len(tijelo)
+            return
+
+        writer.write(zaglavlja.encode('latin-1') + b'\r\n')
+        dio = 4096
+        for i in range(0, len(tijelo), dio):
+            # Konekcija koju je klijent zatvorio se prepoznaje pri drain (ConnectionResetError)
+            await asyncio.sleep(dio / self.propusnost)
+            writer.write(tijelo[i:i + dio])
+            await writer.drain()
+            self.statistika['poslano_bytes'] += len(tijelo[i:i + dio])
+
+    async def pokreni(self, adresa = '127.0.0.1', port = 8000):
+        self.__server = await asyncio.start_server(self.obradi, adresa, port, backlog = 1024)
+        async with self.__server:
+            try:
+                await self.__server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def pokreni_u_pozadini(self, adresa = '127.0.0.1', port = 0):
+        ''' Pokreni simulator u pozadinskoj niti (port 0 - bilo koji slobodan); vraća bazni URL za transport.Transport '''
+        spreman = threading.Event()
+        self.__loop = asyncio.new_event_loop()
+
+        async def pocni():
+            self.__server = await asyncio.start_server(self.obradi, adresa, port, backlog = 1024)
+            spreman.set()
+
+        def nit():
+            asyncio.set_event_loop(self.__loop)
+            self.__loop.run_until_complete(pocni())
+            self.__loop.run_forever()
+
+        self.__nit = threading.Thread(target = nit, daemon = True)
+        self.__nit.start()
+        spreman.wait()
+
+        return 'http://{0}:{1}'.format(adresa, self.__server.sockets[0].getsockname()[1])
+
+    def zaustavi(self):
+        if self.__loop is None:
+            return
+
+        async def kraj():
+            # Zatvori server i prekini otvorene konekcije (keep-alive klijenata)
+            self.__server.close()
+            zadaci = [z for z in asyncio.all_tasks() if z is not asyncio.current_task()]
+            for z in zadaci:
+                z.cancel()
+            await asyncio.gather(*zadaci, return_exceptions = True)
+
+        asyncio.run_coroutine_threadsafe(kraj(), self.__loop).result()
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__nit.join()
+        self.__loop.close()
+        self.__loop = None
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Lokalna zamjena za MZTK stranicu')
+    parser.add_argument('--adresa', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = 8000)
+    parser.add_argument('--stanica', type = int, help = 'broj sintetičkih stanica (sim-001, ...) uz stanice iz mztk.gradovi')
+    parser.add_argument('--kasnjenje', type = float, default = 0, help = 'medijan kašnjenja odgovora [s]')
+    parser.add_argument('--rasipanje', type = float, default = 0.5, help = 'sigma log-normalne raspodjele kašnjenja')
+    parser.add_argument('--greske', type = float, default = 0, help = 'udio odgovora 503')
+    parser.add_argument('--skraceno', type = float, default = 0, help = 'udio prekinutih odgovora')
+    parser.add_argument('--nedostaje', type = float, default = 0, help = 'udio vrijednosti koje nedostaju')
+    parser.add_argument('--sat', type = float, default = 3600, help = 'trajanje sata simulatora [s]')
+    parser.add_argument('--dopuna', type = int, default = 0, help = 'dodatni bajti na kraju stranice stanice')
+    parser.add_argument('--propusnost', type = float, default = 0, help = 'bajta/s po konekciji (0 - bez ograničenja)')
+    parser.add_argument('--seed', type = int)
+    args = parser.parse_args(argv)
+
+    stanice = mobilne = None
+    if args.stanica:
+        sinteticke = sinteticke_stanice(args.stanica)
+        stanice = mztk.gradovi + sinteticke
+        mobilne = mztk.mobilna_gradovi + sinteticke_mobilne(sinteticke)
+
+    simulator = Simulator(stanice, mobilne, kasnjenje = args.kasnjenje, rasipanje = args.rasipanje, greske = args.greske,
+        skraceno = args.skraceno, nedostaje = args.nedostaje, sat = args.sat, dopuna = args.dopuna,
+        propusnost = args.propusnost, seed = args.seed)
+
+    print('Simulator: http://{0}:{1} ({2} stanica)'.format(args.adresa, args.port, len(simulator.stanice)))
+    try:
+        asyncio.run(simulator.pokreni(args.adresa, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
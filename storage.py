@@ -0,0 +1,341 @@
+import os
+import sqlite3
+import time
+
+import aqi
+import reading
+
+''' Polja za koja se vode dnevni i mjesečni sažeci (min / prosjek / max) '''
+POLJA_SAZETAKA = reading.VALUES + ('aqi_pm25',)
+
+_SEMA = '''
+CREATE TABLE IF NOT EXISTS ocitanja (
+    stanica TEXT NOT NULL,
+    vrijeme INTEGER NOT NULL,
+    so2 REAL, no2 REAL, co REAL, o3 REAL, pm25 REAL, h REAL, p REAL, t REAL, ws REAL, wd REAL,
+    nowcast_pm25 REAL,
+    aqi_pm25 REAL,
+    PRIMARY KEY (stanica, vrijeme)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sazeci (
+    stanica TEXT NOT NULL,
+    period TEXT NOT NULL,
+    polje TEXT NOT NULL,
+    broj INTEGER NOT NULL,
+    suma REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    PRIMARY KEY (stanica, period, polje)
+) WITHOUT ROWID;
+'''
+
+_UPSERT_SAZETKA = '''
+INSERT INTO sazeci (stanica, period, polje, broj, suma, min, max) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (stanica, period, polje) DO UPDATE SET
+    broj = broj + excluded.broj,
+    suma = suma + excluded.suma,
+    min = min(min, excluded.min),
+    max = max(max, excluded.max)
+'''
+
+def _granice_perioda(period):
+    ''' (početak, kraj) u epoch sekundama za dan 'YYYY-MM-DD' ili mjesec 'YYYY-MM' (lokalno vrijeme) '''
+    if len(period) == 10:
+        pocetak = time.strptime(period, '%Y-%m-%d')
+        kraj = time.struct_time((pocetak.tm_year, pocetak.tm_mon, pocetak.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+    else:
+        pocetak = time.strptime(period, '%Y-%m')
+        kraj = time.struct_time((pocetak.tm_year, pocetak.tm_mon + 1, 1, 0, 0, 0, 0, 0, -1))
+
+    return int(time.mktime(pocetak)), int(time.mktime(kraj))
+
+class ErrorSqliteStore(Exception):
+    def __init__(self, poruka):
+        super().__init__(poruka)
+
+class SqliteStore:
+    '''
+    Trajna pohrana mjerenja u SQLite bazi (WAL način rada)
+
+    Mjerenja se upisuju u serijama (jedna transakcija po seriji), a ponovljeno mjerenje
+    iste stanice za isti sat se zanemaruje (primarni ključ (stanica, vrijeme)).
+    Uz svako novo mjerenje se računa NowCAST i AQI za PM2.5 (iz prethodnih 12 sati u bazi)
+    i ažuriraju dnevni ('YYYY-MM-DD') i mjesečni ('YYYY-MM') sažeci (broj, suma, min, max)
+    za svako polje, pa pitanja o periodima ne čitaju pojedinačna mjerenja.
+
+    Mjerenje upisano naknadno (starije od već upisanih mjerenja stanice, npr. iz importer.py
+    koji dijelove upisuje redoslijedom kojim ih procesi završe) ponovo računa NowCAST i AQI
+    za sljedećih 11 sati i njihove sažetke, pa rezultat ne zavisi od redoslijeda upisa.
+
+    @param: putanja - datoteka baze (':memory:' za bazu u memoriji)
+    @param: velicina_serije - broj mjerenja nakon kojeg se serija automatski upisuje
+
+    Funkcije:
+        - zapisi_ocitanje(ocitanje)                         - Dodaj reading.Reading u seriju
+        - zapisi_mztk(podaci)                               - Dodaj posljednje podatke mztk objekta
+        - zapisi_sve(ocitanja)                              - Dodaj i upiši više mjerenja (vraća broj novih)
+        - flush()                                           - Upiši seriju (vraća broj novih mjerenja)
+        - ocitanja(stanice, od, do)                         - Mjerenja kao generator reading.Reading
+        - aqi(grad, vrijeme = None)                         - (vrijeme, NowCAST, AQI) posljednjeg mjerenja do vremena
+        - sazeci(grad, polje, od, do, period = 'dan')       - Dnevni ili mjesečni sažeci za period
+        - statistika(grad, polje, od, do)                   - min / prosjek / max za period, iz dnevnih sažetaka
+        - stanice()                                         - Stanice s mjerenjima
+    '''
+
+    def __init__(self, putanja, velicina_serije = 500):
+        if putanja != ':memory:':
+            putanja = os.path.expanduser(putanja)
+
+        self.putanja = putanja
+        self.velicina_serije = velicina_serije
+
+        self.__baza = sqlite3.connect(putanja)
+        self.__baza.execute('PRAGMA journal_mode = WAL')
+        self.__baza.execute('PRAGMA synchronous = NORMAL')
+        self.__baza.executescript(_SEMA)
+        self.__serija = []
+
+        ''' Po stanici (posljednji upisani sat, aqi.NowCastWindow) - da se prozor ne čita iz baze za svaki sat '''
+        self.__prozori = {}
+
+    def zapisi_ocitanje(self, ocitanje):
+        self.__serija.append(ocitanje)
+        if len(self.__serija) >= self.velicina_serije:
+            return self.flush()
+        return 0
+
+    def zapisi_mztk(self, podaci):
+        return self.zapisi_ocitanje(podaci.ocitanje())
+
+    def zapisi_sve(self, ocitanja):
+        novih = 0
+        for o in ocitanja:
+            novih += self.zapisi_ocitanje(o)
+        return novih + self.flush()
+
+    def flush(self):
+        ''' Upiši seriju u jednoj transakciji; vraća broj novih mjerenja (bez ponovljenih) '''
+        if not self.__serija:
+            return 0
+
+        # Po stanici od najstarijeg, da NowCAST svakog sata vidi prethodne sate iz iste serije
+        serija = sorted(self.__serija, key = lambda o: (o.grad, o.vrijeme))
+        self.__serija = []
+
+        sazeci = {}
+        novih = 0
+
+        ''' Po stanici [najstarije, najnovije] naknadno upisano mjerenje (starije od posljednjeg u bazi) '''
+        naknadno = {}
+        zadnji = {}
+
+        with self.__baza:
+            for o in serija:
+                if self.__baza.execute('SELECT 1 FROM ocitanja WHERE stanica = ? AND vrijeme = ?', (o.grad, o.vrijeme)).fetchone():
+                    # Ponovljeno mjerenje - bez računanja NowCAST-a (i bez ponovnog pravljenja prozora)
+                    continue
+
+                if o.grad not in zadnji:
+                    zadnji[o.grad] = self.__baza.execute('SELECT max(vrijeme) FROM ocitanja WHERE stanica = ?', (o.grad,)).fetchone()[0]
+                if zadnji[o.grad] is not None and o.vrijeme < zadnji[o.grad]:
+                    granice = naknadno.setdefault(o.grad, [o.vrijeme, o.vrijeme])
+                    granice[1] = o.vrijeme
+
+                vrijednosti = [None if v != v else v for v in o.vrijednosti]
+                nowcast, indeks = self.__nowcast(o.grad, o.vrijeme, vrijednosti[reading.VALUES.index('pm25')])
+
+                self.__baza.execute(
+                    'INSERT INTO ocitanja VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (o.grad, o.vrijeme, *vrijednosti, nowcast, indeks))
+
+                novih += 1
+                lokalno = time.localtime(o.vrijeme)
+                for period in (time.strftime('%Y-%m-%d', lokalno), time.strftime('%Y-%m', lokalno)):
+                    for polje, v in zip(POLJA_SAZETAKA, vrijednosti + [indeks]):
+                        if v is None:
+                            continue
+
+                        kljuc = (o.grad, period, polje)
+                        s = sazeci.get(kljuc)
+                        if s is None:
+                            sazeci[kljuc] = [1, v, v, v]
+                        else:
+                            s[0] += 1
+                            s[1] += v
+                            s[2] = min(s[2], v)
+                            s[3] = max(s[3], v)
+
+            self.__baza.executemany(_UPSERT_SAZETKA, [k + tuple(s) for k, s in sazeci.items()])
+
+            for grad, (od, do) in naknadno.items():
+                self.__preracunaj(grad, od, do)
+
+        return novih
+
+    def __preracunaj(self, grad, od, do):
+        ''' Ponovo izračunaj NowCAST i AQI za sate od 'od' do 11 sati nakon 'do' (nakon naknadnog upisa) i sažetke AQI tih sati '''
+        prozor = aqi.NowCastWindow(aqi.CalculationType.PM25)
+        kraj = do + (prozor.sati - 1) * 3600
+        redovi = self.__baza.execute(
+            'SELECT vrijeme, pm25, nowcast_pm25, aqi_pm25 FROM ocitanja WHERE stanica = ? AND vrijeme > ? AND vrijeme <= ? ORDER BY vrijeme',
+            (grad, od - prozor.sati * 3600, kraj)).fetchall()
+
+        promjene = []
+        for vrijeme, pm25, nowcast, indeks in redovi:
+            if vrijeme < od:
+                prozor.dodaj(pm25, vrijeme, izracunaj = False)
+                continue
+
+            try:
+                rezultat = prozor.dodaj(pm25, vrijeme)
+            except (aqi.ErrorOutOfRange, aqi.ErrorCalculation):
+                rezultat = None
+
+            novo = (prozor.koncentracija, rezultat.aqi) if rezultat is not None else (None, None)
+            if novo != (nowcast, indeks):
+                promjene.append(novo + (grad, vrijeme))
+
+        # Prozor u memoriji je napravljen prije naknadnog upisa
+        self.__prozori.pop(grad, None)
+
+        if not promjene:
+            return
+
+        self.__baza.executemany('UPDATE ocitanja SET nowcast_pm25 = ?, aqi_pm25 = ? WHERE stanica = ? AND vrijeme = ?', promjene)
+
+        # Min / max se ne mogu umanjiti, pa se sažeci AQI promijenjenih dana i mjeseci računaju iz mjerenja
+        periodi = set()
+        for _, _, _, vrijeme in promjene:
+            lokalno = time.localtime(vrijeme)
+            periodi.add(time.strftime('%Y-%m-%d', lokalno))
+            periodi.add(time.strftime('%Y-%m', lokalno))
+
+        for period in periodi:
+            pocetak, kraj = _granice_perioda(period)
+            self.__baza.execute("DELETE FROM sazeci WHERE stanica = ? AND period = ? AND polje = 'aqi_pm25'", (grad, period))
+            self.__baza.execute(
+                "INSERT INTO sazeci (stanica, period, polje, broj, suma, min, max) "
+                "SELECT ?, ?, 'aqi_pm25', count(aqi_pm25), sum(aqi_pm25), min(aqi_pm25), max(aqi_pm25) FROM ocitanja "
+                "WHERE stanica = ? AND vrijeme >= ? AND vrijeme < ? AND aqi_pm25 IS NOT NULL HAVING count(aqi_pm25) > 0",
+                (grad, period, grad, pocetak, kraj))
+
+    def __nowcast(self, grad, vrijeme, pm25):
+        ''' (NowCAST, AQI) za PM2.5 iz prethodnih 11 sati u bazi i novog sata, ili (None, None) '''
+        prozor = self.__prozori.get(grad)
+        if prozor is None or vrijeme <= prozor[0]:
+            prozor = self.__napravi_prozor(grad, vrijeme)
+        else:
+            # Novi sat nakon posljednjeg upisanog - dovoljno ga je dodati u postojeći prozor
+            prozor = prozor[1]
+            self.__prozori[grad] = (vrijeme, prozor)
+
+        try:
+            rezultat = prozor.dodaj(pm25, vrijeme)
+        except (aqi.ErrorOutOfRange, aqi.ErrorCalculation):
+            return None, None
+
+        if rezultat is None:
+            return None, None
+
+        return prozor.koncentracija, rezultat.aqi
+
+    def __napravi_prozor(self, grad, vrijeme):
+        ''' NowCAST prozor s mjerenjima iz baze prije vremena; pamti se samo ako u bazi nema novijih mjerenja stanice '''
+        prozor = aqi.NowCastWindow(aqi.CalculationType.PM25)
+        prethodni = self.__baza.execute(
+            'SELECT vrijeme, pm25 FROM ocitanja WHERE stanica = ? AND vrijeme > ? AND vrijeme < ? ORDER BY vrijeme',
+            (grad, vrijeme - prozor.sati * 3600, vrijeme))
+
+        for sat, vrijednost in prethodni:
+            prozor.dodaj(vrijednost, sat, izracunaj = False)
+
+        zadnji = self.__baza.execute('SELECT max(vrijeme) FROM ocitanja WHERE stanica = ?', (grad,)).fetchone()[0]
+        if zadnji is None or zadnji < vrijeme:
+            self.__prozori[grad] = (vrijeme, prozor)
+        else:
+            self.__prozori.pop(grad, None)
+
+        return prozor
+
+    def ocitanja(self, stanice = None, od = None, do = None):
+        ''' Mjerenja (reading.Reading) po stanicama, od najstarijeg, čitana iz baze postepeno '''
+        self.flush()
+
+        uslovi = []
+        parametri = []
+        if stanice:
+            uslovi.append('stanica IN ({0})'.format(','.join('?' * len(stanice))))
+            parametri.extend(stanice)
+        if od is not None:
+            uslovi.append('vrijeme >= ?')
+            parametri.append(od)
+        if do is not None:
+            uslovi.append('vrijeme < ?')
+            parametri.append(do)
+
+        upit = 'SELECT stanica, vrijeme, {0} FROM ocitanja'.format(', '.join(reading.VALUES))
+        if uslovi:
+            upit += ' WHERE ' + ' AND '.join(uslovi)
+        upit += ' ORDER BY stanica, vrijeme'
+
+        for red in self.__baza.execute(upit, parametri):
+            yield reading.Reading(red[0], red[1], *(v if v is not None else float('nan') for v in red[2:]))
+
+    def aqi(self, grad, vrijeme = None):
+        ''' (vrijeme, NowCAST koncentracija, AQI) za PM2.5 posljednjeg mjerenja do vremena (uključeno), ili None '''
+        self.flush()
+        return self.__baza.execute(
+            'SELECT vrijeme, nowcast_pm25, aqi_pm25 FROM ocitanja WHERE stanica = ? AND vrijeme <= ? ORDER BY vrijeme DESC LIMIT 1',
+            (grad, vrijeme if vrijeme is not None else 2 ** 62)).fetchone()
+
+    def sazeci(self, grad, polje, od = None, do = None, period = 'dan'):
+        '''
+        Sažeci za stanicu i polje kao lista (period, min, prosjek, max, broj)
+        @param: od, do - 'YYYY-MM-DD' (dan) ili 'YYYY-MM' (mjesec), do nije uključen
+        '''
+        self.__provjeri_polje(polje)
+        self.flush()
+
+        duzina = {'dan': 10, 'mjesec': 7}.get(period)
+        if duzina is None:
+            raise ErrorSqliteStore("Period mora biti 'dan' ili 'mjesec'.")
+
+        return [(p, mn, suma / broj, mx, broj) for p, mn, suma, mx, broj in self.__baza.execute(
+            'SELECT period, min, suma, max, broj FROM sazeci WHERE stanica = ? AND polje = ? AND length(period) = ? '
+            'AND period >= ? AND period < ? ORDER BY period',
+            (grad, polje, duzina, od or '', do or '9999'))]
+
+    def statistika(self, grad, polje, od = None, do = None):
+        ''' (min, prosjek, max, broj) polja za dane od (uključen) do (nije uključen), 'YYYY-MM-DD', ili None '''
+        self.__provjeri_polje(polje)
+        self.flush()
+
+        mn, suma, mx, broj = self.__baza.execute(
+            'SELECT min(min), sum(suma), max(max), sum(broj) FROM sazeci WHERE stanica = ? AND polje = ? AND length(period) = 10 '
+            'AND period >= ? AND period < ?',
+            (grad, polje, od or '', do or '9999')).fetchone()
+
+        if not broj:
+            return None
+
+        return mn, suma / broj, mx, broj
+
+    def stanice(self):
+        self.flush()
+        return [r[0] for r in self.__baza.execute('SELECT DISTINCT stanica FROM sazeci ORDER BY stanica')]
+
+    def close(self):
+        self.flush()
+        self.__baza.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def __provjeri_polje(polje):
+        if polje not in POLJA_SAZETAKA:
+            raise ErrorSqliteStore("Nepoznato polje '{0}'.".format(polje))
@@ -0,0 +1,404 @@
+import random
+import threading
+import time
+
+from urllib.parse import urlsplit, urlunsplit
+
+import metrics
+
+class ErrorTransport(Exception):
+    ''' Osnovna greška preuzimanja - sve greške transporta su njene podklase '''
+    def __init__(self, poruka):
+        super().__init__(poruka)
+
+class ErrorTimeout(ErrorTransport):
+    def __init__(self, url):
+        self.url = url
+        super().__init__("Stranica {0} nije odgovorila na vrijeme.".format(url))
+
+class ErrorConnection(ErrorTransport):
+    def __init__(self, url):
+        self.url = url
+        super().__init__("Nije moguće uspostaviti vezu sa stranicom {0}.".format(url))
+
+class ErrorHttpStatus(ErrorTransport):
+    def __init__(self, url, status):
+        self.url = url
+        self.status = status
+        super().__init__("Stranica {0} je vratila status {1}.".format(url, status))
+
+class ErrorCircuitOpen(ErrorTransport):
+    def __init__(self, host, preostalo):
+        self.host = host
+        super().__init__("Stranica {0} je nedostupna, novi pokušaj za {1:.1f} s.".format(host, max(preostalo, 0)))
+
+class _Prekidac:
+    '''
+    Prekidač (circuit breaker) za jedan host
+
+    Nakon 'prag' uzastopnih neuspjelih pokušaja se otvara i zahtjevi odmah dobijaju
+    ErrorCircuitOpen, bez čekanja na mrežu. Nakon 'pauza' sekundi se propušta jedan
+    probni zahtjev: ako uspije prekidač se zatvara, a ako ne, ostaje otvoren još 'pauza' sekundi.
+    '''
+
+    def __init__(self, prag, pauza):
+        self.prag = prag
+        self.pauza = pauza
+        self.neuspjesnih = 0
+        self.otvoren_do = None
+        self.__proba = False
+        self.__lock = threading.Lock()
+
+    def dozvoli(self):
+        ''' 0 ako je zahtjev dozvoljen, inače broj sekundi do sljedećeg probnog zahtjeva '''
+        with self.__lock:
+            if self.otvoren_do is None:
+                return 0
+
+            preostalo = self.otvoren_do - time.monotonic()
+            if preostalo > 0:
+                return preostalo
+
+            # Poluotvoren - samo jedan probni zahtjev istovremeno
+            if self.__proba:
+                return self.pauza
+            self.__proba = True
+            return 0
+
+    def uspjeh(self):
+        with self.__lock:
+            self.neuspjesnih = 0
+            self.otvoren_do = None
+            self.__proba = False
+
+    def neuspjeh(self):
+        ''' Vraća True ako se prekidač ovim neuspjehom otvorio '''
+        with self.__lock:
+            self.neuspjesnih += 1
+            if self.__proba or (self.otvoren_do is None and self.neuspjesnih >= self.prag):
+                self.otvoren_do = time.monotonic() + self.pauza
+                self.__proba = False
+                return True
+            return False
+
+class Transport:
+    '''
+    Zajednička HTTP sesija za sve zahtjeve prema www.monitoringzrakatk.info
+
+    Konekcije se drže otvorenim (keep-alive) i ponovo koriste iz poola, umjesto
+    da svaki requests.get otvara novu TCP konekciju.
+
+    @param: velicina_poola - maksimalan broj otvorenih konekcija po hostu
+    @param: timeout - (connect, read) u sekundama, koristi se ako poziv ne navede svoj
+    @param: keep_alive - drži konekcije otvorenim između zahtjeva
+    @param: gzip - traži kompresovan odgovor (Accept-Encoding: gzip)
+    @param: bazni_url - ako je postavljen, svi zahtjevi se preusmjeravaju na ovaj host
+                        (npr. 'http://127.0.0.1:8000' za lokalnu zamjenu stranice)
+    @param: pokusaja - najveći broj pokušaja jednog zahtjeva (1 - bez ponavljanja)
+    @param: pauza - pauza prije drugog pokušaja u sekundama; udvostručuje se za svaki sljedeći
+                    (do max_pauza), a stvarna pauza je slučajna između 0 i te vrijednosti (jitter)
+    @param: rok - najduže ukupno trajanje jednog get() u sekundama, sa svim pokušajima i pauzama
+                  (None - bez ograničenja, osim timeout-a pojedinačnih pokušaja); uz stream = True
+                  rok važi i za čitanje tijela kroz citaj_u_dijelovima
+    @param: prag_prekidaca - broj uzastopnih neuspjelih pokušaja nakon kojeg se zahtjevi prema hostu
+                             odmah odbijaju (ErrorCircuitOpen), None - bez prekidača
+    @param: pauza_prekidaca - koliko sekundi se zahtjevi odbijaju prije probnog zahtjeva
+    @param: hedge - ako odgovor ne stigne za 'hedge' sekundi, šalje se još jedan isti zahtjev
+                    i koristi se odgovor koji stigne prvi (None - isključeno)
+
+    Ponavljaju se samo zahtjevi koji nisu uspjeli zbog timeout-a, greške konekcije, statusa 5xx
+    ili 429. Neuspjeh se javlja kao ErrorTransport (ErrorTimeout, ErrorConnection,
+    ErrorHttpStatus, ErrorCircuitOpen); odgovor sa statusom 4xx je ErrorHttpStatus bez ponavljanja.
+    '''
+
+    def __init__(self, velicina_poola = 16, timeout = (3.05, 10), keep_alive = True, gzip = True, bazni_url = None,
+                 pokusaja = 3, pauza = 0.5, max_pauza = 4, rok = 30, prag_prekidaca = 5, pauza_prekidaca = 60, hedge = None):
+        # requests (i urllib3) se učitava tek kada je transport potreban
+        import requests
+
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = timeout
+        self.bazni_url = bazni_url
+        self.pokusaja = max(1, pokusaja)
+        self.pauza = pauza
+        self.max_pauza = max_pauza
+        self.rok = rok
+        self.prag_prekidaca = prag_prekidaca
+        self.pauza_prekidaca = pauza_prekidaca
+        self.hedge = hedge
+
+        self.__requests = requests
+        self.__prekidaci = {}
+        self.__lock = threading.Lock()
+        self.__izvrsilac = None
+        if rok is not None or hedge is not None:
+            from concurrent.futures import ThreadPoolExecutor
+            # Pokušaj se čeka najviše do roka; zahtjev koji kasni završava u pozadini
+            self.__izvrsilac = ThreadPoolExecutor(max_workers = velicina_poola * 2, thread_name_prefix = 'transport')
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections = 4, pool_maxsize = velicina_poola)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate' if gzip else 'identity',
+            'Connection': 'keep-alive' if keep_alive else 'close'})
+
+    def get(self, url, **kwargs):
+        adresa = self.__preusmjeri(url)
+        host = urlsplit(adresa).netloc
+        prekidac = self.__prekidac(host)
+
+        if prekidac is not None:
+            preostalo = prekidac.dozvoli()
+            if preostalo > 0:
+                metrics.brojac('mztk_prekidac_odbijeni_total', host = host)
+                raise ErrorCircuitOpen(host, preostalo)
+
+        kraj = time.monotonic() + self.rok if self.rok is not None else None
+        timeout = kwargs.pop('timeout', self.timeout)
+
+        pokusaj = 0
+        while True:
+            pokusaj += 1
+            try:
+                odgovor = self.__posalji(adresa, timeout, kraj, kwargs)
+            except ErrorTransport as e:
+                greska = e
+            else:
+                status = odgovor.status_code
+                if status < 400:
+                    if prekidac is not None:
+                        prekidac.uspjeh()
+                    if kraj is not None and kwargs.get('stream'):
+                        # Tijelo se čita kasnije (citaj_u_dijelovima) - i to čitanje mora završiti do roka
+                        odgovor.kraj_roka = kraj
+                    return odgovor
+
+                odgovor.close()
+                greska = ErrorHttpStatus(adresa, status)
+                if status < 500 and status != 429:
+                    # Stranica radi, ali ne postoji / ne dozvoljava - ponavljanje ne pomaže
+                    if prekidac is not None:
+                        prekidac.uspjeh()
+                    raise greska
+
+            if prekidac is not None and prekidac.neuspjeh():
+                metrics.brojac('mztk_prekidac_otvoren_total', host = host)
+                raise greska
+
+            # Eksponencijalna pauza s jitterom, da ponovljeni zahtjevi više stanica ne stignu istovremeno
+            pauza = random.uniform(0, min(self.max_pauza, self.pauza * 2 ** (pokusaj - 1)))
+            if pokusaj >= self.pokusaja or (kraj is not None and time.monotonic() + pauza >= kraj):
+                raise greska
+
+            metrics.brojac('mztk_ponovljeni_zahtjevi_total', host = host)
+            time.sleep(pauza)
+
+    def __posalji(self, adresa, timeout, kraj, kwargs):
+        ''' Jedan pokušaj (uz hedge možda dva paralelna zahtjeva); greške requests se pretvaraju u ErrorTransport '''
+        if kraj is not None:
+            preostalo = kraj - time.monotonic()
+            if preostalo <= 0:
+                raise ErrorTimeout(adresa)
+            # Timeout pokušaja ne smije preći rok
+            timeout = tuple(min(t, preostalo) for t in timeout) if isinstance(timeout, tuple) else min(timeout, preostalo)
+
+        if self.__izvrsilac is None:
+            return self.__zahtjev(adresa, timeout, kwargs)
+
+        from concurrent.futures import wait, FIRST_COMPLETED
+
+        buducnosti = [self.__izvrsilac.submit(self.__zahtjev, adresa, timeout, kwargs)]
+        hedge = self.hedge
+        greska = None
+        try:
+            while buducnosti:
+                cekaj = None if kraj is None else kraj - time.monotonic()
+                if cekaj is not None and cekaj <= 0:
+                    break
+                if hedge is not None:
+                    cekaj = hedge if cekaj is None else min(hedge, cekaj)
+
+                gotove, _ = wait(buducnosti, timeout = cekaj, return_when = FIRST_COMPLETED)
+                if not gotove:
+                    if hedge is None:
+                        break
+                    hedge = None
+                    metrics.brojac('mztk_hedge_zahtjevi_total', host = urlsplit(adresa).netloc)
+                    buducnosti.append(self.__izvrsilac.submit(self.__zahtjev, adresa, timeout, kwargs))
+                    continue
+
+                for b in gotove:
+                    buducnosti.remove(b)
+                    if b.exception() is None:
+                        return b.result()
+                    greska = b.exception()
+
+                # Prvi zahtjev nije uspio, a drugi nije ni poslan - nema razloga čekati
+                hedge = None
+        finally:
+            for b in buducnosti:
+                # Odgovor koji stigne nakon roka (ili nakon drugog zahtjeva) se zatvara, da konekcija ode u pool
+                b.add_done_callback(_zatvori)
+
+        if greska is not None:
+            raise greska
+        raise ErrorTimeout(adresa)
+
+    def __zahtjev(self, adresa, timeout, kwargs):
+        requests = self.__requests
+        try:
+            return self.session.get(adresa, timeout = timeout, **kwargs)
+        except requests.Timeout as e:
+            raise ErrorTimeout(adresa) from e
+        except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+            # Uključuje i prekinut prenos tijela odgovora
+            raise ErrorConnection(adresa) from e
+        except requests.RequestException as e:
+            raise ErrorTransport(str(e)) from e
+
+    def __prekidac(self, host):
+        if self.prag_prekidaca is None:
+            return None
+
+        prekidac = self.__prekidaci.get(host)
+        if prekidac is None:
+            with self.__lock:
+                prekidac = self.__prekidaci.setdefault(host, _Prekidac(self.prag_prekidaca, self.pauza_prekidaca))
+        return prekidac
+
+    def close(self):
+        if self.__izvrsilac is not None:
+            self.__izvrsilac.shutdown(wait = False)
+        self.session.close()
+
+    def __preusmjeri(self, url):
+        if self.bazni_url is None:
+            return url
+
+        baza = urlsplit(self.bazni_url)
+        dijelovi = urlsplit(url)
+        return urlunsplit((baza.scheme, baza.netloc, baza.path.rstrip('/') + dijelovi.path, dijelovi.query, dijelovi.fragment))
+
+def citaj_u_dijelovima(odgovor, velicina):
+    '''
+    odgovor.iter_content(velicina) (za get(..., stream = True)), uz greške kao ErrorTransport - prekinut prenos tijela je ErrorConnection
+    Ako je transport imao rok, tijelo se čita najviše do roka (ErrorTimeout), i kada stranica šalje sporo
+    '''
+    import requests
+
+    url = getattr(odgovor, 'url', None)
+    kraj = getattr(odgovor, 'kraj_roka', None)
+    straza = _Straza(odgovor, kraj) if kraj is not None else None
+    try:
+        for dio in odgovor.iter_content(velicina):
+            if straza is not None and straza.isteklo():
+                odgovor.close()
+                raise ErrorTimeout(url)
+            yield dio
+    except requests.Timeout as e:
+        raise ErrorTimeout(url) from e
+    except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+        if straza is not None and straza.isteklo():
+            raise ErrorTimeout(url) from e
+        raise ErrorConnection(url) from e
+    except requests.RequestException as e:
+        raise ErrorTransport(str(e)) from e
+    finally:
+        if straza is not None:
+            straza.zavrsi()
+
+    if straza is not None and straza.prekinuto:
+        # Odgovor bez Content-Length završava zatvaranjem konekcije - prekid na roku izgleda kao kraj tijela
+        raise ErrorTimeout(url)
+
+class _Straza:
+    '''
+    Prekida čitanje tijela odgovora na roku
+
+    Timeout socketa važi za svako pojedinačno čitanje, pa stranica koja šalje malo po malo
+    može produžiti čitanje jednog dijela neograničeno. Na roku se zato socket odgovora zatvara
+    (shutdown) iz tajmera, što prekida i čitanje koje upravo čeka.
+    '''
+
+    def __init__(self, odgovor, kraj):
+        self.kraj = kraj
+        self.prekinuto = False
+
+        self.__raw = getattr(odgovor, 'raw', None)
+        self.__lock = threading.Lock()
+        self.__tajmer = None
+
+        sock = self.__sock()
+        if sock is not None:
+            self.__tajmer = threading.Timer(max(0, kraj - time.monotonic()), self.__prekini, args = (sock,))
+            self.__tajmer.daemon = True
+            self.__tajmer.start()
+
+    def isteklo(self):
+        return self.prekinuto or time.monotonic() >= self.kraj
+
+    def zavrsi(self):
+        with self.__lock:
+            if self.__tajmer is not None:
+                self.__tajmer.cancel()
+                self.__tajmer = None
+
+    def __sock(self):
+        sock = getattr(getattr(self.__raw, 'connection', None), 'sock', None)
+        if sock is None:
+            # Odgovor koji završava zatvaranjem konekcije (bez Content-Length): http.client je socket
+            # odvojio od konekcije i drži ga samo tijelo odgovora
+            fp = getattr(getattr(self.__raw, '_fp', None), 'fp', None)
+            sock = getattr(getattr(fp, 'raw', None), '_sock', None)
+        return sock
+
+    def __prekini(self, sock):
+        import socket
+
+        with self.__lock:
+            # Konekcija vraćena u pool (tijelo je pročitano) više nije ovog odgovora
+            if self.__tajmer is None or self.__sock() is not sock:
+                return
+
+            self.prekinuto = True
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+def _zatvori(buducnost):
+    if not buducnost.cancelled() and buducnost.exception() is None:
+        buducnost.result().close()
+
+_transport = None
+_lock = threading.Lock()
+
+def dohvati_transport():
+    ''' Vraća zajednički transport (kreira se pri prvom korištenju) '''
+    global _transport
+    if _transport is None:
+        with _lock:
+            if _transport is None:
+                _transport = Transport()
+
+    return _transport
+
+def postavi_transport(t):
+    '''
+    Postavi transport koji koriste svi moduli (vraća prethodni)
+    Dovoljan je bilo koji objekat s metodom get(url, **kwargs) koja vraća odgovor sličan requests.Response
+    '''
+    global _transport
+    with _lock:
+        prethodni = _transport
+        _transport = t
+
+    return prethodni
+
+def get(url, **kwargs):
+    ''' GET zahtjev preko zajedničkog transporta '''
+    return dohvati_transport().get(url, **kwargs)